@@ -1,7 +1,7 @@
 import bpy, mathutils
 import typing
 from . import PROP_preferences
-from . import UTIL_functions, UTIL_translation, UTIL_bme
+from . import UTIL_functions, UTIL_translation, UTIL_file_browser, UTIL_bme
 
 #region BME Adder
 
@@ -144,6 +144,13 @@ class BBP_OT_add_bme_struct(bpy.types.Operator):
         translation_context = 'BBP_OT_add_bme_struct/property'
     ) # type: ignore
     
+    link_duplicate: bpy.props.BoolProperty(
+        name = "Link Duplicate",
+        description = "Share the existing mesh generated with the same type and configurations instead of creating new one.",
+        default = False,
+        translation_context = 'BBP_OT_add_bme_struct/property'
+    ) # type: ignore
+
     ## Extra transform for good "what you see is what you gotten".
     #  Extra transform will be added after moving this object to cursor.
     extra_translation: bpy.props.FloatVectorProperty(
@@ -206,7 +213,8 @@ class BBP_OT_add_bme_struct(bpy.types.Operator):
         # call general creator
         obj: bpy.types.Object = UTIL_bme.create_bme_struct_wrapper(
             _g_EnumHelper_BmeStructType.get_selection(self.bme_struct_type),
-            cfgs
+            cfgs,
+            self.link_duplicate
         )
 
         # add into scene and move to cursor
@@ -278,6 +286,10 @@ class BBP_OT_add_bme_struct(bpy.types.Operator):
         hbox_layout = layout.row()
         hbox_layout.prop(self, 'extra_rotation', text='')
 
+        # show link duplicate option
+        layout.separator()
+        layout.prop(self, 'link_duplicate')
+
     @classmethod
     def draw_blc_menu(cls, layout: bpy.types.UILayout):
         for category, idents in _g_EnumHelper_BmeStructType.get_bme_categories().items():
@@ -301,10 +313,93 @@ class BBP_OT_add_bme_struct(bpy.types.Operator):
 
 #endregion
 
+#region BME Layout Adder
+
+_g_LayoutMergeModeDesc: dict[UTIL_bme.LayoutMergeMode, tuple[str, str]] = {
+    UTIL_bme.LayoutMergeMode.No: ("No", "Create one object for each structure."),
+    UTIL_bme.LayoutMergeMode.Sector: ("Sector", "Merge the structures with the same type in the same sector into one object."),
+    UTIL_bme.LayoutMergeMode.Material: ("Material", "Merge the structures with the same type and the same material into one object."),
+}
+_g_EnumHelper_LayoutMergeMode = UTIL_functions.EnumPropHelper(
+    UTIL_bme.LayoutMergeMode,
+    lambda x: str(x.value),
+    lambda x: UTIL_bme.LayoutMergeMode(int(x)),
+    lambda x: _g_LayoutMergeModeDesc[x][0],
+    lambda x: _g_LayoutMergeModeDesc[x][1],
+    lambda _: ''
+)
+
+class BBP_OT_add_bme_layout(bpy.types.Operator, UTIL_file_browser.ImportBmeLayoutFile):
+    """Add BME Structures in batch from JSON or CSV layout file"""
+    bl_idname = "bbp.add_bme_layout"
+    bl_label = "Add BME Layout"
+    bl_options = {'REGISTER', 'UNDO'}
+    bl_translation_context = 'BBP_OT_add_bme_layout'
+
+    merge_mode: bpy.props.EnumProperty(
+        name = "Merge Mode",
+        description = "Decide how to merge created structures into objects",
+        items = _g_EnumHelper_LayoutMergeMode.generate_items(),
+        default = _g_EnumHelper_LayoutMergeMode.to_selection(UTIL_bme.LayoutMergeMode.No),
+        translation_context = 'BBP_OT_add_bme_layout/property'
+    ) # type: ignore
+    link_duplicate: bpy.props.BoolProperty(
+        name = "Link Duplicate",
+        description = "Share the mesh between the structures with the same type and configurations. Only works when merge mode is No.",
+        default = True,
+        translation_context = 'BBP_OT_add_bme_layout/property'
+    ) # type: ignore
+    use_parallel: bpy.props.BoolProperty(
+        name = "Parallel Generation",
+        description = "Generate structures in multiple processes. Only worth for large layout because starting processes takes time.",
+        default = False,
+        translation_context = 'BBP_OT_add_bme_layout/property'
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return PROP_preferences.get_raw_preferences().has_valid_blc_tex_folder()
+
+    def execute(self, context):
+        # load layout and create all structures
+        try:
+            entries: list[UTIL_bme.LayoutEntry] = UTIL_bme.load_layout(self.general_get_filename())
+            objs: list[bpy.types.Object] = UTIL_bme.create_bme_structs_from_layout(
+                entries,
+                _g_EnumHelper_LayoutMergeMode.get_selection(self.merge_mode),
+                self.link_duplicate,
+                self.use_parallel
+            )
+        except UTIL_functions.BBPException as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        # add into scene.
+        # layout has its own transform so no need to move to cursor.
+        for obj in objs:
+            UTIL_functions.add_into_scene(obj)
+        # select created objects
+        UTIL_functions.select_certain_objects(tuple(objs))
+        self.report({'INFO'}, f'{len(entries)} BME structures are created in {len(objs)} objects.')
+        return {'FINISHED'}
+
+    def draw(self, context):
+        layout: bpy.types.UILayout = self.layout
+        layout.prop(self, 'merge_mode')
+        # link duplicate only works without merging
+        sublayout = layout.row()
+        sublayout.enabled = _g_EnumHelper_LayoutMergeMode.get_selection(self.merge_mode) == UTIL_bme.LayoutMergeMode.No
+        sublayout.prop(self, 'link_duplicate')
+        layout.prop(self, 'use_parallel')
+
+#endregion
+
 def register() -> None:
     bpy.utils.register_class(BBP_PG_bme_adder_cfgs)
     bpy.utils.register_class(BBP_OT_add_bme_struct)
+    bpy.utils.register_class(BBP_OT_add_bme_layout)
 
 def unregister() -> None:
+    bpy.utils.unregister_class(BBP_OT_add_bme_layout)
     bpy.utils.unregister_class(BBP_OT_add_bme_struct)
     bpy.utils.unregister_class(BBP_PG_bme_adder_cfgs)
\ No newline at end of file
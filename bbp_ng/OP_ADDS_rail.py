@@ -1,6 +1,6 @@
 import bpy, mathutils, math
 import typing
-from . import UTIL_rail_creator, PROP_preferences
+from . import UTIL_functions, UTIL_rail_creator, PROP_preferences
 
 ## Const Value Hint:
 #  Default Rail Radius: 0.35 (in measure)
@@ -168,6 +168,31 @@ class SharedScrewRailInputProperty():
         translation_context = 'BBP/OP_ADDS_rail.SharedScrewRailInputProperty/property'
     ) # type: ignore
 
+    rail_screw_adaptive: bpy.props.BoolProperty(
+        name = "Adaptive Steps",
+        description = "Choose the segment count from screw radius and chord error instead of fixed steps.",
+        default = False,
+        translation_context = 'BBP/OP_ADDS_rail.SharedScrewRailInputProperty/property'
+    ) # type: ignore
+
+    rail_screw_chord_error: bpy.props.FloatProperty(
+        name = "Chord Error",
+        description = "The maximum distance between generated rail and ideal curve. Less error, more segment.",
+        default = 0.05,
+        min = 0.001,
+        soft_max = 1.0,
+        unit = 'LENGTH',
+        translation_context = 'BBP/OP_ADDS_rail.SharedScrewRailInputProperty/property'
+    ) # type: ignore
+
+    rail_screw_triangle_budget: bpy.props.IntProperty(
+        name = "Triangle Budget",
+        description = "The maximum triangle count of this rail body (caps excluded). Zero means no limit.",
+        default = 0,
+        min = 0,
+        translation_context = 'BBP/OP_ADDS_rail.SharedScrewRailInputProperty/property'
+    ) # type: ignore
+
     rail_screw_radius: bpy.props.FloatProperty(
         name = "Radius",
         description = "The screw radius.",
@@ -200,12 +225,28 @@ class SharedScrewRailInputProperty():
 
     def draw_screw_rail_input(self, layout: bpy.types.UILayout) -> None:
         layout.prop(self, "rail_screw_radius")
-        layout.prop(self, "rail_screw_steps")
+        layout.prop(self, "rail_screw_adaptive")
+        if self.rail_screw_adaptive:
+            layout.prop(self, "rail_screw_chord_error")
+            layout.prop(self, "rail_screw_triangle_budget")
+        else:
+            layout.prop(self, "rail_screw_steps")
 
     def general_get_rail_screw_radius(self) -> float:
         return self.rail_screw_radius
-    def general_get_rail_screw_steps(self) -> int:
-        return self.rail_screw_steps
+    def general_get_rail_screw_steps(self, is_monorail: bool, angle: float, iterations: int) -> int:
+        """
+        Get the segment count per iteration.
+        If adaptive steps is enabled, it is computed from given rail shape (angle is in degree),
+        otherwise the fixed steps is returned.
+        """
+        if not self.rail_screw_adaptive:
+            return self.rail_screw_steps
+        return UTIL_rail_creator.compute_adaptive_screw_steps(
+            is_monorail, c_DefaultRailRadius, c_DefaultRailSpan,
+            angle, iterations, self.rail_screw_radius,
+            self.rail_screw_chord_error, self.rail_screw_triangle_budget
+        )
     
     def draw_screw_rail_flip_input(self, layout: bpy.types.UILayout) -> None:
         # flip options should placed horizontally
@@ -239,8 +280,8 @@ class BBP_OT_add_rail_section(SharedRailSectionInputProperty, bpy.types.Operator
 
     def execute(self, context):
         UTIL_rail_creator.rail_creator_wrapper(
-            lambda bm: UTIL_rail_creator.create_rail_section(
-                bm, self.general_get_is_monorail(), 
+            lambda rail: UTIL_rail_creator.create_rail_section(
+                rail, self.general_get_is_monorail(), 
                 c_DefaultRailRadius, c_DefaultRailSpan
             ),
             mathutils.Matrix.Identity(4)
@@ -264,7 +305,7 @@ class BBP_OT_add_transition_section(bpy.types.Operator):
 
     def execute(self, context):
         UTIL_rail_creator.rail_creator_wrapper(
-            lambda bm: UTIL_rail_creator.create_transition_section(bm, c_DefaultRailRadius, c_DefaultRailSpan),
+            lambda rail: UTIL_rail_creator.create_transition_section(rail, c_DefaultRailRadius, c_DefaultRailSpan),
             mathutils.Matrix.Identity(4)
         )
         return {'FINISHED'}
@@ -286,8 +327,8 @@ class BBP_OT_add_straight_rail(SharedExtraTransform, SharedRailSectionInputPrope
 
     def execute(self, context):
         UTIL_rail_creator.rail_creator_wrapper(
-            lambda bm: UTIL_rail_creator.create_straight_rail(
-                bm,
+            lambda rail: UTIL_rail_creator.create_straight_rail(
+                rail,
                 self.general_get_is_monorail(), c_DefaultRailRadius, c_DefaultRailSpan,
                 self.general_get_rail_length(), 0,
                 self.general_get_rail_start_cap(), self.general_get_rail_end_cap()
@@ -319,8 +360,8 @@ class BBP_OT_add_transition_rail(SharedExtraTransform, SharedRailCapInputPropert
 
     def execute(self, context):
         UTIL_rail_creator.rail_creator_wrapper(
-            lambda bm: UTIL_rail_creator.create_transition_rail(
-                bm,
+            lambda rail: UTIL_rail_creator.create_transition_rail(
+                rail,
                 c_DefaultRailRadius, c_DefaultRailSpan,
                 self.general_get_rail_length(),
                 self.general_get_rail_start_cap(), self.general_get_rail_end_cap()
@@ -362,8 +403,8 @@ class BBP_OT_add_side_rail(SharedExtraTransform, SharedRailCapInputProperty, Sha
 
     def execute(self, context):
         UTIL_rail_creator.rail_creator_wrapper(
-            lambda bm: UTIL_rail_creator.create_straight_rail(
-                bm,
+            lambda rail: UTIL_rail_creator.create_straight_rail(
+                rail,
                 False, c_DefaultRailRadius, c_DefaultRailSpan,
                 self.general_get_rail_length(), 
                 c_NormalSideRailAngle if self.side_rail_type == 'NORMAL' else c_StoneSideRailAngle,
@@ -405,12 +446,13 @@ class BBP_OT_add_arc_rail(SharedExtraTransform, SharedRailSectionInputProperty,
 
     def execute(self, context):
         UTIL_rail_creator.rail_creator_wrapper(
-            lambda bm: UTIL_rail_creator.create_screw_rail(
-                bm,
+            lambda rail: UTIL_rail_creator.create_screw_rail(
+                rail,
                 self.general_get_is_monorail(), c_DefaultRailRadius, c_DefaultRailSpan,
                 self.general_get_rail_start_cap(), self.general_get_rail_end_cap(),
                 math.degrees(self.rail_screw_angle), 0, 1,  # blender passed value is in radians
-                self.general_get_rail_screw_steps(), self.general_get_rail_screw_radius(),
+                self.general_get_rail_screw_steps(self.general_get_is_monorail(), math.degrees(self.rail_screw_angle), 1),
+                self.general_get_rail_screw_radius(),
                 self.general_get_rail_screw_flip_x(), self.general_get_rail_screw_flip_y(), self.general_get_rail_screw_flip_z()
             ),
             self.general_get_extra_transform()
@@ -460,12 +502,13 @@ class BBP_OT_add_spiral_rail(SharedExtraTransform, SharedRailCapInputProperty, S
 
     def execute(self, context):
         UTIL_rail_creator.rail_creator_wrapper(
-            lambda bm: UTIL_rail_creator.create_screw_rail(
-                bm,
+            lambda rail: UTIL_rail_creator.create_screw_rail(
+                rail,
                 False, c_DefaultRailRadius, c_DefaultRailSpan,
                 self.general_get_rail_start_cap(), self.general_get_rail_end_cap(),
                 360, self.rail_screw_screw, self.rail_screw_iterations,
-                self.general_get_rail_screw_steps(), self.general_get_rail_screw_radius(),
+                self.general_get_rail_screw_steps(False, 360, self.rail_screw_iterations),
+                self.general_get_rail_screw_radius(),
                 self.general_get_rail_screw_flip_x(), self.general_get_rail_screw_flip_y(), self.general_get_rail_screw_flip_z()
             ),
             self.general_get_extra_transform()
@@ -508,12 +551,13 @@ class BBP_OT_add_side_spiral_rail(SharedExtraTransform, SharedRailSectionInputPr
 
     def execute(self, context):
         UTIL_rail_creator.rail_creator_wrapper(
-            lambda bm: UTIL_rail_creator.create_screw_rail(
-                bm,
+            lambda rail: UTIL_rail_creator.create_screw_rail(
+                rail,
                 True, c_DefaultRailRadius, c_DefaultRailSpan,
                 self.general_get_rail_start_cap(), self.general_get_rail_end_cap(),
                 360, c_SideSpiralRailScrew, self.rail_screw_iterations,
-                self.general_get_rail_screw_steps(), self.general_get_rail_screw_radius(),
+                self.general_get_rail_screw_steps(True, 360, self.rail_screw_iterations),
+                self.general_get_rail_screw_radius(),
                 self.general_get_rail_screw_flip_x(), self.general_get_rail_screw_flip_y(), self.general_get_rail_screw_flip_z()
             ),
             self.general_get_extra_transform()
@@ -532,6 +576,56 @@ class BBP_OT_add_side_spiral_rail(SharedExtraTransform, SharedRailSectionInputPr
         layout.separator()
         self.draw_extra_transform_input(layout)
 
+class BBP_OT_add_path_rail(SharedRailSectionInputProperty, SharedRailCapInputProperty, bpy.types.Operator):
+    """Add Rails Following Selected Curves"""
+    bl_idname = "bbp.add_path_rail"
+    bl_label = "Path Rail"
+    bl_options = {'REGISTER', 'UNDO'}
+    bl_translation_context = 'BBP_OT_add_path_rail'
+
+    rail_chord_error: bpy.props.FloatProperty(
+        name = "Chord Error",
+        description = "The maximum distance between generated rail and curve. Less error, more segment.",
+        default = 0.05,
+        min = 0.001,
+        soft_max = 1.0,
+        unit = 'LENGTH',
+        translation_context = 'BBP_OT_add_path_rail/property'
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        if not PROP_preferences.get_raw_preferences().has_valid_blc_tex_folder():
+            return False
+        return any(obj.type == 'CURVE' for obj in context.selected_objects)
+
+    def execute(self, context):
+        # create rail for each selected curve
+        curve_objs: list[bpy.types.Object] = [obj for obj in context.selected_objects if obj.type == 'CURVE']
+        rail_objs: list[bpy.types.Object] = []
+        for curve_obj in curve_objs:
+            rail_obj: bpy.types.Object | None = UTIL_rail_creator.create_path_rail(
+                curve_obj,
+                self.general_get_is_monorail(), c_DefaultRailRadius, c_DefaultRailSpan,
+                self.general_get_rail_start_cap(), self.general_get_rail_end_cap(),
+                self.rail_chord_error
+            )
+            if rail_obj is not None:
+                rail_objs.append(rail_obj)
+
+        # select created rails
+        UTIL_functions.select_certain_objects(tuple(rail_objs))
+        self.report({'INFO'}, f'{len(rail_objs)} rails are created from {len(curve_objs)} curves.')
+        return {'FINISHED'}
+
+    def draw(self, context):
+        layout = self.layout
+        layout.label(text='Path Rail', text_ctxt='BBP_OT_add_path_rail/draw')
+        self.draw_rail_section_input(layout)
+        layout.prop(self, "rail_chord_error")
+        layout.separator()
+        self.draw_rail_cap_input(layout)
+
 #endregion
 
 def register() -> None:
@@ -545,9 +639,11 @@ def register() -> None:
     bpy.utils.register_class(BBP_OT_add_arc_rail)
     bpy.utils.register_class(BBP_OT_add_spiral_rail)
     bpy.utils.register_class(BBP_OT_add_side_spiral_rail)
+    bpy.utils.register_class(BBP_OT_add_path_rail)
 
 
 def unregister() -> None:
+    bpy.utils.unregister_class(BBP_OT_add_path_rail)
     bpy.utils.unregister_class(BBP_OT_add_side_spiral_rail)
     bpy.utils.unregister_class(BBP_OT_add_spiral_rail)
     bpy.utils.unregister_class(BBP_OT_add_arc_rail)
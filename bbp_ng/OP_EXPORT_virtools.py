@@ -1,9 +1,9 @@
-import bpy, mathutils
+import bpy, mathutils, numpy
 from bpy_extras.wm_utils.progress_report import ProgressReport
 import tempfile, os, typing
 from dataclasses import dataclass
 from . import PROP_preferences, UTIL_ioport_shared, UTIL_naming_convention
-from . import UTIL_virtools_types, UTIL_functions, UTIL_file_browser, UTIL_blender_mesh, UTIL_ballance_texture
+from . import UTIL_virtools_types, UTIL_file_browser, UTIL_blender_mesh, UTIL_ballance_texture
 from . import PROP_virtools_group, PROP_virtools_material, PROP_virtools_mesh, PROP_virtools_texture, PROP_virtools_light, PROP_virtools_camera
 from .pybmap import bmap_wrapper as bmap
 
@@ -68,6 +68,9 @@ class BBP_OT_export_virtools(bpy.types.Operator, UTIL_file_browser.ExportVirtool
                 texture_save_opt,
                 self.general_get_use_compress(),
                 self.general_get_compress_level(),
+                self.general_get_use_fast_triangulation(),
+                self.general_get_use_vertex_welding(),
+                self.general_get_use_mesh_instancing(),
                 self.general_get_successive_sector(),
                 self.general_get_successive_sector_count(),
                 objls
@@ -82,9 +85,18 @@ class BBP_OT_export_virtools(bpy.types.Operator, UTIL_file_browser.ExportVirtool
         self.draw_virtools_params(context, layout, False)
         self.draw_ballance_params(layout, False)
 
+@dataclass
+class _BlenderMeshData:
+    vertex_pos: numpy.ndarray
+    vertex_nml: numpy.ndarray
+    vertex_uv: numpy.ndarray
+    face_array: UTIL_blender_mesh.FaceArrayData
+    mtl_slots: tuple[bpy.types.Material | None, ...]
+
 _Object3dPair = tuple[bpy.types.Object, bmap.BM3dObject]
 _LightPair = tuple[bpy.types.Object, bpy.types.Light, bmap.BMTargetLight]
 _CameraPair = tuple[bpy.types.Object, bpy.types.Camera, bmap.BMTargetCamera]
+## The last item is the mesh data which has been read when preparing, or None if it is not read yet.
 _MeshPair = tuple[bpy.types.Object, bpy.types.Mesh, bmap.BMMesh]
 _MaterialPair = tuple[bpy.types.Material, bmap.BMMaterial]
 _TexturePair = tuple[bpy.types.Image, bmap.BMTexture]
@@ -101,6 +113,9 @@ def _export_virtools(
         texture_save_opt_: UTIL_virtools_types.CK_TEXTURE_SAVEOPTIONS,
         use_compress_: bool,
         compress_level_: int, 
+        use_fast_triangulation_: bool,
+        use_vertex_welding_: bool,
+        use_mesh_instancing_: bool,
         successive_sector_: bool,
         successive_sector_count_: int,
         export_objects: tuple[bpy.types.Object, ...]
@@ -129,20 +144,24 @@ def _export_virtools(
                 _export_virtools_camera(writer, progress, prep_crets.camera_crets)
                 # export prepared 3dobject
                 mesh_crets: tuple[_MeshPair, ...] = _export_virtools_3dobjects(
-                    writer, progress, prep_crets.obj3d_crets)
+                    writer, progress, use_fast_triangulation_, use_vertex_welding_, use_mesh_instancing_, prep_crets.obj3d_crets)
                 # export mesh
                 material_crets: tuple[_MaterialPair, ...] = _export_virtools_meshes(
-                    writer, progress, mesh_crets)
+                    writer, progress, use_fast_triangulation_, use_vertex_welding_, mesh_crets)
                 # export material
                 texture_crets: tuple[_TexturePair, ...] = _export_virtools_materials(
                     writer, progress, material_crets)
                 # export texture
-                _export_virtools_textures(writer, progress, vt_temp_folder, texture_crets)
+                used_tex_cache: tuple[str, ...] = _export_virtools_textures(writer, progress, vt_temp_folder, texture_crets)
 
                 # save document
                 _save_virtools_document(
                     writer, progress, file_name_, texture_save_opt_, use_compress_, compress_level_)
 
+                # shrink texture cache after saving,
+                # because vt engine may still read cached textures when saving document.
+                _evict_texture_cache(used_tex_cache)
+
 def _prepare_virtools_3dobjects(
         writer: bmap.BMFileWriter,
         progress: ProgressReport,
@@ -349,11 +368,16 @@ def _export_virtools_camera(
 def _export_virtools_3dobjects(
         writer: bmap.BMFileWriter,
         progress: ProgressReport,
+        use_fast_triangulation: bool,
+        use_vertex_welding: bool,
+        use_instancing: bool,
         obj3d_crets: tuple[_Object3dPair, ...]
         ) -> tuple[_MeshPair, ...]:
     # create virtools mesh
     mesh_crets: list[_MeshPair] = []
     mesh_cret_map: dict[bpy.types.Mesh, bmap.BMMesh] = {}
+    # map geometry fingerprint to created virtools mesh if instancing is ordered
+    fingerprint_map: dict[str, bmap.BMMesh] = {}
     # start saving
     tr_text: str = bpy.app.translations.pgettext_rpt('Saving 3dObjects', 'BBP_OT_export_virtools/execute')
     progress.enter_substeps(len(obj3d_crets), tr_text)
@@ -368,8 +392,24 @@ def _export_virtools_3dobjects(
             # get existing vt mesh or create new one
             vtmesh: bmap.BMMesh | None = mesh_cret_map.get(mesh, None)
             if vtmesh is None:
-                vtmesh = writer.create_mesh()
-                mesh_crets.append((obj3d, mesh, vtmesh))
+                if use_instancing:
+                    # read evaluated geometry and find whether there is an identical one.
+                    # only fingerprint is kept, and geometry is read again when writing mesh,
+                    # so that the geometry of all meshes is not held in memory at the same time.
+                    mesh_data: _BlenderMeshData = _read_blender_mesh(obj3d, use_fast_triangulation, use_vertex_welding)
+                    mesh_settings: PROP_virtools_mesh.RawVirtoolsMesh = PROP_virtools_mesh.get_raw_virtools_mesh(mesh)
+                    tags: list[str] = [str(mesh_settings.mLitMode)]
+                    tags.extend(('' if mtl is None else mtl.name) for mtl in mesh_data.mtl_slots)
+                    fingerprint: str = UTIL_blender_mesh.get_geometry_fingerprint(
+                        mesh_data.vertex_pos, mesh_data.vertex_nml, mesh_data.vertex_uv, mesh_data.face_array, tags)
+                    vtmesh = fingerprint_map.get(fingerprint, None)
+                    if vtmesh is None:
+                        vtmesh = writer.create_mesh()
+                        mesh_crets.append((obj3d, mesh, vtmesh))
+                        fingerprint_map[fingerprint] = vtmesh
+                else:
+                    vtmesh = writer.create_mesh()
+                    mesh_crets.append((obj3d, mesh, vtmesh))
                 mesh_cret_map[mesh] = vtmesh
 
             # assign mesh
@@ -393,9 +433,48 @@ def _export_virtools_3dobjects(
     progress.leave_substeps()
     return tuple(mesh_crets)
 
+def _read_blender_mesh(
+        obj3d: bpy.types.Object,
+        use_fast_triangulation: bool,
+        use_vertex_welding: bool
+        ) -> _BlenderMeshData:
+    # we need use temporary mesh function to visit triangulated meshes
+    # so we ignore mesh factor and use obj3d to create temp mesh to get data
+    # open temp mesh helper
+    with UTIL_blender_mesh.TemporaryMesh(obj3d) as tempmesh:
+        # open mesh visitor
+        with UTIL_blender_mesh.MeshReader(tempmesh.get_temp_mesh(), use_fast_triangulation) as mesh_visitor:
+            # fetch vertex data in bulk
+            # and convert their coordinate system by whole-array operations.
+            vertex_pos: numpy.ndarray = mesh_visitor.get_vertex_position_array()
+            UTIL_virtools_types.vxvector3_array_conv_co(vertex_pos)
+            vertex_nml: numpy.ndarray = mesh_visitor.get_vertex_normal_array()
+            UTIL_virtools_types.vxvector3_array_conv_co(vertex_nml)
+            vertex_uv: numpy.ndarray = mesh_visitor.get_vertex_uv_array()
+            UTIL_virtools_types.vxvector2_array_conv_co(vertex_uv)
+
+            # decompose all faces into index arrays in one pass
+            face_array: UTIL_blender_mesh.FaceArrayData = mesh_visitor.get_face_array()
+            face_array.conv_co()
+
+            # fetch material slots
+            mtl_slots: tuple[bpy.types.Material | None, ...] = tuple(mesh_visitor.get_material_slot())
+        # end of mesh visitor
+    # end of temp mesh
+
+    # weld vertices if ordered.
+    # after this, position, normal and uv share the same indices.
+    if use_vertex_welding:
+        vertex_pos, vertex_nml, vertex_uv, face_array = UTIL_blender_mesh.weld_vertex_arrays(
+            vertex_pos, vertex_nml, vertex_uv, face_array)
+
+    return _BlenderMeshData(vertex_pos, vertex_nml, vertex_uv, face_array, mtl_slots)
+
 def _export_virtools_meshes(
         writer: bmap.BMFileWriter,
         progress: ProgressReport,
+        use_fast_triangulation: bool,
+        use_vertex_welding: bool,
         mesh_crets: tuple[_MeshPair, ...]
         ) -> tuple[_MaterialPair, ...]:
     # create virtools mesh
@@ -407,99 +486,64 @@ def _export_virtools_meshes(
 
     # iterate meshes
     for obj3d, mesh, vtmesh in mesh_crets:
-        # we need use temporary mesh function to visit triangulated meshes
-        # so we ignore mesh factor and use obj3d to create temp mesh to get data
-        # open temp mesh helper
-        with UTIL_blender_mesh.TemporaryMesh(obj3d) as tempmesh:
-            # sync mesh name, lit mode
-            vtmesh.set_name(mesh.name)
-            mesh_settings: PROP_virtools_mesh.RawVirtoolsMesh = PROP_virtools_mesh.get_raw_virtools_mesh(mesh)
-            vtmesh.set_lit_mode(mesh_settings.mLitMode)
-
-            # sync mesh main data
-            # open mesh visitor
-            with UTIL_blender_mesh.MeshReader(tempmesh.get_temp_mesh()) as mesh_visitor:
-                # construct data provider
-                def pos_iterator() -> typing.Iterator[UTIL_virtools_types.VxVector3]:
-                    for v in mesh_visitor.get_vertex_position():
-                        UTIL_virtools_types.vxvector3_conv_co(v)
-                        yield v
-                def nml_iterator() -> typing.Iterator[UTIL_virtools_types.VxVector3]:
-                    for v in mesh_visitor.get_vertex_normal():
-                        UTIL_virtools_types.vxvector3_conv_co(v)
-                        yield v
-                def uv_iterator() -> typing.Iterator[UTIL_virtools_types.VxVector2]:
-                    for v in mesh_visitor.get_vertex_uv():
-                        UTIL_virtools_types.vxvector2_conv_co(v)
-                        yield v
-
-                # construct mtl slot
-                def mtl_iterator() -> typing.Iterator[bmap.BMMaterial | None]:
-                    for mtl in mesh_visitor.get_material_slot():
-                        if mtl is None: yield None
-                        else:
-                            # get existing one or create new one
-                            vtmaterial: bmap.BMMaterial | None = material_cret_map.get(mtl, None)
-                            if vtmaterial is None:
-                                vtmaterial = writer.create_material()
-                                material_crets.append((mtl, vtmaterial))
-                                material_cret_map[mtl] = vtmaterial
-                            # yield data
-                            yield vtmaterial
-
-                def face_idx_iterator(idx_type: int) -> typing.Iterator[UTIL_virtools_types.CKFaceIndices]:
-                    data: UTIL_virtools_types.CKFaceIndices = UTIL_virtools_types.CKFaceIndices()
-                    for fidx in mesh_visitor.get_face():
-                        # swap indices
-                        fidx.conv_co()
-                        # set data by specific index
-                        match(idx_type):
-                            case 0:  data.i1, data.i2, data.i3 = fidx.mIndices[0].mPosIdx, fidx.mIndices[1].mPosIdx, fidx.mIndices[2].mPosIdx
-                            case 1:  data.i1, data.i2, data.i3 = fidx.mIndices[0].mNmlIdx, fidx.mIndices[1].mNmlIdx, fidx.mIndices[2].mNmlIdx
-                            case 2:  data.i1, data.i2, data.i3 = fidx.mIndices[0].mUvIdx, fidx.mIndices[1].mUvIdx, fidx.mIndices[2].mUvIdx
-                            case _: raise UTIL_functions.BBPException('invalid index type.')
-                        # yield data
-                        yield data
-                def face_mtl_iterator() -> typing.Iterator[int]:
-                    for fidx in mesh_visitor.get_face():
-                        yield fidx.mMtlIdx
-                
-                # create virtools mesh transition
-                # and write into mesh
-                with bmap.BMMeshTrans() as mesh_trans:
-                    # prepare vertices
-                    mesh_trans.prepare_vertex(
-                        mesh_visitor.get_vertex_position_count(),
-                        pos_iterator()
-                    )
-                    mesh_trans.prepare_normal(
-                        mesh_visitor.get_vertex_normal_count(),
-                        nml_iterator()
-                    )
-                    mesh_trans.prepare_uv(
-                        mesh_visitor.get_vertex_uv_count(),
-                        uv_iterator()
-                    )
-                    # prepare mtl slots
-                    mesh_trans.prepare_mtl_slot(
-                        mesh_visitor.get_material_slot_count(),
-                        mtl_iterator()
-                    )
-                    # prepare face
-                    mesh_trans.prepare_face(
-                        mesh_visitor.get_face_count(),
-                        face_idx_iterator(0),
-                        face_idx_iterator(1),
-                        face_idx_iterator(2),
-                        face_mtl_iterator()
-                    )
-
-                    # parse to vtmesh
-                    mesh_trans.parse(vtmesh)
-
-                # end of mesh trans
-            # end of mesh visitor
-        # end of temp mesh
+        # sync mesh name, lit mode
+        vtmesh.set_name(mesh.name)
+        mesh_settings: PROP_virtools_mesh.RawVirtoolsMesh = PROP_virtools_mesh.get_raw_virtools_mesh(mesh)
+        vtmesh.set_lit_mode(mesh_settings.mLitMode)
+
+        # sync mesh main data
+        mesh_data: _BlenderMeshData = _read_blender_mesh(obj3d, use_fast_triangulation, use_vertex_welding)
+
+        # construct mtl slot
+        def mtl_iterator() -> typing.Iterator[bmap.BMMaterial | None]:
+            for mtl in mesh_data.mtl_slots:
+                if mtl is None: yield None
+                else:
+                    # get existing one or create new one
+                    vtmaterial: bmap.BMMaterial | None = material_cret_map.get(mtl, None)
+                    if vtmaterial is None:
+                        vtmaterial = writer.create_material()
+                        material_crets.append((mtl, vtmaterial))
+                        material_cret_map[mtl] = vtmaterial
+                    # yield data
+                    yield vtmaterial
+
+        # create virtools mesh transition
+        # and write into mesh
+        with bmap.BMMeshTrans() as mesh_trans:
+            # prepare vertices
+            # pybmap only accept iterator, so we iterate prepared array directly.
+            mesh_trans.prepare_vertex(
+                len(mesh_data.vertex_pos),
+                UTIL_virtools_types.vxvector3_array_to_iterator(mesh_data.vertex_pos)
+            )
+            mesh_trans.prepare_normal(
+                len(mesh_data.vertex_nml),
+                UTIL_virtools_types.vxvector3_array_to_iterator(mesh_data.vertex_nml)
+            )
+            mesh_trans.prepare_uv(
+                len(mesh_data.vertex_uv),
+                UTIL_virtools_types.vxvector2_array_to_iterator(mesh_data.vertex_uv)
+            )
+            # prepare mtl slots
+            mesh_trans.prepare_mtl_slot(
+                len(mesh_data.mtl_slots),
+                mtl_iterator()
+            )
+            # prepare face
+            face_array: UTIL_blender_mesh.FaceArrayData = mesh_data.face_array
+            mesh_trans.prepare_face(
+                len(face_array.mMtlIdx),
+                UTIL_virtools_types.ckfaceindices_array_to_iterator(face_array.mPosIndices),
+                UTIL_virtools_types.ckfaceindices_array_to_iterator(face_array.mNmlIndices),
+                UTIL_virtools_types.ckfaceindices_array_to_iterator(face_array.mUvIndices),
+                iter(face_array.mMtlIdx.tolist())
+            )
+
+            # parse to vtmesh
+            mesh_trans.parse(vtmesh)
+
+        # end of mesh trans
 
         # step
         progress.step()
@@ -581,7 +625,12 @@ def _export_virtools_textures(
         progress: ProgressReport,
         vt_temp_folder: str,
         texture_crets: tuple[_TexturePair, ...]
-        ) -> None:
+        ) -> tuple[str, ...]:
+    # use persistent texture cache if user has specified it
+    pref: PROP_preferences.RawPreferences = PROP_preferences.get_raw_preferences()
+    use_tex_cache: bool = pref.has_valid_tex_cache_folder()
+    used_tex_cache: list[str] = []
+
     # start saving
     tr_text: str = bpy.app.translations.pgettext_rpt('Saving Textures', 'BBP_OT_export_virtools/execute')
     progress.enter_substeps(len(texture_crets), tr_text)
@@ -602,9 +651,14 @@ def _export_virtools_textures(
         try_filepath: str | None = UTIL_ballance_texture.get_ballance_texture_filename(
             UTIL_ballance_texture.get_texture_filepath(tex))
         if try_filepath is None:
-            # non-ballance file, save in temp and change file path to point to it.
-            try_filepath = UTIL_ballance_texture.generate_other_texture_save_path(tex, vt_temp_folder)
-            UTIL_ballance_texture.save_other_texture(tex, try_filepath)
+            if use_tex_cache:
+                # non-ballance file, save in cache folder, or use cached one directly.
+                try_filepath = UTIL_ballance_texture.save_other_texture_cached(tex, pref.mTextureCacheFolder)
+                used_tex_cache.append(try_filepath)
+            else:
+                # non-ballance file, save in temp and change file path to point to it.
+                try_filepath = UTIL_ballance_texture.generate_other_texture_save_path(tex, vt_temp_folder)
+                UTIL_ballance_texture.save_other_texture(tex, try_filepath)
         # load into vt engine
         vttexture.load_image(try_filepath)
 
@@ -613,6 +667,15 @@ def _export_virtools_textures(
 
     # leave progress and return
     progress.leave_substeps()
+    return tuple(used_tex_cache)
+
+def _evict_texture_cache(used_tex_cache: tuple[str, ...]) -> None:
+    # only shrink cache when cache is used.
+    # the cached textures used by this exporting are kept.
+    pref: PROP_preferences.RawPreferences = PROP_preferences.get_raw_preferences()
+    if pref.has_valid_tex_cache_folder():
+        UTIL_ballance_texture.evict_other_texture_cache(
+            pref.mTextureCacheFolder, pref.mTextureCacheSize * 1024 * 1024, used_tex_cache)
 
 def _save_virtools_document(
         writer: bmap.BMFileWriter,
@@ -1,6 +1,7 @@
-import bpy, mathutils
+import bpy, mathutils, numpy
 from bpy_extras.wm_utils.progress_report import ProgressReport
-import tempfile, os, typing
+import tempfile, os, typing, concurrent.futures
+from dataclasses import dataclass
 from . import PROP_preferences, UTIL_ioport_shared, UTIL_naming_convention
 from . import UTIL_virtools_types, UTIL_functions, UTIL_file_browser, UTIL_blender_mesh, UTIL_ballance_texture
 from . import PROP_virtools_group, PROP_virtools_material, PROP_virtools_mesh, PROP_virtools_texture, PROP_virtools_light, PROP_virtools_camera, PROP_ballance_map_info
@@ -41,7 +42,9 @@ class BBP_OT_import_virtools(bpy.types.Operator, UTIL_file_browser.ImportVirtool
         _import_virtools(
             filename,
             encodings,
-            self.general_get_conflict_resolver()
+            self.general_get_conflict_resolver(),
+            self.general_get_use_import_welding(),
+            self.general_get_use_import_sharing()
         )
         self.report({'INFO'}, "Virtools File Importing Finished.")
         return {'FINISHED'}
@@ -52,7 +55,7 @@ class BBP_OT_import_virtools(bpy.types.Operator, UTIL_file_browser.ImportVirtool
         self.draw_virtools_params(context, layout, True)
         self.draw_ballance_params(layout, True)
 
-def _import_virtools(file_name_: str, encodings_: tuple[str, ...], resolver: UTIL_ioport_shared.ConflictResolver) -> None:
+def _import_virtools(file_name_: str, encodings_: tuple[str, ...], resolver: UTIL_ioport_shared.ConflictResolver, use_welding_: bool, use_sharing_: bool) -> None:
     # create temp folder
     with tempfile.TemporaryDirectory() as vt_temp_folder:
         tr_text: str = bpy.app.translations.pgettext_rpt(
@@ -76,7 +79,7 @@ def _import_virtools(file_name_: str, encodings_: tuple[str, ...], resolver: UTI
                     reader, progress, resolver, texture_cret_map)
                 # import meshes
                 mesh_cret_map: dict[bmap.BMMesh, bpy.types.Mesh] = _import_virtools_meshes(
-                    reader, progress, resolver, material_cret_map)
+                    reader, progress, resolver, use_welding_, use_sharing_, material_cret_map)
                 # import 3dobjects
                 obj3d_cret_map: dict[bmap.BM3dObject, bpy.types.Object] = _import_virtools_3dobjects(
                     reader, progress, resolver, mesh_cret_map)
@@ -86,6 +89,26 @@ def _import_virtools(file_name_: str, encodings_: tuple[str, ...], resolver: UTI
                 # import groups
                 _import_virtools_groups(reader, progress, obj3d_cret_map)
 
+## The count of worker threads used for reading texture files when importing.
+_c_TextureReadWorkers: int = min(8, os.cpu_count() or 1)
+
+@dataclass
+class _StagedTexture:
+    vttexture: bmap.BMTexture
+    name: str | None
+    save_options: UTIL_virtools_types.CK_TEXTURE_SAVEOPTIONS
+    video_format: UTIL_virtools_types.VX_PIXELFORMAT
+    texpath_to_load: str | None
+    reading_future: concurrent.futures.Future | None
+
+def _read_texture_file(filepath: str) -> bytes | None:
+    # return None if file can not be read, so that the image is loaded from disk as usual.
+    try:
+        with open(filepath, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
 def _import_virtools_textures(
         reader: bmap.BMFileReader, 
         progress: ProgressReport,
@@ -98,42 +121,65 @@ def _import_virtools_textures(
     progress.enter_substeps(reader.get_texture_count(), tr_text)
 
     # create another temp folder for raw data virtools texture importing
-    with tempfile.TemporaryDirectory() as rawdata_temp:
+    with tempfile.TemporaryDirectory() as rawdata_temp, \
+        concurrent.futures.ThreadPoolExecutor(max_workers = _c_TextureReadWorkers) as executor:
         tr_text = bpy.app.translations.pgettext_rpt(
             'Texture Raw Data Temporary Directory: {0}', 'BBP_OT_import_virtools/execute')
         print(tr_text.format(rawdata_temp))
 
-        for vttexture in reader.get_textures():
+        # first pass: fetch the data of all textures, and extract raw data textures into disk.
+        # it is not confirmed that native library can save textures in parallel,
+        # so textures are saved in main thread one by one.
+        # the file of each non-Ballance texture is read on thread pool instead,
+        # which only touches disk, and overlaps with the saving of following textures.
+        # each texture is saved into its own sub folder, because different textures may share the same file name.
+        staged_textures: list[_StagedTexture] = []
+        for index, vttexture in enumerate(reader.get_textures()):
+            staged: _StagedTexture = _StagedTexture(
+                vttexture,
+                vttexture.get_name(),
+                vttexture.get_save_options(),
+                vttexture.get_video_format(),
+                vttexture.get_file_name(),
+                None
+            )
+            if staged.texpath_to_load is not None:
+                # the attribute of raw data saving is the file path is not absolute path
+                if not os.path.isabs(staged.texpath_to_load):
+                    texpath_folder: str = os.path.join(rawdata_temp, str(index))
+                    os.makedirs(texpath_folder)
+                    staged.texpath_to_load = os.path.join(texpath_folder, os.path.basename(staged.texpath_to_load))
+                    vttexture.save_image(staged.texpath_to_load)
+                # Ballance texture is not packed, so its file is not read.
+                if UTIL_ballance_texture.get_ballance_texture_filename(staged.texpath_to_load) is None:
+                    staged.reading_future = executor.submit(_read_texture_file, staged.texpath_to_load)
+            staged_textures.append(staged)
+
+        # second pass: create blender images in order in main thread.
+        for staged in staged_textures:
             tex_cret: typing.Callable[[], bpy.types.Image]
-            texpath_to_load: str | None = vttexture.get_file_name()
+            texpath: str | None = staged.texpath_to_load
 
             # if no assoc file path (what? but it is real happended)
             # this is invalid image, create a blank image instead
-            if texpath_to_load is None:
+            if texpath is None:
                 tex_cret = lambda: bpy.data.images.new("", 1, 1)
             else:
-                # if this image is raw data, save it in external folder before loading
-                # the attribute of raw data saving is the file path is not absolute path
-                if not os.path.isabs(texpath_to_load):
-                    texpath_to_load = os.path.join(
-                        rawdata_temp,
-                        os.path.basename(texpath_to_load)
-                    )
-                    vttexture.save_image(texpath_to_load)
-
                 # detect whether it is ballance texture and load
-                try_blc_tex: str | None = UTIL_ballance_texture.get_ballance_texture_filename(texpath_to_load)
+                try_blc_tex: str | None = UTIL_ballance_texture.get_ballance_texture_filename(texpath)
                 
                 if try_blc_tex is not None:
                     # load as ballance texture
                     tex_cret = lambda: UTIL_ballance_texture.load_ballance_texture(typing.cast(str, try_blc_tex))
                 else:
-                    # load as other textures
-                    tex_cret = lambda: UTIL_ballance_texture.load_other_texture(typing.cast(str, texpath_to_load))
+                    # load as other textures, and pack it with the data read on thread pool.
+                    # wait for data only when image is really created.
+                    reading_future: concurrent.futures.Future = typing.cast(concurrent.futures.Future, staged.reading_future)
+                    tex_cret = lambda: UTIL_ballance_texture.load_other_texture(typing.cast(str, texpath), reading_future.result())
 
             # create real texture by tex cret fct
             (tex, init_tex) = resolver.create_texture(
-                UTIL_virtools_types.virtools_name_regulator(vttexture.get_name()), 
+                UTIL_virtools_types.virtools_name_regulator(staged.name), 
                 tex_cret
             )
             
@@ -141,12 +187,12 @@ def _import_virtools_textures(
             if init_tex:
                 # set texture cfg
                 rawtex: PROP_virtools_texture.RawVirtoolsTexture = PROP_virtools_texture.RawVirtoolsTexture()
-                rawtex.mSaveOptions = vttexture.get_save_options()
-                rawtex.mVideoFormat = vttexture.get_video_format()
+                rawtex.mSaveOptions = staged.save_options
+                rawtex.mVideoFormat = staged.video_format
                 PROP_virtools_texture.set_raw_virtools_texture(tex, rawtex)
 
             # insert it to map
-            texture_cret_map[vttexture] = tex
+            texture_cret_map[staged.vttexture] = tex
 
             # inc steps
             progress.step()
@@ -222,10 +268,53 @@ def _import_virtools_materials(
     progress.leave_substeps()
     return material_cret_map
 
+@dataclass
+class _VirtoolsMeshData:
+    vertex_pos: numpy.ndarray
+    vertex_nml: numpy.ndarray
+    vertex_uv: numpy.ndarray
+    face_indices: numpy.ndarray
+    face_mtl_idx: numpy.ndarray
+    mtl_slots: tuple[bpy.types.Material | None, ...]
+
+def _read_virtools_mesh(
+        vtmesh: bmap.BMMesh,
+        material_cret_map: dict[bmap.BMMaterial, bpy.types.Material]
+        ) -> _VirtoolsMeshData:
+    # all data are collected into numpy array and converted by whole-array operations.
+    # vertex data
+    vertex_pos: numpy.ndarray = UTIL_virtools_types.vxvector3_array_from_iterator(
+        vtmesh.get_vertex_positions(), vtmesh.get_vertex_count())
+    UTIL_virtools_types.vxvector3_array_conv_co(vertex_pos)
+    vertex_nml: numpy.ndarray = UTIL_virtools_types.vxvector3_array_from_iterator(
+        vtmesh.get_vertex_normals(), vtmesh.get_vertex_count())
+    UTIL_virtools_types.vxvector3_array_conv_co(vertex_nml)
+    vertex_uv: numpy.ndarray = UTIL_virtools_types.vxvector2_array_from_iterator(
+        vtmesh.get_vertex_uvs(), vtmesh.get_vertex_count())
+    UTIL_virtools_types.vxvector2_array_conv_co(vertex_uv)
+
+    # face data
+    # virtools use the same index for position, normal and uv.
+    # and swap indices order like FaceData.conv_co() does.
+    face_indices: numpy.ndarray = UTIL_virtools_types.ckfaceindices_array_from_iterator(
+        vtmesh.get_face_indices(), vtmesh.get_face_count())
+    face_indices = face_indices[:, ::-1].ravel()
+    face_mtl_idx: numpy.ndarray = numpy.fromiter(
+        vtmesh.get_face_material_slot_indexs(), dtype = numpy.int64, count = vtmesh.get_face_count())
+
+    # material slot data
+    mtl_slots: tuple[bpy.types.Material | None, ...] = tuple(
+        (material_cret_map.get(vtmtl, None) if vtmtl else None) for vtmtl in vtmesh.get_material_slots()
+    )
+
+    return _VirtoolsMeshData(vertex_pos, vertex_nml, vertex_uv, face_indices, face_mtl_idx, mtl_slots)
+
 def _import_virtools_meshes(
         reader: bmap.BMFileReader, 
         progress: ProgressReport,
         resolver: UTIL_ioport_shared.ConflictResolver, 
+        use_welding: bool,
+        use_sharing: bool,
         material_cret_map: dict[bmap.BMMaterial, bpy.types.Material]
         ) -> dict[bmap.BMMesh, bpy.types.Mesh]:
     # create map and prepare progress
@@ -234,7 +323,29 @@ def _import_virtools_meshes(
     tr_text: str = bpy.app.translations.pgettext_rpt('Loading Meshes', 'BBP_OT_import_virtools/execute')
     progress.enter_substeps(reader.get_mesh_count(), tr_text)
 
+    # map fingerprint to created mesh if mesh sharing is ordered
+    fingerprint_map: dict[str, bpy.types.Mesh] = {}
+
     for vtmesh in reader.get_meshs():
+        # try sharing existing mesh if ordered.
+        mesh_data: _VirtoolsMeshData | None = None
+        fingerprint: str | None = None
+        if use_sharing:
+            mesh_data = _read_virtools_mesh(vtmesh, material_cret_map)
+            face_indices: numpy.ndarray = mesh_data.face_indices.reshape(-1, 3)
+            tags: list[str] = [str(vtmesh.get_lit_mode())]
+            tags.extend(('' if mtl is None else mtl.name) for mtl in mesh_data.mtl_slots)
+            fingerprint = UTIL_blender_mesh.get_geometry_fingerprint(
+                mesh_data.vertex_pos, mesh_data.vertex_nml, mesh_data.vertex_uv,
+                UTIL_blender_mesh.FaceArrayData(face_indices, face_indices, face_indices, mesh_data.face_mtl_idx),
+                tags
+            )
+            shared_mesh: bpy.types.Mesh | None = fingerprint_map.get(fingerprint, None)
+            if shared_mesh is not None:
+                mesh_cret_map[vtmesh] = shared_mesh
+                progress.step()
+                continue
+
         # create mesh
         (mesh, init_mesh) = resolver.create_mesh(
             UTIL_virtools_types.virtools_name_regulator(vtmesh.get_name())
@@ -242,68 +353,34 @@ def _import_virtools_meshes(
 
         # set mesh data if necessary
         if init_mesh:
+            # read data if we have not read it
+            if mesh_data is None:
+                mesh_data = _read_virtools_mesh(vtmesh, material_cret_map)
+
+            # weld coincident vertices if ordered.
+            # only position indices are changed,
+            # normal and uv still use original indices so that they are kept per face corner.
+            vertex_pos: numpy.ndarray = mesh_data.vertex_pos
+            face_pos_indices: numpy.ndarray = mesh_data.face_indices
+            if use_welding:
+                vertex_pos, face_pos_indices = UTIL_blender_mesh.weld_vertex_positions(vertex_pos, face_pos_indices)
+
             # open mesh writer
             with UTIL_blender_mesh.MeshWriter(mesh) as meshoper:
                 # construct data provider
-                data_prov: UTIL_blender_mesh.MeshWriterIngredient = UTIL_blender_mesh.MeshWriterIngredient()
-
-                # constructor data itor
-                def pos_iterator() -> typing.Iterator[UTIL_virtools_types.VxVector3]:
-                    for v in vtmesh.get_vertex_positions():
-                        UTIL_virtools_types.vxvector3_conv_co(v)
-                        yield v
-                def nml_iterator() -> typing.Iterator[UTIL_virtools_types.VxVector3]:
-                    for v in vtmesh.get_vertex_normals():
-                        UTIL_virtools_types.vxvector3_conv_co(v)
-                        yield v
-                def uv_iterator() -> typing.Iterator[UTIL_virtools_types.VxVector2]:
-                    for v in vtmesh.get_vertex_uvs():
-                        UTIL_virtools_types.vxvector2_conv_co(v)
-                        yield v
-                def face_iterator() -> typing.Iterator[UTIL_blender_mesh.FaceData]:
-                    face: UTIL_blender_mesh.FaceData = UTIL_blender_mesh.FaceData(
-                        [UTIL_blender_mesh.FaceVertexData() for i in range(3)]
-                    )
-
-                    findices_itor = vtmesh.get_face_indices()
-                    fmtl_itor = vtmesh.get_face_material_slot_indexs()
-                    for _ in range(vtmesh.get_face_count()):
-                        # set indices data
-                        vtindices = next(findices_itor)
-                        face.mIndices[0].mPosIdx = vtindices.i1
-                        face.mIndices[0].mNmlIdx = vtindices.i1
-                        face.mIndices[0].mUvIdx = vtindices.i1
-                        face.mIndices[1].mPosIdx = vtindices.i2
-                        face.mIndices[1].mNmlIdx = vtindices.i2
-                        face.mIndices[1].mUvIdx = vtindices.i2
-                        face.mIndices[2].mPosIdx = vtindices.i3
-                        face.mIndices[2].mNmlIdx = vtindices.i3
-                        face.mIndices[2].mUvIdx = vtindices.i3
-                        # swap indices
-                        face.conv_co()
-
-                        # set mtl data
-                        vtmtl = next(fmtl_itor)
-                        face.mMtlIdx = vtmtl
-
-                        # return
-                        yield face
-                def mtl_iterator() -> typing.Iterator[bpy.types.Material | None]:
-                    for vtmtl in vtmesh.get_material_slots():
-                        if vtmtl:
-                            yield material_cret_map.get(vtmtl, None)
-                        else:
-                            yield None
-
-                # assign to data provider
-                data_prov.mVertexPosition = pos_iterator()
-                data_prov.mVertexNormal = nml_iterator()
-                data_prov.mVertexUV = uv_iterator()
-                data_prov.mFace = face_iterator()
-                data_prov.mMaterial = mtl_iterator()
+                data_prov: UTIL_blender_mesh.MeshWriterBulkIngredient = UTIL_blender_mesh.MeshWriterBulkIngredient()
+                data_prov.mVertexPosition = vertex_pos
+                data_prov.mVertexNormal = mesh_data.vertex_nml
+                data_prov.mVertexUV = mesh_data.vertex_uv
+                data_prov.mFacePosIndices = face_pos_indices
+                data_prov.mFaceNmlIndices = mesh_data.face_indices
+                data_prov.mFaceUvIndices = mesh_data.face_indices
+                data_prov.mFaceVertexCount = numpy.full(vtmesh.get_face_count(), 3, dtype = numpy.int64)
+                data_prov.mFaceMtlIdx = mesh_data.face_mtl_idx
+                data_prov.mMaterial = iter(mesh_data.mtl_slots)
 
                 # add part
-                meshoper.add_ingredient(data_prov)
+                meshoper.add_bulk_ingredient(data_prov)
 
             # end of mesh writer
 
@@ -312,6 +389,11 @@ def _import_virtools_meshes(
             mesh_settings.mLitMode = vtmesh.get_lit_mode()
             PROP_virtools_mesh.set_raw_virtools_mesh(mesh, mesh_settings)
 
+            # only share mesh built from this file.
+            # existing mesh kept by resolver may hold different data.
+            if fingerprint is not None:
+                fingerprint_map[fingerprint] = mesh
+
         # add into map and step
         mesh_cret_map[vtmesh] = mesh
         progress.step()
@@ -1,4 +1,4 @@
-import bpy, bmesh, mathutils
+import bpy, bmesh, numpy
 import typing
 from . import PROP_ptrprop_resolver
 from . import UTIL_virtools_types, UTIL_icons_manager, UTIL_functions
@@ -89,66 +89,37 @@ def _get_rail_target(context: bpy.types.Context) -> tuple[bool, typing.Iterable[
     # return valid
     return (has_invalid_objs, meshes)
 
-def _tt_reflection_mapping_compute(
-        point_: UTIL_virtools_types.ConstVxVector3, 
-        nml_: UTIL_virtools_types.ConstVxVector3, 
-        refobj_: UTIL_virtools_types.ConstVxVector3) -> UTIL_virtools_types.ConstVxVector2:
-    # switch blender coord to virtools coord for convenient calc
-    point: mathutils.Vector = mathutils.Vector((point_[0], point_[2], point_[1]))
-    nml: mathutils.Vector = mathutils.Vector((nml_[0], nml_[2], nml_[1])).normalized()
-    refobj: mathutils.Vector = mathutils.Vector((refobj_[0], refobj_[2], refobj_[1]))
-
-    p: mathutils.Vector = (refobj - point).normalized()
-    b: mathutils.Vector = (((2 * (p * nml)) * nml) - p)
-    b.normalize()
-    
-    # convert back to blender coord
-    return ((b.x + 1.0) / 2.0, -(b.z + 1.0) / 2.0)
-
-
-def _set_face_vertex_uv(face: bpy.types.MeshPolygon, uv_layer: bpy.types.MeshUVLoopLayer, idx: int, uv: UTIL_virtools_types.ConstVxVector2) -> None:
-    """
-    Help function to set face vertex uv by index.
-
-    @param face[in] The face to be set.
-    @param uv_layer[in] The uv layer to be set gotten from `Mesh.uv_layers.active`
-    @param idx[in] The index related to face to set uv.
-    @param uv[in] The uv data.
-    """
-    uv_layer.uv[face.loop_start + idx].vector = uv
-
-def _get_face_vertex_pos(face: bpy.types.MeshPolygon, loops: bpy.types.MeshLoops, vecs: bpy.types.MeshVertices, idx: int) -> UTIL_virtools_types.ConstVxVector3:
-    """
-    Help function. Get face referenced vertex position data by index
+def _normalize_rows(vecs: numpy.ndarray) -> numpy.ndarray:
+    # same as mathutils normalize, zero vector is kept as zero.
+    lengths: numpy.ndarray = numpy.linalg.norm(vecs, axis = 1, keepdims = True)
+    return vecs / numpy.where(lengths == 0, 1, lengths)
 
-    @param face[in] The face to be set.
-    @param loops[in] Mesh loops gotten from `Mesh.loops`
-    @param vecs[in] Mesh vertices gotten from `Mesh.vertices`
-    @param idx[in] The index related to face to get position.
-    """
-    v: mathutils.Vector = vecs[loops[face.loop_start + idx].vertex_index].co
-    return (v[0], v[1], v[2])
-
-def _get_face_vertex_nml(face: bpy.types.MeshPolygon, loops: bpy.types.MeshLoops, idx: int) -> UTIL_virtools_types.ConstVxVector3:
-    """
-    Help function to get face vertex normal.
-
-    Similar to _get_face_vertex_pos, just get normal, not position.
-
-    @param face[in] The face to be set.
-    @param loops[in] Mesh loops gotten from `Mesh.loops`
-    @param idx[in] The index related to face to get normal.
-    """
-    v: mathutils.Vector = loops[face.loop_start + idx].normal
-    return (v[0], v[1], v[2])
-
-def _get_face_vertex_count(face: bpy.types.MeshPolygon) -> int:
+def _tt_reflection_mapping_compute(
+        points_: numpy.ndarray, 
+        nmls_: numpy.ndarray, 
+        refobj_: UTIL_virtools_types.ConstVxVector3) -> numpy.ndarray:
     """
-    Help function to get how many vertex used by this face.
+    Compute TT_ReflectionMapping UV for all given points at once.
 
-    @return The count of used vertex. At least 3.
+    @param points_[in] The (n, 3) array of point positions.
+    @param nmls_[in] The (n, 3) array of point normals.
+    @param refobj_[in] The position of reference object.
+    @return The (n, 2) array of UV.
     """
-    return face.loop_total
+    # switch blender coord to virtools coord for convenient calc
+    swizzle: tuple[int, int, int] = (0, 2, 1)
+    points: numpy.ndarray = points_[:, swizzle]
+    nmls: numpy.ndarray = _normalize_rows(nmls_[:, swizzle])
+    refobj: numpy.ndarray = numpy.array(refobj_, dtype = numpy.float64)[list(swizzle)]
+
+    p: numpy.ndarray = _normalize_rows(refobj - points)
+    # YYC MARK:
+    # `p * nml` is component-wise product of mathutils Vector, not dot product.
+    # keep this behavior for compatibility with previous generated UV.
+    b: numpy.ndarray = _normalize_rows(((2 * (p * nmls)) * nmls) - p)
+    
+    # convert back to blender coord
+    return numpy.stack(((b[:, 0] + 1.0) / 2.0, -(b[:, 2] + 1.0) / 2.0), axis = 1)
 
 def _create_rail_uv(meshes: typing.Iterable[bpy.types.Mesh], mtl: bpy.types.Material):
     for mesh in meshes:
@@ -162,23 +133,25 @@ def _create_rail_uv(meshes: typing.Iterable[bpy.types.Mesh], mtl: bpy.types.Mate
         if mesh.uv_layers.active is None:
             mesh.uv_layers.new(do_init = False)
         uv_layer: bpy.types.MeshUVLoopLayer = mesh.uv_layers.active
-        # get other useful data
-        loops: bpy.types.MeshLoops = mesh.loops
-        vecs: bpy.types.MeshVertices = mesh.vertices
 
+        # fetch vertex positions and loop data in arrays
+        vertex_count: int = len(mesh.vertices)
+        loop_count: int = len(mesh.loops)
+        vertex_pos: numpy.ndarray = numpy.empty(vertex_count * 3, dtype = numpy.float32)
+        mesh.vertices.foreach_get('co', vertex_pos)
+        loop_vertex_index: numpy.ndarray = numpy.empty(loop_count, dtype = numpy.int32)
+        mesh.loops.foreach_get('vertex_index', loop_vertex_index)
+        loop_nml: numpy.ndarray = numpy.empty(loop_count * 3, dtype = numpy.float32)
+        mesh.loops.foreach_get('normal', loop_nml)
+
+        # compute uv for all loops and write it back
         refobj: UTIL_virtools_types.ConstVxVector3 = (0.0, 0.0, 0.0)
-        for face in mesh.polygons:
-            for idx in range(_get_face_vertex_count(face)):
-                _set_face_vertex_uv(
-                    face,
-                    uv_layer,
-                    idx,
-                    _tt_reflection_mapping_compute(
-                        _get_face_vertex_pos(face, loops, vecs, idx),
-                        _get_face_vertex_nml(face, loops, idx),
-                        refobj
-                    )
-                )
+        uv: numpy.ndarray = _tt_reflection_mapping_compute(
+            vertex_pos.reshape(-1, 3).astype(numpy.float64)[loop_vertex_index],
+            loop_nml.reshape(-1, 3).astype(numpy.float64),
+            refobj
+        )
+        uv_layer.uv.foreach_set('vector', uv.astype(numpy.float32).ravel())
 
 #endregion
 
@@ -8,10 +8,16 @@ from . import UTIL_naming_convention
 class RawPreferences():
     mBallanceTextureFolder: str = datafield(default="")
     mNoComponentCollection: str = datafield(default="")
+    mTextureCacheFolder: str = datafield(default="")
+    mTextureCacheSize: int = datafield(default=512)
+    mBMEGeometryCacheSize: int = datafield(default=32)
 
     def has_valid_blc_tex_folder(self) -> bool:
         return os.path.isdir(self.mBallanceTextureFolder)
 
+    def has_valid_tex_cache_folder(self) -> bool:
+        return os.path.isdir(self.mTextureCacheFolder)
+
 DEFAULT_RAW_PREFERENCES = RawPreferences()
 
 class BBPPreferences(bpy.types.AddonPreferences):
@@ -32,6 +38,30 @@ class BBPPreferences(bpy.types.AddonPreferences):
         translation_context = 'BBPPreferences/property'
     ) # type: ignore
     
+    texture_cache_folder: bpy.props.StringProperty(
+        name = "Texture Cache Folder",
+        description = "The path to folder where encoded non-Ballance textures are cached across exporting. Leave it empty to disable cache.",
+        subtype = 'DIR_PATH',
+        default = DEFAULT_RAW_PREFERENCES.mTextureCacheFolder,
+        translation_context = 'BBPPreferences/property'
+    ) # type: ignore
+    
+    texture_cache_size: bpy.props.IntProperty(
+        name = "Texture Cache Size (MB)",
+        description = "The maximum size of texture cache folder. Least recently used textures will be removed when exceeded.",
+        min = 1,
+        default = DEFAULT_RAW_PREFERENCES.mTextureCacheSize,
+        translation_context = 'BBPPreferences/property'
+    ) # type: ignore
+    
+    bme_geometry_cache_size: bpy.props.IntProperty(
+        name = "BME Geometry Cache Size",
+        description = "The maximum count of generated BME structure geometries kept in memory for reusing. Zero to disable cache.",
+        min = 0,
+        default = DEFAULT_RAW_PREFERENCES.mBMEGeometryCacheSize,
+        translation_context = 'BBPPreferences/property'
+    ) # type: ignore
+    
     def draw(self, context):
         layout: bpy.types.UILayout = self.layout
         
@@ -41,6 +71,10 @@ class BBPPreferences(bpy.types.AddonPreferences):
         col.prop(self, "ballance_texture_folder", text = "")
         col.label(text="No Component Collection", text_ctxt='BBPPreferences/draw')
         col.prop(self, "no_component_collection", text = "")
+        col.label(text="Texture Cache Folder", text_ctxt='BBPPreferences/draw')
+        col.prop(self, "texture_cache_folder", text = "")
+        col.prop(self, "texture_cache_size")
+        col.prop(self, "bme_geometry_cache_size")
 
 def get_preferences() -> BBPPreferences:
     return bpy.context.preferences.addons[__package__].preferences
@@ -51,6 +85,10 @@ def get_raw_preferences() -> RawPreferences:
 
     rawdata.mBallanceTextureFolder = pref.ballance_texture_folder
     rawdata.mNoComponentCollection = pref.no_component_collection
+    # resolve relative path like `//cache`, which is relative to current blender file.
+    rawdata.mTextureCacheFolder = bpy.path.abspath(pref.texture_cache_folder)
+    rawdata.mTextureCacheSize = pref.texture_cache_size
+    rawdata.mBMEGeometryCacheSize = pref.bme_geometry_cache_size
 
     return rawdata
 
@@ -1,5 +1,5 @@
-import bpy, bpy_extras
-import typing, os
+import bpy, bpy_extras, numpy
+import typing, os, hashlib
 from . import PROP_preferences
 from . import UTIL_functions
 
@@ -279,7 +279,7 @@ def load_ballance_texture(texname: str) -> bpy.types.Image:
 
     return ret
 
-def load_other_texture(texname: str) -> bpy.types.Image:
+def load_other_texture(texname: str, texdata: bytes | None = None) -> bpy.types.Image:
     """!
     Load the Texture which is not a part of Ballance texture.
 
@@ -292,6 +292,7 @@ def load_other_texture(texname: str) -> bpy.types.Image:
     + Loading will NOT check any loaded image according to file path.
 
     @param texname[in] the absolute path to the loading image.
+    @param texdata[in] the content of loading image file which has been read, or None to read it from file when packing.
     @return The loaded image.
     """
     
@@ -300,7 +301,10 @@ def load_other_texture(texname: str) -> bpy.types.Image:
     ret: bpy.types.Image = bpy.data.images.load(texname, check_existing = False)
     
     # then immediately pack it into file.
-    ret.pack()
+    if texdata is None:
+        ret.pack()
+    else:
+        ret.pack(data = texdata, data_len = len(texdata))
     
     return ret
 
@@ -333,3 +337,111 @@ def save_other_texture(tex: bpy.types.Image, filepath: str) -> None:
     tex.save(filepath = filepath)
 
 #endregion
+
+#region Other Texture Cache
+
+def _get_other_texture_cache_key(tex: bpy.types.Image) -> str:
+    """!
+    Compute the cache key of given texture.
+
+    The key is computed from the format used when saving it, image size and the data which will be saved.
+    Fetching and hashing the float pixels of image is expensive, so packed data is used if possible:
+    + Packed image which is not edited is keyed by its packed file data.
+    + Otherwise, image is keyed by its pixels.
+    External image is not keyed by its file, because its pixels in memory may differ from the file on disk.
+
+    @param tex[in] The texture to compute key.
+    @return The hex string of cache key.
+    """
+    hasher = hashlib.blake2b(digest_size = 16)
+
+    # hash save format and image layout
+    hasher.update(tex.file_format.encode('utf-8'))
+    hasher.update(os.path.splitext(get_texture_filepath(tex))[1].lower().encode('utf-8'))
+    hasher.update(repr((tuple(tex.size), tex.channels)).encode('utf-8'))
+
+    # the pixels of dirty image is different with its source, so it must be keyed by pixels.
+    if not tex.is_dirty:
+        if tex.packed_file is not None:
+            hasher.update(b'packed')
+            hasher.update(tex.packed_file.data)
+            return hasher.hexdigest()
+
+    # hash pixels. use foreach_get to fetch them in bulk.
+    hasher.update(b'pixels')
+    pixels: numpy.ndarray = numpy.empty(len(tex.pixels), dtype = numpy.float32)
+    tex.pixels.foreach_get(pixels)
+    hasher.update(pixels.tobytes())
+
+    return hasher.hexdigest()
+
+def save_other_texture_cached(tex: bpy.types.Image, cache_folder: str) -> str:
+    """!
+    Save the texture which is not a part of Ballance texture into persistent cache folder.
+
+    This function is the cached version of the combination of generate_other_texture_save_path and save_other_texture.
+    The texture is stored in a sub folder named by its cache key, with its original file name,
+    so the file name written into Virtools file is not changed.
+    If the same texture has been saved before, no saving will be operated and the cached file is returned directly.
+
+    @param tex[in] The saving texture
+    @param cache_folder[in] The absolute path to cache folder.
+    @return The path to saved file.
+    """
+    entry_folder: str = os.path.join(cache_folder, _get_other_texture_cache_key(tex))
+    filepath: str = generate_other_texture_save_path(tex, entry_folder)
+
+    if os.path.isfile(filepath):
+        # cache hit. touch entry to update its last used time for eviction.
+        os.utime(entry_folder)
+    else:
+        # cache miss. save into a temporary file first then rename it,
+        # so that an interrupted saving will not leave a broken entry.
+        os.makedirs(entry_folder, exist_ok = True)
+        (filestem, fileext) = os.path.splitext(filepath)
+        temp_filepath: str = f'{filestem}.tmp{fileext}'
+        save_other_texture(tex, temp_filepath)
+        os.replace(temp_filepath, filepath)
+
+    return filepath
+
+def evict_other_texture_cache(cache_folder: str, max_size: int, used_files: typing.Iterable[str] = ()) -> None:
+    """!
+    Remove least recently used entries from cache folder until its size is not greater than given size.
+
+    The entries used by current exporting are never removed, even if cache folder is still too large.
+    This function should be called after saving Virtools file, because Virtools engine may read cached files when saving.
+
+    @param cache_folder[in] The absolute path to cache folder.
+    @param max_size[in] The maximum size of cache folder in bytes.
+    @param used_files[in] The cached files returned by save_other_texture_cached() in current exporting.
+    """
+    # collect the entries which can not be removed
+    used_entries: set[str] = set(os.path.normcase(os.path.dirname(os.path.abspath(f))) for f in used_files)
+
+    # collect entries and their size
+    entries: list[tuple[float, int, str]] = []
+    total_size: int = 0
+    with os.scandir(cache_folder) as it:
+        for entry in it:
+            if not entry.is_dir(): continue
+            entry_size: int = 0
+            with os.scandir(entry.path) as entry_it:
+                for entry_file in entry_it:
+                    if entry_file.is_file():
+                        entry_size += entry_file.stat().st_size
+            total_size += entry_size
+            if os.path.normcase(os.path.abspath(entry.path)) in used_entries: continue
+            entries.append((entry.stat().st_mtime, entry_size, entry.path))
+
+    # remove oldest entries
+    entries.sort()
+    for _, entry_size, entry_path in entries:
+        if total_size <= max_size: break
+        with os.scandir(entry_path) as entry_it:
+            for entry_file in entry_it:
+                os.remove(entry_file.path)
+        os.rmdir(entry_path)
+        total_size -= entry_size
+
+#endregion
@@ -1,5 +1,5 @@
-import bpy, bmesh, mathutils
-import typing, array, collections
+import bpy, bmesh, mathutils, numpy
+import typing, array, collections, hashlib
 from . import UTIL_functions, UTIL_virtools_types
 
 ## Blender Mesh Usage
@@ -47,6 +47,30 @@ class FaceData():
     def is_indices_legal(self) -> bool:
         return len(self.mIndices) >= 3
 
+class FaceArrayData():
+    """
+    The array version of FaceData, for triangle faces only.
+    Each field is a contiguous numpy array, and row i of them describe the i-th face together.
+    """
+    mPosIndices: numpy.ndarray ##< int32 array in (N, 3) shape. Face vertex position indices.
+    mNmlIndices: numpy.ndarray ##< int32 array in (N, 3) shape. Face vertex normal indices.
+    mUvIndices: numpy.ndarray ##< int32 array in (N, 3) shape. Face vertex uv indices.
+    mMtlIdx: numpy.ndarray ##< int32 array in (N, ) shape. Same rule with FaceData.mMtlIdx.
+    
+    def __init__(self, pos: numpy.ndarray, nml: numpy.ndarray, uv: numpy.ndarray, mtlidx: numpy.ndarray):
+        self.mPosIndices = pos
+        self.mNmlIndices = nml
+        self.mUvIndices = uv
+        self.mMtlIdx = mtlidx
+    
+    def conv_co(self) -> None:
+        """
+        Change indice order between Virtools and Blender for all faces.
+        """
+        self.mPosIndices = self.mPosIndices[:, ::-1]
+        self.mNmlIndices = self.mNmlIndices[:, ::-1]
+        self.mUvIndices = self.mUvIndices[:, ::-1]
+
 class MeshWriterIngredient():
     mVertexPosition: typing.Iterator[UTIL_virtools_types.VxVector3] | None
     mVertexNormal: typing.Iterator[UTIL_virtools_types.VxVector3] | None
@@ -69,6 +93,48 @@ class MeshWriterIngredient():
         if self.mMaterial is None: return False
         return True
 
+class MeshWriterBulkIngredient():
+    """
+    The array version of MeshWriterIngredient.
+    All geometry data is provided by contiguous numpy array,
+    so that MeshWriter can append them without creating any per-element Python object.
+    Like MeshWriterIngredient, all indices are based on 0 and only refer to the data inside this ingredient.
+    """
+    mVertexPosition: numpy.ndarray | None ##< float32 array in (N, 3) shape.
+    mVertexNormal: numpy.ndarray | None ##< float32 array in (N, 3) shape.
+    mVertexUV: numpy.ndarray | None ##< float32 array in (N, 2) shape.
+    ## Integer array. Face vertex position indices of all faces in series.
+    #  Length must be the sum of each items in mFaceVertexCount.
+    mFacePosIndices: numpy.ndarray | None
+    mFaceNmlIndices: numpy.ndarray | None ##< Same as mFacePosIndices, but store face vertex normal index.
+    mFaceUvIndices: numpy.ndarray | None ##< Same as mFacePosIndices, but store face vertex uv index.
+    mFaceVertexCount: numpy.ndarray | None ##< Integer array. Length is face count. Each item indicate the vertex count of face.
+    mFaceMtlIdx: numpy.ndarray | None ##< Integer array. Length is face count. Same rule with FaceData.mMtlIdx.
+    mMaterial: typing.Iterator[bpy.types.Material | None] | None
+    
+    def __init__(self):
+        self.mVertexPosition = None
+        self.mVertexNormal = None
+        self.mVertexUV = None
+        self.mFacePosIndices = None
+        self.mFaceNmlIndices = None
+        self.mFaceUvIndices = None
+        self.mFaceVertexCount = None
+        self.mFaceMtlIdx = None
+        self.mMaterial = None
+    
+    def is_valid(self) -> bool:
+        if self.mVertexPosition is None: return False
+        if self.mVertexNormal is None: return False
+        if self.mVertexUV is None: return False
+        if self.mFacePosIndices is None: return False
+        if self.mFaceNmlIndices is None: return False
+        if self.mFaceUvIndices is None: return False
+        if self.mFaceVertexCount is None: return False
+        if self.mFaceMtlIdx is None: return False
+        if self.mMaterial is None: return False
+        return True
+
 def _flat_vxvector3(it: typing.Iterator[UTIL_virtools_types.VxVector3]) -> typing.Iterator[float]:
     for entry in it:
         yield entry.x
@@ -80,27 +146,121 @@ def _flat_vxvector2(it: typing.Iterator[UTIL_virtools_types.VxVector2]) -> typin
         yield entry.x
         yield entry.y
 
-def _flat_face_nml_index(nml_idx: array.array, nml_array: array.array) -> typing.Iterator[float]:
-    for idx in nml_idx:
-        pos: int = idx * 3
-        yield nml_array[pos]
-        yield nml_array[pos + 1]
-        yield nml_array[pos + 2]
-
-def _flat_face_uv_index(uv_idx: array.array, uv_array: array.array) -> typing.Iterator[float]:
-    for idx in uv_idx:
-        pos: int = idx * 2
-        yield uv_array[pos]
-        yield uv_array[pos + 1]
-
-def _nest_custom_split_normal(nml_array: array.array) -> typing.Iterator[UTIL_virtools_types.ConstVxVector3]:
-    # following statement create a iterator for normals array by `iter(nml_array)`
-    # then triple it, because iterator is a reference type, so 3 items of this tuple is pointed to the same iterator and share the same iteration progress.
-    # then use star macro to pass it to zip, it will cause zip receive 3 params pointing to the same iterator.
-    # now zip() will call 3 param‘s __next__() function from left to right.
-    # zip will get following iteration result because all iterator are the same one: (0, 1, 2), (3, 4, 5) and etc (number is index to corresponding value).
-    # finally, use tuple to expand it to a tuple, not a generator.
-    return tuple(zip(*(iter(nml_array), ) * 3))
+def _as_numpy_array(arr: array.array) -> numpy.ndarray:
+    """
+    Create a numpy view for given array. No copy happened.
+    Please note that given array can not be resized before the returned view is released.
+    """
+    return numpy.frombuffer(arr, dtype = numpy.dtype(arr.typecode))
+
+def _extend_from_numpy_array(arr: array.array, data: numpy.ndarray) -> None:
+    """
+    Append all items of given numpy array into given array without creating per-element Python object.
+    """
+    arr.frombytes(numpy.ascontiguousarray(data, dtype = numpy.dtype(arr.typecode)).tobytes())
+
+## The quantization step used when welding vertices.
+#  Components which are closer than this value will be treated as the same value.
+c_WeldPrecision: float = 1e-5
+
+def weld_vertex_arrays(
+        vertex_pos: numpy.ndarray,
+        vertex_nml: numpy.ndarray,
+        vertex_uv: numpy.ndarray,
+        face_array: FaceArrayData,
+        precision: float = c_WeldPrecision
+        ) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, FaceArrayData]:
+    """
+    Merge the face corners which have the same position, normal and uv.
+
+    Each face corner is keyed by its quantized (position, normal, uv) tuple,
+    and all corners sharing the same key are merged into one vertex.
+    The result is compacted position, normal and uv arrays which have the same length,
+    and a new FaceArrayData whose position, normal and uv indices are identical.
+    The order of result vertices follows the first appearance of them in faces.
+    """
+    # collect the data of each face corner
+    corner_pos: numpy.ndarray = vertex_pos[face_array.mPosIndices.ravel()]
+    corner_nml: numpy.ndarray = vertex_nml[face_array.mNmlIndices.ravel()]
+    corner_uv: numpy.ndarray = vertex_uv[face_array.mUvIndices.ravel()]
+
+    # build quantized key and find unique ones
+    keys: numpy.ndarray = numpy.rint(
+        numpy.concatenate((corner_pos, corner_nml, corner_uv), axis = 1) / precision
+    ).astype(numpy.int64)
+    _, first_index, inverse = numpy.unique(keys, axis = 0, return_index = True, return_inverse = True)
+    inverse = inverse.reshape(-1)
+
+    # numpy.unique sort keys, so we reorder them by their first appearance
+    order: numpy.ndarray = numpy.argsort(first_index)
+    remap: numpy.ndarray = numpy.empty_like(order)
+    remap[order] = numpy.arange(len(order))
+    first_index = first_index[order]
+
+    # build result
+    face_indices: numpy.ndarray = remap[inverse].astype(numpy.int32).reshape(-1, 3)
+    return (
+        corner_pos[first_index],
+        corner_nml[first_index],
+        corner_uv[first_index],
+        FaceArrayData(face_indices, face_indices.copy(), face_indices.copy(), face_array.mMtlIdx)
+    )
+
+def weld_vertex_positions(
+        vertex_pos: numpy.ndarray,
+        face_pos_indices: numpy.ndarray,
+        precision: float = c_WeldPrecision
+        ) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Merge the vertices which have the same quantized position.
+
+    Only position is welded. The caller should keep using the original normal and uv indices,
+    so that split normals and uvs are still stored per face corner.
+    Return the compacted position array and the remapped face position indices.
+    """
+    # build position index by hashing quantized position
+    keys: numpy.ndarray = numpy.rint(vertex_pos / precision).astype(numpy.int64)
+    _, first_index, inverse = numpy.unique(keys, axis = 0, return_index = True, return_inverse = True)
+    inverse = inverse.reshape(-1)
+
+    # keep the original vertex order as far as possible
+    order: numpy.ndarray = numpy.argsort(first_index)
+    remap: numpy.ndarray = numpy.empty_like(order)
+    remap[order] = numpy.arange(len(order))
+
+    return (vertex_pos[first_index[order]], remap[inverse][face_pos_indices])
+
+def get_geometry_fingerprint(
+        vertex_pos: numpy.ndarray,
+        vertex_nml: numpy.ndarray,
+        vertex_uv: numpy.ndarray,
+        face_array: FaceArrayData,
+        tags: typing.Iterable[str]
+        ) -> str:
+    """
+    Compute a content fingerprint for given mesh geometry.
+
+    The fingerprint covers vertex positions, normals, uvs, face indices and face material indices.
+    `tags` is used to include other data which affect the identity of mesh but not stored in arrays,
+    for example, the name of materials in each slot and the lit mode.
+    Two meshes have the same fingerprint only if all of these data are byte-identical.
+    """
+    hasher = hashlib.blake2b(digest_size = 16)
+    for arr, dtype in (
+            (vertex_pos, numpy.float32),
+            (vertex_nml, numpy.float32),
+            (vertex_uv, numpy.float32),
+            (face_array.mPosIndices, numpy.int32),
+            (face_array.mNmlIndices, numpy.int32),
+            (face_array.mUvIndices, numpy.int32),
+            (face_array.mMtlIdx, numpy.int32)):
+        # shape is also hashed, to distinguish different layouts sharing the same bytes
+        hasher.update(repr(arr.shape).encode('utf-8'))
+        hasher.update(numpy.ascontiguousarray(arr, dtype = dtype).tobytes())
+    for tag in tags:
+        hasher.update(b'\0')
+        hasher.update(tag.encode('utf-8'))
+    return hasher.hexdigest()
 
 class TemporaryMesh():
     """
@@ -168,16 +328,26 @@ class MeshReader():
     The passed mesh must be created by bpy.types.Object.to_mesh() and destroyed by bpy.types.Object.to_mesh_clear().
     Because this class must trianglate mesh. To prevent change original mesh, this operations is essential.
     A helper class TemporaryMesh can help you do this.
+
+    If `use_loop_triangles` is True, this class will not rewrite mesh for triangulation.
+    Instead, it read triangle corner indices from Mesh.loop_triangles directly.
+    The result is the same as the default triangulation for the mesh which only have triangles,
+    but the split of quads and n-gons follows Blender tessellation, not the BMesh triangulation.
     """
     
     __mAssocMesh: bpy.types.Mesh ##< The binding mesh for this reader. None if this reader is invalid.
+    __mUseLoopTriangles: bool ##< True if this reader read faces from loop triangles, not the triangulated polygons.
     
-    def __init__(self, assoc_mesh: bpy.types.Mesh):
+    def __init__(self, assoc_mesh: bpy.types.Mesh, use_loop_triangles: bool = False):
         self.__mAssocMesh = assoc_mesh
+        self.__mUseLoopTriangles = use_loop_triangles
         
         # triangulate temp mesh
         if self.is_valid():
-            self.__triangulate_mesh()
+            if self.__mUseLoopTriangles:
+                self.__mAssocMesh.calc_loop_triangles()
+            else:
+                self.__triangulate_mesh()
     
     def is_valid(self) -> bool:
         return self.__mAssocMesh is not None
@@ -210,6 +380,18 @@ class MeshReader():
             cache.z = vec.co.z
             yield cache
     
+    def get_vertex_position_array(self) -> numpy.ndarray:
+        """
+        The bulk version of get_vertex_position().
+        Return a (N, 3) shape float32 array fetched by single foreach_get.
+        """
+        if not self.is_valid():
+            raise UTIL_functions.BBPException('try to call an invalid MeshReader.')
+        
+        ret: numpy.ndarray = numpy.empty(len(self.__mAssocMesh.vertices) * 3, dtype = numpy.float32)
+        self.__mAssocMesh.vertices.foreach_get('co', ret)
+        return ret.reshape(-1, 3)
+    
     def get_vertex_normal_count(self) -> int:
         if not self.is_valid():
             raise UTIL_functions.BBPException('try to call an invalid MeshReader.')
@@ -228,6 +410,18 @@ class MeshReader():
             cache.z = nml.vector.z
             yield cache
     
+    def get_vertex_normal_array(self) -> numpy.ndarray:
+        """
+        The bulk version of get_vertex_normal().
+        Return a (N, 3) shape float32 array fetched by single foreach_get.
+        """
+        if not self.is_valid():
+            raise UTIL_functions.BBPException('try to call an invalid MeshReader.')
+        
+        ret: numpy.ndarray = numpy.empty(len(self.__mAssocMesh.corner_normals) * 3, dtype = numpy.float32)
+        self.__mAssocMesh.corner_normals.foreach_get('vector', ret)
+        return ret.reshape(-1, 3)
+    
     def get_vertex_uv_count(self) -> int:
         if not self.is_valid():
             raise UTIL_functions.BBPException('try to call an invalid MeshReader.')
@@ -258,6 +452,22 @@ class MeshReader():
                 cache.y = uv.vector.y
                 yield cache
     
+    def get_vertex_uv_array(self) -> numpy.ndarray:
+        """
+        The bulk version of get_vertex_uv().
+        Return a (N, 2) shape float32 array fetched by single foreach_get.
+        """
+        if not self.is_valid():
+            raise UTIL_functions.BBPException('try to call an invalid MeshReader.')
+        
+        if self.__mAssocMesh.uv_layers.active is None:
+            # create a fake one
+            return numpy.zeros((self.get_vertex_uv_count(), 2), dtype = numpy.float32)
+        else:
+            ret: numpy.ndarray = numpy.empty(self.get_vertex_uv_count() * 2, dtype = numpy.float32)
+            self.__mAssocMesh.uv_layers.active.uv.foreach_get('vector', ret)
+            return ret.reshape(-1, 2)
+    
     def get_material_slot_count(self) -> int:
         if not self.is_valid():
             raise UTIL_functions.BBPException('try to call an invalid MeshReader.')
@@ -278,7 +488,10 @@ class MeshReader():
         if not self.is_valid():
             raise UTIL_functions.BBPException('try to call an invalid MeshReader.')
         
-        return len(self.__mAssocMesh.polygons)
+        if self.__mUseLoopTriangles:
+            return len(self.__mAssocMesh.loop_triangles)
+        else:
+            return len(self.__mAssocMesh.polygons)
     
     def get_face(self) -> typing.Iterator[FaceData]:
         if not self.is_valid():
@@ -287,6 +500,11 @@ class MeshReader():
         # detect whether we have material
         no_mtl: bool = self.get_material_slot_count() == 0
         
+        # use loop triangles if ordered
+        if self.__mUseLoopTriangles:
+            yield from self.__get_loop_triangles_face()
+            return
+        
         # use list as indices container for convenient adding and deleting.
         cache: FaceData = FaceData([], 0)
         for face in self.__mAssocMesh.polygons:
@@ -309,6 +527,69 @@ class MeshReader():
             # return value
             yield cache
     
+    def get_face_array(self) -> FaceArrayData:
+        """
+        The bulk version of get_face().
+        Decompose all faces into position, normal, uv and material index arrays in one pass.
+        Because mesh has been triangulated, all faces are triangles.
+        """
+        if not self.is_valid():
+            raise UTIL_functions.BBPException('try to call an invalid MeshReader.')
+        
+        # detect whether we have material
+        no_mtl: bool = self.get_material_slot_count() == 0
+        
+        if self.__mUseLoopTriangles:
+            # fetch from loop triangles directly
+            loop_triangles: bpy.types.MeshLoopTriangles = self.__mAssocMesh.loop_triangles
+            face_count: int = len(loop_triangles)
+            face_pos: numpy.ndarray = numpy.empty(face_count * 3, dtype = numpy.int32)
+            loop_triangles.foreach_get('vertices', face_pos)
+            face_loops: numpy.ndarray = numpy.empty(face_count * 3, dtype = numpy.int32)
+            loop_triangles.foreach_get('loops', face_loops)
+            face_mtl: numpy.ndarray = numpy.zeros(face_count, dtype = numpy.int32)
+            if not no_mtl:
+                loop_triangles.foreach_get('material_index', face_mtl)
+            face_pos = face_pos.reshape(-1, 3)
+            face_loops = face_loops.reshape(-1, 3)
+        else:
+            # fetch polygon layout and check whether all of them are triangle
+            polygons: bpy.types.MeshPolygons = self.__mAssocMesh.polygons
+            face_count: int = len(polygons)
+            loop_total: numpy.ndarray = numpy.empty(face_count, dtype = numpy.int32)
+            polygons.foreach_get('loop_total', loop_total)
+            if numpy.any(loop_total != 3):
+                raise UTIL_functions.BBPException('try to get face array from non-triangulated mesh.')
+            loop_start: numpy.ndarray = numpy.empty(face_count, dtype = numpy.int32)
+            polygons.foreach_get('loop_start', loop_start)
+            face_mtl: numpy.ndarray = numpy.zeros(face_count, dtype = numpy.int32)
+            if not no_mtl:
+                polygons.foreach_get('material_index', face_mtl)
+            
+            # normal and uv index is loop index, and position index is the vertex referred by loop.
+            loops: bpy.types.MeshLoops = self.__mAssocMesh.loops
+            loop_vertex: numpy.ndarray = numpy.empty(len(loops), dtype = numpy.int32)
+            loops.foreach_get('vertex_index', loop_vertex)
+            face_loops: numpy.ndarray = loop_start[:, numpy.newaxis] + numpy.arange(3, dtype = numpy.int32)
+            face_pos: numpy.ndarray = loop_vertex[face_loops]
+        
+        # the normal and uv of face corner is the data of its referred loop.
+        return FaceArrayData(face_pos, face_loops, face_loops.copy(), face_mtl)
+    
+    def __get_loop_triangles_face(self) -> typing.Iterator[FaceData]:
+        face_array: FaceArrayData = self.get_face_array()
+        
+        cache: FaceData = FaceData([FaceVertexData() for _ in range(3)], 0)
+        for (v1, v2, v3), (l1, l2, l3), mtl in zip(
+                face_array.mPosIndices.tolist(),
+                face_array.mNmlIndices.tolist(),
+                face_array.mMtlIdx.tolist()):
+            cache.mMtlIdx = mtl
+            (cache.mIndices[0].mPosIdx, cache.mIndices[1].mPosIdx, cache.mIndices[2].mPosIdx) = (v1, v2, v3)
+            (cache.mIndices[0].mNmlIdx, cache.mIndices[1].mNmlIdx, cache.mIndices[2].mNmlIdx) = (l1, l2, l3)
+            (cache.mIndices[0].mUvIdx, cache.mIndices[1].mUvIdx, cache.mIndices[2].mUvIdx) = (l1, l2, l3)
+            yield cache
+    
     def __resize_face_data_indices(self, ls: list[FaceVertexData], expected_size: int) -> None:
         diff: int = expected_size - len(ls)
         if diff > 0:
@@ -417,15 +698,7 @@ class MeshWriter():
         self.__mVertexUV.extend(_flat_vxvector2(data.mVertexUV))
         
         # add material slot data and create mtl remap
-        mtl_remap: list[int] = []
-        for mtl in data.mMaterial:
-            idx: int | None = self.__mMtlSlotMap.get(mtl, None)
-            if idx is not None:
-                mtl_remap.append(idx)
-            else:
-                self.__mMtlSlotMap[mtl] = len(self.__mMtlSlot)
-                mtl_remap.append(len(self.__mMtlSlot))
-                self.__mMtlSlot.append(mtl)
+        mtl_remap: list[int] = self.__add_material_slots(data.mMaterial)
         
         # add face data
         for face in data.mFace:
@@ -448,6 +721,62 @@ class MeshWriter():
             else:
                 self.__mFaceMtlIdx.append(mtl_remap[mtl_idx])
     
+    def add_bulk_ingredient(self, data: MeshWriterBulkIngredient):
+        if not self.is_valid():
+            raise UTIL_functions.BBPException('try to call an invalid MeshWriter.')
+        if not data.is_valid():
+            raise UTIL_functions.BBPException('invalid mesh part data.')
+        
+        # check face data
+        face_vertex_count: numpy.ndarray = numpy.asarray(data.mFaceVertexCount)
+        if numpy.any(face_vertex_count < 3):
+            raise UTIL_functions.BBPException('face must have at least 3 vertex.')
+        indices_count: int = int(face_vertex_count.sum())
+        if len(data.mFacePosIndices) != indices_count or len(data.mFaceNmlIndices) != indices_count or len(data.mFaceUvIndices) != indices_count:
+            raise UTIL_functions.BBPException('face indices count is not matched with face vertex count.')
+        face_mtl_idx: numpy.ndarray = numpy.asarray(data.mFaceMtlIdx)
+        if len(face_mtl_idx) != len(face_vertex_count):
+            raise UTIL_functions.BBPException('face material index count is not matched with face count.')
+        
+        # add vertex data
+        prev_vertex_pos_count: int = len(self.__mVertexPos) // 3
+        _extend_from_numpy_array(self.__mVertexPos, data.mVertexPosition)
+        prev_vertex_nml_count: int = len(self.__mVertexNormal) // 3
+        _extend_from_numpy_array(self.__mVertexNormal, data.mVertexNormal)
+        prev_vertex_uv_count: int = len(self.__mVertexUV) // 2
+        _extend_from_numpy_array(self.__mVertexUV, data.mVertexUV)
+        
+        # add material slot data and create mtl remap
+        mtl_remap: numpy.ndarray = numpy.array(self.__add_material_slots(data.mMaterial), dtype = numpy.int64)
+        
+        # add face indices with offset
+        _extend_from_numpy_array(self.__mFacePosIndices, numpy.asarray(data.mFacePosIndices, dtype = numpy.int64) + prev_vertex_pos_count)
+        _extend_from_numpy_array(self.__mFaceNmlIndices, numpy.asarray(data.mFaceNmlIndices, dtype = numpy.int64) + prev_vertex_nml_count)
+        _extend_from_numpy_array(self.__mFaceUvIndices, numpy.asarray(data.mFaceUvIndices, dtype = numpy.int64) + prev_vertex_uv_count)
+        _extend_from_numpy_array(self.__mFaceVertexCount, face_vertex_count)
+        
+        # add face mtl with remap.
+        # same as add_ingredient(), illegal index fall back to 0.
+        legal_mtl: numpy.ndarray = (face_mtl_idx >= 0) & (face_mtl_idx < len(mtl_remap))
+        remapped_mtl_idx: numpy.ndarray = numpy.zeros(len(face_mtl_idx), dtype = numpy.int64)
+        remapped_mtl_idx[legal_mtl] = mtl_remap[face_mtl_idx[legal_mtl]]
+        _extend_from_numpy_array(self.__mFaceMtlIdx, remapped_mtl_idx)
+    
+    def __add_material_slots(self, mtls: typing.Iterator[bpy.types.Material | None]) -> list[int]:
+        """
+        Add given material slots into writer and return the remap from given slot index to writer slot index.
+        """
+        mtl_remap: list[int] = []
+        for mtl in mtls:
+            idx: int | None = self.__mMtlSlotMap.get(mtl, None)
+            if idx is not None:
+                mtl_remap.append(idx)
+            else:
+                self.__mMtlSlotMap[mtl] = len(self.__mMtlSlot)
+                mtl_remap.append(len(self.__mMtlSlot))
+                self.__mMtlSlot.append(mtl)
+        return mtl_remap
+    
     def __write_mesh(self):
         # detect status
         if not self.is_valid():
@@ -459,20 +788,33 @@ class MeshWriter():
         for mtl in self.__mMtlSlot:
             self.__mAssocMesh.materials.append(mtl)
         
+        # create numpy view for all collected data.
+        # all following operations are whole-array operations on them, and pushed into mesh via foreach_set,
+        # so that no per-element Python object will be created.
+        vertex_pos: numpy.ndarray = _as_numpy_array(self.__mVertexPos)
+        vertex_nml: numpy.ndarray = _as_numpy_array(self.__mVertexNormal).reshape(-1, 3)
+        vertex_uv: numpy.ndarray = _as_numpy_array(self.__mVertexUV).reshape(-1, 2)
+        face_pos_indices: numpy.ndarray = _as_numpy_array(self.__mFacePosIndices)
+        face_nml_indices: numpy.ndarray = _as_numpy_array(self.__mFaceNmlIndices)
+        face_uv_indices: numpy.ndarray = _as_numpy_array(self.__mFaceUvIndices)
+        face_vertex_count: numpy.ndarray = _as_numpy_array(self.__mFaceVertexCount)
+        face_mtl_idx: numpy.ndarray = _as_numpy_array(self.__mFaceMtlIdx)
+        face_count: int = len(face_vertex_count)
+        
         # add corresponding count for vertex position
-        self.__mAssocMesh.vertices.add(len(self.__mVertexPos) // 3)
+        self.__mAssocMesh.vertices.add(len(vertex_pos) // 3)
         # add loops data, it is the sum count of indices
         # we use face pos indices size to get it
-        self.__mAssocMesh.loops.add(len(self.__mFacePosIndices))
+        self.__mAssocMesh.loops.add(len(face_pos_indices))
         # set face count
-        self.__mAssocMesh.polygons.add(len(self.__mFaceVertexCount))
+        self.__mAssocMesh.polygons.add(face_count)
         # create uv layer
         self.__mAssocMesh.uv_layers.new(do_init = False)
         
         # add vertex position data
-        self.__mAssocMesh.vertices.foreach_set('co', self.__mVertexPos)
+        self.__mAssocMesh.vertices.foreach_set('co', vertex_pos)
         # add face vertex pos index data
-        self.__mAssocMesh.loops.foreach_set('vertex_index', self.__mFacePosIndices)
+        self.__mAssocMesh.loops.foreach_set('vertex_index', face_pos_indices.astype(numpy.int32))
         # add face vertex nml by function via mesh custom attribute
         # NOTE: Blender 4.0 / 4.1 changed. I copy these code from FBX Importer.
         temp_normal_attribute: bpy.types.FloatVectorAttribute
@@ -480,32 +822,25 @@ class MeshWriter():
             bpy.types.FloatVectorAttribute,
             self.__mAssocMesh.attributes.new(MeshWriter.__cTempNormalAttrName, 'FLOAT_VECTOR', 'CORNER')
         )
-        temp_normal_attribute.data.foreach_set('vector',
-            tuple(_flat_face_nml_index(self.__mFaceNmlIndices, self.__mVertexNormal))
-        )
-        # add face vertex uv by function
-        self.__mAssocMesh.uv_layers.active.uv.foreach_set('vector',
-            tuple(_flat_face_uv_index(self.__mFaceUvIndices, self.__mVertexUV))
-        )   # NOTE: blender 3.5 changed. UV must be visited by .uv, not the .data
-        
-        # iterate face to set face data
-        f_vertex_idx: int = 0
-        for fi in range(len(self.__mFaceVertexCount)):
-            # set start loop
-            # NOTE: blender 3.6 changed. Loop setting in polygon do not need set loop_total any more.
-            # the loop_total will be auto calculated by the next loop_start.
-            # loop_total become read-only
-            self.__mAssocMesh.polygons[fi].loop_start = f_vertex_idx
-            
-            # set material index
-            self.__mAssocMesh.polygons[fi].material_index = self.__mFaceMtlIdx[fi]
-            
-            # set auto smooth. it is IMPORTANT
-            # because it related to whether custom split normal can work
-            self.__mAssocMesh.polygons[fi].use_smooth = True
-            
-            # inc vertex idx
-            f_vertex_idx += self.__mFaceVertexCount[fi]
+        # expand normals to each face vertex by fancy indexing
+        temp_normal_attribute.data.foreach_set('vector', vertex_nml[face_nml_indices].ravel())
+        # add face vertex uv by the same way
+        self.__mAssocMesh.uv_layers.active.uv.foreach_set('vector', vertex_uv[face_uv_indices].ravel())
+        # NOTE: blender 3.5 changed. UV must be visited by .uv, not the .data
+        
+        # set face data
+        # NOTE: blender 3.6 changed. Loop setting in polygon do not need set loop_total any more.
+        # the loop_total will be auto calculated by the next loop_start.
+        # loop_total become read-only
+        # so loop start is the exclusive prefix sum of face vertex count.
+        loop_start: numpy.ndarray = numpy.zeros(face_count, dtype = numpy.int32)
+        loop_start[1:] = numpy.cumsum(face_vertex_count[:-1])
+        self.__mAssocMesh.polygons.foreach_set('loop_start', loop_start)
+        # set material index
+        self.__mAssocMesh.polygons.foreach_set('material_index', face_mtl_idx.astype(numpy.int32))
+        # set auto smooth. it is IMPORTANT
+        # because it related to whether custom split normal can work
+        self.__mAssocMesh.polygons.foreach_set('use_smooth', numpy.ones(face_count, dtype = bool))
         
         # validate mesh.
         # it is IMPORTANT that do NOT delete custom data
@@ -521,16 +856,14 @@ class MeshWriter():
         
         # copy data from loops preserved in validate().
         # NOTE: Blender 4.0 / 4.1 changed. I copy these code from FBX Importer.
-        loops_normals = array.array('f', [0.0] * (len(self.__mAssocMesh.loops) * 3))
+        loops_normals: numpy.ndarray = numpy.empty(len(self.__mAssocMesh.loops) * 3, dtype = numpy.float32)
         temp_normal_attribute = typing.cast(
             bpy.types.FloatVectorAttribute, 
             self.__mAssocMesh.attributes[MeshWriter.__cTempNormalAttrName]
         )
         temp_normal_attribute.data.foreach_get("vector", loops_normals)
         # apply data
-        self.__mAssocMesh.normals_split_custom_set(
-            tuple(_nest_custom_split_normal(loops_normals))
-        )
+        self.__mAssocMesh.normals_split_custom_set(loops_normals.reshape(-1, 3))
         self.__mAssocMesh.attributes.remove(
             # MARK: idk why I need fucking get this attribute again.
             # But if I were not, this function must raise bullshit exception!
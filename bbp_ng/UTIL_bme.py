@@ -1,7 +1,8 @@
-import bpy, mathutils
-import os, json, enum, typing, math
-from . import PROP_virtools_group, PROP_bme_material, UTIL_naming_convention
-from . import UTIL_functions, UTIL_icons_manager, UTIL_blender_mesh, UTIL_virtools_types
+import bpy, mathutils, numpy
+import os, json, enum, typing, math, types, ast, builtins, hashlib, marshal, collections, csv, concurrent.futures.process
+from dataclasses import dataclass
+from . import PROP_virtools_group, PROP_bme_material, PROP_preferences, UTIL_naming_convention
+from . import UTIL_functions, UTIL_icons_manager, UTIL_blender_mesh, UTIL_bme_core
 
 ## NOTE: Outside caller should use BME struct's unique indetifier to visit each prototype
 #  and drive this class' functions to work.
@@ -65,103 +66,541 @@ TOKEN_INSTANCES_TRANSFORM: str = 'transform'
 
 #region Prototype Loader
 
-_g_BMEPrototypes: list[dict[str, typing.Any]] = []
-"""The list storing BME prototype."""
-_g_BMEPrototypeIndexMap: dict[str, int] = {}
-"""The dict. Key is prototype identifier. Value is the index of prototype in prototype list."""
-
-# the core loader
-for walk_root, walk_dirs, walk_files in os.walk(os.path.join(os.path.dirname(__file__), 'jsons')):
-    for relfile in walk_files:
-        if not relfile.endswith('.json'): continue
-        with open(os.path.join(walk_root, relfile), 'r', encoding = 'utf-8') as fp:
-            proto: dict[str, typing.Any]
-            for proto in json.load(fp):
-                # insert index to map
-                _g_BMEPrototypeIndexMap[proto[TOKEN_IDENTIFIER]] = len(_g_BMEPrototypes)
-                # add into list
-                _g_BMEPrototypes.append(proto)
+_c_PrototypeFolder: str = os.path.join(os.path.dirname(__file__), 'jsons')
+"""The folder storing BME prototype files."""
+_c_PrototypeIndexFile: str = os.path.join(_c_PrototypeFolder, 'prototypes.index')
+"""The prebuilt prototype index generated by `scripts/build_jsons.py`."""
+_c_PrototypeIndexVersion: int = 2
+"""The version of prebuilt prototype index. It should be synced with `scripts/build_jsons.py`."""
+_c_PrototypeCacheFile: str = os.path.join(_c_PrototypeFolder, 'prototypes.bin')
+"""The prebuilt binary prototype cache generated by `scripts/build_jsons.py`."""
+_c_PrototypeCacheVersion: int = 1
+"""The version of prebuilt binary prototype cache. It should be synced with `scripts/build_jsons.py`."""
+
+@dataclass(frozen = True)
+class _PrototypeIndexEntry():
+    file: str
+    """The path to prototype file, relative to prototype folder."""
+    offset: int
+    """The byte offset of prototype body in file. -1 if there is no offset info."""
+    length: int
+    """The byte length of prototype body in file. -1 if there is no offset info."""
+    showcase: dict[str, typing.Any] | None
+    """The showcase of prototype."""
+
+_g_BMEPrototypeIndex: dict[str, _PrototypeIndexEntry] = {}
+"""The dict. Key is prototype identifier. Value is the index entry of prototype."""
+_g_BMEPrototypes: dict[str, dict[str, typing.Any]] = {}
+"""The dict storing loaded BME prototype bodies. Key is prototype identifier."""
+
+def _list_prototype_files() -> dict[str, str]:
+    """
+    List all prototype files.
+
+    @return The dict. Key is file path relative to prototype folder (with `/` separator). Value is full path.
+    """
+    files: dict[str, str] = {}
+    for walk_root, walk_dirs, walk_files in os.walk(_c_PrototypeFolder):
+        for relfile in walk_files:
+            if not relfile.endswith('.json'): continue
+            fullfile: str = os.path.join(walk_root, relfile)
+            files[os.path.relpath(fullfile, _c_PrototypeFolder).replace(os.sep, '/')] = fullfile
+    return files
+
+def _get_prototype_files_hash(files: dict[str, str]) -> str:
+    """
+    Compute the content hash of all prototype files.
+    The algorithm should be synced with `scripts/build_jsons.py`.
+
+    @param files[in] The prototype files gotten by _list_prototype_files().
+    @return The hex digest of content hash.
+    """
+    hasher = hashlib.blake2b(digest_size = 16)
+    for relfile in sorted(files.keys()):
+        with open(files[relfile], 'rb') as fp:
+            data: bytes = fp.read()
+        hasher.update(f'{relfile}\0{len(data)}\0'.encode('utf-8'))
+        hasher.update(data)
+    return hasher.hexdigest()
+
+def _load_prototype_cache(files: dict[str, str]) -> bool:
+    """
+    Load prebuilt binary prototype cache.
+
+    The cache is a marshal of parsed prototypes, which is much faster than parsing JSON.
+    Cache will be rejected if it is missing, broken, or its content hash is not matched with prototype files.
+
+    @param files[in] The prototype files gotten by _list_prototype_files().
+    @return True if cache is loaded successfully.
+    """
+    try:
+        with open(_c_PrototypeCacheFile, 'rb') as fp:
+            cache: dict[str, typing.Any] = marshal.load(fp)
+        if cache['version'] != _c_PrototypeCacheVersion: return False
+        if cache['hash'] != _get_prototype_files_hash(files): return False
+        # read prototypes
+        entries: dict[str, _PrototypeIndexEntry] = {}
+        prototypes: dict[str, dict[str, typing.Any]] = {}
+        relfile: str
+        proto: dict[str, typing.Any]
+        for relfile, proto in cache['prototypes']:
+            ident: str = proto[TOKEN_IDENTIFIER]
+            entries[ident] = _PrototypeIndexEntry(relfile, -1, -1, proto[TOKEN_SHOWCASE])
+            prototypes[ident] = proto
+    except (OSError, EOFError, ValueError, KeyError, TypeError):
+        return False
+
+    _g_BMEPrototypeIndex.update(entries)
+    _g_BMEPrototypes.update(prototypes)
+    return True
+
+def _load_prototype_index(files: dict[str, str]) -> bool:
+    """
+    Load prebuilt prototype index.
+
+    Index will be rejected if it is missing, broken, or outdated (prototype files are added, removed or changed).
+    Prototype bodies are read by byte offset in index, so its content hash must be matched with prototype files.
+
+    @param files[in] The prototype files gotten by _list_prototype_files().
+    @return True if index is loaded successfully.
+    """
+    try:
+        with open(_c_PrototypeIndexFile, 'r', encoding = 'utf-8') as fp:
+            index: dict[str, typing.Any] = json.load(fp)
+        if index['version'] != _c_PrototypeIndexVersion: return False
+        # check whether index is matched with prototype files
+        indexed_files: dict[str, int] = index['files']
+        if indexed_files.keys() != files.keys(): return False
+        for relfile, size in indexed_files.items():
+            if os.path.getsize(files[relfile]) != size: return False
+        # file names and sizes are cheap to check, but file can be changed without size changing.
+        if index['hash'] != _get_prototype_files_hash(files): return False
+        # read entries
+        entries: dict[str, _PrototypeIndexEntry] = {}
+        for entry in index['prototypes']:
+            entries[entry['identifier']] = _PrototypeIndexEntry(
+                entry['file'], entry['offset'], entry['length'], entry['showcase']
+            )
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+    _g_BMEPrototypeIndex.update(entries)
+    return True
+
+def _load_prototype_file(relfile: str) -> None:
+    """
+    Load all prototype bodies located in given file.
+    """
+    with open(os.path.join(_c_PrototypeFolder, relfile), 'r', encoding = 'utf-8') as fp:
+        proto: dict[str, typing.Any]
+        for proto in json.load(fp):
+            ident: str = proto[TOKEN_IDENTIFIER]
+            # add into index if it is not existing.
+            # it only happens when there is no usable prebuilt index.
+            if ident not in _g_BMEPrototypeIndex:
+                _g_BMEPrototypeIndex[ident] = _PrototypeIndexEntry(relfile, -1, -1, proto[TOKEN_SHOWCASE])
+            # add into loaded prototypes
+            _g_BMEPrototypes[ident] = proto
+
+# the core loader.
+# prefer the prebuilt binary cache, which loads all prototypes without any JSON parsing.
+# then try the small prebuilt index, which defers prototype bodies loading until they are used.
+# if both of them are unusable, fallback to load all prototype files as the old way.
+_g_BMEPrototypeFiles: dict[str, str] = _list_prototype_files()
+if not _load_prototype_cache(_g_BMEPrototypeFiles) and not _load_prototype_index(_g_BMEPrototypeFiles):
+    for relfile in _g_BMEPrototypeFiles.keys():
+        _load_prototype_file(relfile)
 
 def _get_prototype_by_identifier(ident: str) -> dict[str, typing.Any]:
-    return _g_BMEPrototypes[_g_BMEPrototypeIndexMap[ident]]
+    proto: dict[str, typing.Any] | None = _g_BMEPrototypes.get(ident, None)
+    if proto is not None: return proto
+
+    # prototype is not loaded. load its body from file by offset.
+    entry: _PrototypeIndexEntry = _g_BMEPrototypeIndex[ident]
+    if entry.offset < 0:
+        _load_prototype_file(entry.file)
+        return _g_BMEPrototypes[ident]
+    with open(os.path.join(_c_PrototypeFolder, entry.file), 'rb') as fp:
+        fp.seek(entry.offset)
+        proto = json.loads(fp.read(entry.length).decode('utf-8'))
+    _g_BMEPrototypes[ident] = proto
+    return proto
+
+def _get_prototype_showcase(ident: str) -> typing.Any:
+    """
+    Get prototype showcase without loading prototype body.
+    """
+    return _g_BMEPrototypeIndex[ident].showcase
+
+def _get_all_prototypes() -> list[dict[str, typing.Any]]:
+    """
+    Get all prototypes in index order. All unloaded prototype bodies will be loaded.
+    """
+    # load whole files at once, rather than visiting them prototype by prototype.
+    for relfile in set(entry.file for ident, entry in _g_BMEPrototypeIndex.items() if ident not in _g_BMEPrototypes):
+        _load_prototype_file(relfile)
+    return [_g_BMEPrototypes[ident] for ident in _g_BMEPrototypeIndex.keys()]
 
 #endregion
 
 #region Programmable Field Calc
 
-def _env_fct_distance(x1: float, y1: float, x2: float, y2: float) -> float:
-    diff = mathutils.Vector((x2, y2)) - mathutils.Vector((x1, y1))
-    return diff.length
-
-def _env_fct_angle(x1: float, y1: float, x2: float, y2: float) -> float:
-    # compute blender angle first
-    # computed blender angle has some issues:
-    # first, it is range from -180 to 180 (0 is +X axis).
-    # second, its direction (clockwise is positive) is opposite with blender rotation direction (counter-clockwise is positive).
-    diff = mathutils.Vector((x2, y2)) - mathutils.Vector((x1, y1))
-    bld_angle = math.degrees(mathutils.Vector((1,0)).angle_signed(diff, 0))
-    
-    # flip it first
-    bld_angle = -bld_angle
-    # process positove number and negative number respectively
-    # to let it range change from -180~180 to 0~360
-    if bld_angle > 0: return bld_angle
-    else: return 360 + bld_angle
-
-_g_ProgFieldGlobals: dict[str, typing.Any] = {
-    # constant
-    'pi': math.pi,
-    'tau': math.tau,
-    
-    # math functions
-    'sin': math.sin,
-    'cos': math.cos,
-    'tan': math.tan,
-    'asin': math.asin,
-    'acos': math.acos,
-    'atan': math.atan,
-    
-    'pow': math.pow,
-    'sqrt': math.sqrt,
-    
-    'fabs': math.fabs,
-    
-    'degrees': math.degrees,
-    'radians': math.radians,
-    
-    # builtin functions
-    'abs': abs,
-    
-    'int': int,
-    'float': float,
-    'str': str,
-    'bool': bool,
-    
-    # my custom matrix functions
-    'move': lambda x, y, z: mathutils.Matrix.Translation((x, y, z)),
-    'rot': lambda x, y, z: mathutils.Matrix.LocRotScale(None, mathutils.Euler((math.radians(x), math.radians(y), math.radians(z)), 'XYZ'), None),
-    'scale': lambda x, y, z: mathutils.Matrix.LocRotScale(None, None, (x, y, z)),
-    'ident': lambda: mathutils.Matrix.Identity(4),
-    
-    # my misc custom functions
-    'distance': _env_fct_distance,
-    'angle': _env_fct_angle,
-}
+# the environment is shared with geometry core,
+# so that programmable fields are evaluated in the same way inside and outside of Blender.
+_g_ProgFieldGlobals: dict[str, typing.Any] = UTIL_bme_core.PROG_FIELD_GLOBALS
+
+_g_ProgFieldCodeCache: dict[str, types.CodeType] = {}
+"""The dict caching compiled programmable fields. Key is the raw string. Value is its compiled code object."""
+
+def _compile_prog_field(strl: str) -> types.CodeType:
+    """
+    Get the compiled code object of given programmable field.
+    Each distinct string is only parsed once, then the code object is reused in following evaluations.
+    """
+    code: types.CodeType | None = _g_ProgFieldCodeCache.get(strl, None)
+    if code is None:
+        code = compile(strl, '<BME programmable field>', 'eval')
+        _g_ProgFieldCodeCache[strl] = code
+    return code
 
 def _eval_showcase_cfgs_default(strl: str) -> typing.Any:
-    return eval(strl, _g_ProgFieldGlobals, None)
+    return eval(_compile_prog_field(strl), _g_ProgFieldGlobals, None)
 
 def _eval_params(strl: str, cfgs_data: dict[str, typing.Any]) -> typing.Any:
-    return eval(strl, _g_ProgFieldGlobals, cfgs_data)
+    return eval(_compile_prog_field(strl), _g_ProgFieldGlobals, cfgs_data)
+
+# NOTE: the programmable fields in skip, vars, vertices, faces and instances
+# are not evaluated by eval(). They are translated into Python code by prototype compiler.
+
+#endregion
+
+#region Prototype Compiler
+
+# Interpreting prototype dict field by field is slow,
+# because each field need a dict visiting and an eval() calling.
+# So we translate all prototypes into one Python module source,
+# in which each prototype become a specialized Python function.
+# In generated function, params and vars are plain local variables,
+# programmable fields become plain Python expressions,
+# and instances become direct calls to the function of referred prototype.
+#
+# Each generated function has the same signature: `fct(params, transform, emit)`.
+# It emits the local vertices and faces data of its prototype by calling `emit(transform, vertices, faces)`,
+# then calls the functions of its instances.
+# `vertices` is a list of position tuples. `faces` is a list of tuples
+# which contains face indices, texture name, uv tuple and normal tuple (or None if it need to be computed).
+
+## The version of generated code.
+#  Increase it when the layout of generated code is changed, so that the cached source on disk will be invalid.
+_c_CompilerVersion: int = 2
+## The path to the file caching generated source.
+_c_CompilerCacheFile: str = os.path.join(os.path.dirname(__file__), 'caches', 'bme_prototypes.gen.py')
+## The path to the file caching marshaled code of generated source.
+_c_CompilerCodeCacheFile: str = os.path.join(os.path.dirname(__file__), 'caches', 'bme_prototypes.gen.bin')
+## The prefix of the first line in cached source. Following it is the hash of prototypes.
+_c_CompilerCacheHeader: str = '# BME-PROTOTYPES-HASH: '
+
+_g_CompiledPrototypes: dict[str, UTIL_bme_core.CompiledPrototype] | None = None
+"""The dict. Key is prototype identifier. Value is the compiled function. None if prototypes are not compiled yet."""
+
+class _ProgFieldRenamer(ast.NodeTransformer):
+    """
+    Rename the names referring to params and vars in programmable field into their local variable names.
+    The name bound by lambda and comprehension, and the name of environment globals are kept.
+    """
+
+    __mLocals: set[str]
+    __mBounds: list[set[str]]
+    mReferred: set[str]
+
+    def __init__(self, local_names: set[str]):
+        self.__mLocals = local_names
+        self.__mBounds = []
+        self.mReferred = set()
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if any(node.id in bound for bound in self.__mBounds): return node
+        if node.id not in self.__mLocals and (node.id in _g_ProgFieldGlobals or hasattr(builtins, node.id)): return node
+        self.mReferred.add(node.id)
+        return ast.copy_location(ast.Name(id = _get_local_name(node.id), ctx = node.ctx), node)
+
+    def visit_Lambda(self, node: ast.Lambda) -> ast.AST:
+        node.args = self.visit(node.args)
+        self.__mBounds.append({arg.arg for arg in ast.walk(node.args) if isinstance(arg, ast.arg)})
+        node.body = self.visit(node.body)
+        self.__mBounds.pop()
+        return node
+
+    def __visit_comprehension(self, node: ast.ListComp | ast.SetComp | ast.GeneratorExp | ast.DictComp) -> ast.AST:
+        # the first iterator is evaluated in outer scope
+        node.generators[0].iter = self.visit(node.generators[0].iter)
+        self.__mBounds.append({
+            name.id for gen in node.generators for name in ast.walk(gen.target) if isinstance(name, ast.Name)
+        })
+        for i, gen in enumerate(node.generators):
+            if i != 0: gen.iter = self.visit(gen.iter)
+            gen.ifs = [self.visit(cond) for cond in gen.ifs]
+        if isinstance(node, ast.DictComp):
+            node.key = self.visit(node.key)
+            node.value = self.visit(node.value)
+        else:
+            node.elt = self.visit(node.elt)
+        self.__mBounds.pop()
+        return node
 
-def _eval_skip(strl: str, params_data: dict[str, typing.Any]) -> typing.Any:
-    return eval(strl, _g_ProgFieldGlobals, params_data)
+    visit_ListComp = __visit_comprehension
+    visit_SetComp = __visit_comprehension
+    visit_GeneratorExp = __visit_comprehension
+    visit_DictComp = __visit_comprehension
 
-def _eval_vars(strl: str, params_data: dict[str, typing.Any]) -> typing.Any:
-    return eval(strl, _g_ProgFieldGlobals, params_data)
+def _get_local_name(name: str) -> str:
+    return 'p_' + name
 
-def _eval_others(strl: str, params_vars_data: dict[str, typing.Any]) -> typing.Any:
-    return eval(strl, _g_ProgFieldGlobals, params_vars_data)
+class _PrototypeCompiler():
+    """
+    Translate one prototype into the source of a Python function.
+    """
+
+    __mLines: list[str]
+    __mLocals: set[str]
+    __mReferred: set[str]
+
+    def __init__(self):
+        self.__mLines = []
+        self.__mLocals = set()
+        self.__mReferred = set()
+
+    def __expr(self, strl: str) -> str:
+        renamer = _ProgFieldRenamer(self.__mLocals)
+        tree: ast.AST = renamer.visit(ast.parse(strl, mode = 'eval'))
+        # record the name which is not assigned yet. they should be fetched from params.
+        self.__mReferred |= (renamer.mReferred - self.__mLocals)
+        return '(' + ast.unparse(tree) + ')'
+
+    def __emit(self, indent: int, line: str) -> None:
+        self.__mLines.append('    ' * indent + line)
+
+    def __literal(self, strl: str) -> tuple[bool, typing.Any]:
+        """
+        Get the value of programmable field if it is a literal (e.g. folded by optimizer).
+        The guard checking it can be decided at compile time.
+        """
+        try:
+            return (True, ast.literal_eval(strl))
+        except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+            return (False, None)
+
+    def compile(self, proto: dict[str, typing.Any], fct_name: str, fct_names: dict[str, str]) -> str:
+        # skip. evaluated before vars, so it only can see params
+        (is_literal, value) = self.__literal(proto[TOKEN_SKIP])
+        if not is_literal:
+            skip_expr: str = self.__expr(proto[TOKEN_SKIP])
+            self.__emit(1, f'if {skip_expr} == True: return')
+        elif value == True:
+            self.__emit(1, 'return')
+        # vars
+        for proto_var in proto[TOKEN_VARS]:
+            var_expr: str = self.__expr(proto_var[TOKEN_VARS_DATA])
+            self.__mLocals.add(proto_var[TOKEN_VARS_FIELD])
+            self.__emit(1, f'{_get_local_name(proto_var[TOKEN_VARS_FIELD])} = {var_expr}')
+        # vertices
+        self.__emit(1, '_v = []')
+        for proto_vec in proto[TOKEN_VERTICES]:
+            (is_literal, value) = self.__literal(proto_vec[TOKEN_VERTICES_SKIP])
+            if not is_literal:
+                self.__emit(1, f'if {self.__expr(proto_vec[TOKEN_VERTICES_SKIP])} == False:')
+                self.__emit(2, f'_v.append({self.__expr(proto_vec[TOKEN_VERTICES_DATA])})')
+            elif value == False:
+                self.__emit(1, f'_v.append({self.__expr(proto_vec[TOKEN_VERTICES_DATA])})')
+        # faces
+        self.__emit(1, '_f = []')
+        for proto_face in proto[TOKEN_FACES]:
+            indices: list[int] = proto_face[TOKEN_FACES_INDICES]
+            uvs: str = '(' + ''.join(self.__expr(uv) + ', ' for uv in proto_face[TOKEN_FACES_UVS][:len(indices)]) + ')'
+            normals: str
+            if proto_face[TOKEN_FACES_NORMALS] is None:
+                normals = 'None'
+            else:
+                normals = '(' + ''.join(self.__expr(nml) + ', ' for nml in proto_face[TOKEN_FACES_NORMALS]) + ')'
+            face_data: str = f'_f.append(({tuple(indices)!r}, {self.__expr(proto_face[TOKEN_FACES_TEXTURE])}, {uvs}, {normals}))'
+            (is_literal, value) = self.__literal(proto_face[TOKEN_FACES_SKIP])
+            if not is_literal:
+                self.__emit(1, f'if {self.__expr(proto_face[TOKEN_FACES_SKIP])} == False:')
+                self.__emit(2, face_data)
+            elif value == False:
+                self.__emit(1, face_data)
+        self.__emit(1, '_e(_t, _v, _f)')
+        # instances
+        for proto_instance in proto[TOKEN_INSTANCES]:
+            ident: str = proto_instance[TOKEN_INSTANCES_IDENTIFIER]
+            callee: str = fct_names.get(ident, f'_get_missing_prototype({ident!r})')
+            inst_params: str = ', '.join(
+                f'{field!r}: {self.__expr(data)}' for field, data in proto_instance[TOKEN_INSTANCES_PARAMS].items()
+            )
+            inst_call: str = f'{callee}({{{inst_params}}}, _t @ {self.__expr(proto_instance[TOKEN_INSTANCES_TRANSFORM])}, _e)'
+            (is_literal, value) = self.__literal(proto_instance[TOKEN_INSTANCES_SKIP])
+            if not is_literal:
+                self.__emit(1, f'if not ({self.__expr(proto_instance[TOKEN_INSTANCES_SKIP])} == True):')
+                self.__emit(2, inst_call)
+            elif not (value == True):
+                self.__emit(1, inst_call)
+
+        # build function with params fetching header
+        header: list[str] = [
+            f'def {fct_name}(_p, _t, _e):',
+            f'    # {proto[TOKEN_IDENTIFIER]}',
+        ]
+        header.extend(f'    {_get_local_name(name)} = _p[{name!r}]' for name in sorted(self.__mReferred))
+        return '\n'.join(header + self.__mLines) + '\n'
+
+def _get_missing_prototype(ident: str) -> typing.NoReturn:
+    raise UTIL_functions.BBPException(f'invalid BME prototype identifier: {ident}')
+
+def _get_prototypes_hash() -> str:
+    hasher = hashlib.blake2b(digest_size = 16)
+    hasher.update(str(_c_CompilerVersion).encode('utf-8'))
+    hasher.update(json.dumps(_get_all_prototypes(), sort_keys = True, separators = (',', ':')).encode('utf-8'))
+    return hasher.hexdigest()
+
+def _generate_prototypes_source(proto_hash: str) -> str:
+    prototypes: list[dict[str, typing.Any]] = _get_all_prototypes()
+    fct_names: dict[str, str] = {
+        proto[TOKEN_IDENTIFIER]: f'_bme_proto_{i}' for i, proto in enumerate(prototypes)
+    }
+    sources: list[str] = [_c_CompilerCacheHeader + proto_hash, '# Generated by UTIL_bme. Do not edit.', '']
+    for proto in prototypes:
+        sources.append(_PrototypeCompiler().compile(proto, fct_names[proto[TOKEN_IDENTIFIER]], fct_names))
+    sources.append('_bme_protos = {')
+    sources.extend(f'    {ident!r}: {fct_name},' for ident, fct_name in fct_names.items())
+    sources.append('}')
+    return '\n'.join(sources) + '\n'
+
+def _load_prototypes_source(proto_hash: str) -> str:
+    """
+    Get generated source from disk cache, or generate it and save it into disk cache.
+    """
+    # try reading cache
+    try:
+        with open(_c_CompilerCacheFile, 'r', encoding = 'utf-8') as fp:
+            source: str = fp.read()
+        if source.startswith(_c_CompilerCacheHeader + proto_hash + '\n'):
+            return source
+    except OSError:
+        pass
+    # generate new one and try saving it.
+    # cache folder may be read-only, it is okey that we can not save it.
+    source = _generate_prototypes_source(proto_hash)
+    try:
+        os.makedirs(os.path.dirname(_c_CompilerCacheFile), exist_ok = True)
+        with open(_c_CompilerCacheFile, 'w', encoding = 'utf-8') as fp:
+            fp.write(source)
+    except OSError:
+        pass
+    return source
+
+def _load_prototypes_code() -> tuple[str, types.CodeType, bytes]:
+    """
+    Get compiled code of generated source from disk cache, or compile it and save it into disk cache.
+
+    @return The tuple of prototypes hash, compiled code and its packed data.
+    """
+    proto_hash: str = _get_prototypes_hash()
+    # try reading cache
+    try:
+        with open(_c_CompilerCodeCacheFile, 'rb') as fp:
+            data: bytes = fp.read()
+        unpacked: tuple[str, types.CodeType] | None = UTIL_bme_core.unpack_prototypes_code(data)
+        if unpacked is not None and unpacked[0] == proto_hash:
+            return (proto_hash, unpacked[1], data)
+    except OSError:
+        pass
+    # compile new one and try saving it.
+    code: types.CodeType = compile(_load_prototypes_source(proto_hash), _c_CompilerCacheFile, 'exec')
+    data = UTIL_bme_core.pack_prototypes_code(proto_hash, code)
+    try:
+        os.makedirs(os.path.dirname(_c_CompilerCodeCacheFile), exist_ok = True)
+        with open(_c_CompilerCodeCacheFile, 'wb') as fp:
+            fp.write(data)
+    except OSError:
+        pass
+    return (proto_hash, code, data)
+
+_g_CompiledPrototypesCode: tuple[str, bytes] | None = None
+"""The prototypes hash and packed compiled code, which are sent to process pool workers. None if prototypes are not compiled yet."""
+
+def _compile_prototypes() -> None:
+    global _g_CompiledPrototypes, _g_CompiledPrototypesCode
+    # compile all prototypes at the first time
+    if _g_CompiledPrototypes is None:
+        (proto_hash, code, data) = _load_prototypes_code()
+        _g_CompiledPrototypes = UTIL_bme_core.exec_prototypes_code(code, _get_missing_prototype)
+        _g_CompiledPrototypesCode = (proto_hash, data)
+
+def _get_compiled_prototype(ident: str) -> UTIL_bme_core.CompiledPrototype:
+    _compile_prototypes()
+    return typing.cast(dict[str, UTIL_bme_core.CompiledPrototype], _g_CompiledPrototypes)[ident]
+
+def _get_compiled_prototypes_code() -> tuple[str, bytes]:
+    _compile_prototypes()
+    return typing.cast(tuple[str, bytes], _g_CompiledPrototypesCode)
+
+def get_prototypes_hash() -> str:
+    """
+    Get the hash of all loaded prototypes. All prototypes are compiled if they are not compiled yet.
+    """
+    return _get_compiled_prototypes_code()[0]
+
+#endregion
+
+#region Prototype Evaluation
+
+# These functions evaluate prototype without geometry cache and without creating mesh.
+# They are used by tools, e.g. benchmark script.
+
+## The signature of emitter receiving the data of each evaluated prototype: `emit(transform, vertices, faces)`.
+#  See the Prototype Compiler for the format of data.
+PrototypeEmitter = typing.Callable[[numpy.ndarray, list[typing.Any], list[typing.Any]], None]
+
+_g_CountedPrototypes: tuple[dict[str, UTIL_bme_core.CompiledPrototype], list[int]] | None = None
+"""The compiled prototypes counting their calls, and the counter. None if they are not created yet."""
+
+def evaluate_bme_struct(ident: str, cfgs: dict[str, typing.Any], emit: PrototypeEmitter) -> None:
+    """
+    Evaluate prototype with given cfgs and identity transform.
+
+    :param ident: The identifier of prototype.
+    :param cfgs: The showcase cfgs of prototype.
+    :param emit: The emitter receiving the data of prototype and its instances.
+    """
+    params: dict[str, typing.Any] = _eval_bme_struct_params(_get_prototype_by_identifier(ident), cfgs)
+    _get_compiled_prototype(ident)(params, numpy.identity(4, dtype = numpy.float64), emit)
+
+def count_bme_struct_evals(ident: str, cfgs: dict[str, typing.Any]) -> int:
+    """
+    Count how many prototype functions are called when evaluating prototype with given cfgs.
+    It includes the prototype itself and all instances, and the skipped ones are also counted.
+    It is slower than evaluate_bme_struct() because of counting.
+
+    :param ident: The identifier of prototype.
+    :param cfgs: The showcase cfgs of prototype.
+    :return: The count of called prototype functions.
+    """
+    global _g_CountedPrototypes
+    if _g_CountedPrototypes is None:
+        counter: list[int] = [0]
+        def counting_wrapper(fct: UTIL_bme_core.CompiledPrototype) -> UTIL_bme_core.CompiledPrototype:
+            def counted(params: dict[str, typing.Any], transform: numpy.ndarray, emit: typing.Callable) -> None:
+                counter[0] += 1
+                fct(params, transform, emit)
+            return counted
+        (_, code, _) = _load_prototypes_code()
+        _g_CountedPrototypes = (UTIL_bme_core.exec_prototypes_code(code, _get_missing_prototype, counting_wrapper), counter)
+
+    (prototypes, counter) = _g_CountedPrototypes
+    counter[0] = 0
+    params: dict[str, typing.Any] = _eval_bme_struct_params(_get_prototype_by_identifier(ident), cfgs)
+    prototypes[ident](params, numpy.identity(4, dtype = numpy.float64), lambda *args: None)
+    return counter[0]
 
 #endregion
 
@@ -201,11 +640,12 @@ class EnumPropHelper(UTIL_functions.EnumPropHelper[str]):
         # prepare cache value
         identifiers: list[str] = []
         categories: dict[str, list[str]] = {}
-        # iterate showcase prototypes
-        for x in filter(lambda x: x[TOKEN_SHOWCASE] is not None, _g_BMEPrototypes):
-            # fetch identifier and category
-            identifier = typing.cast(str, x[TOKEN_IDENTIFIER])
-            category = typing.cast(str, x[TOKEN_SHOWCASE][TOKEN_SHOWCASE_CATEGORY])
+        # iterate showcase prototypes.
+        # only use prototype index, so that no prototype body will be loaded.
+        for identifier, entry in _g_BMEPrototypeIndex.items():
+            if entry.showcase is None: continue
+            # fetch category
+            category = typing.cast(str, entry.showcase[TOKEN_SHOWCASE_CATEGORY])
             # add into identifier list
             identifiers.append(identifier)
             # add into categories
@@ -245,78 +685,288 @@ class EnumPropHelper(UTIL_functions.EnumPropHelper[str]):
         """
         Get BME display title by prototype identifier.
         """
-        # get prototype first
-        proto: dict[str, typing.Any] = _get_prototype_by_identifier(ident)
+        # get prototype showcase first
+        showcase: dict[str, typing.Any] = _get_prototype_showcase(ident)
         # visit title field
-        return proto[TOKEN_SHOWCASE][TOKEN_SHOWCASE_TITLE]
+        return showcase[TOKEN_SHOWCASE_TITLE]
     
     def get_bme_showcase_icon(self, ident: str) -> int:
         """
         Get BME icon by prototype's identifier
         """
         # get prototype specified icon name
-        proto: dict[str, typing.Any] = _get_prototype_by_identifier(ident)
-        icon_name: str = proto[TOKEN_SHOWCASE][TOKEN_SHOWCASE_ICON]
+        showcase: dict[str, typing.Any] = _get_prototype_showcase(ident)
+        icon_name: str = showcase[TOKEN_SHOWCASE_ICON]
         # get icon from icon manager
         cache: int | None = UTIL_icons_manager.get_bme_icon(icon_name)
         if cache is None: return UTIL_icons_manager.get_empty_icon()
         else: return cache
     
     def get_bme_showcase_cfgs(self, ident: str) -> typing.Iterator[PrototypeShowcaseCfgDescriptor]:
-        # get prototype first
-        proto: dict[str, typing.Any] = _get_prototype_by_identifier(ident)
+        # get prototype showcase first
+        showcase: dict[str, typing.Any] = _get_prototype_showcase(ident)
         # use map to batch create descriptor
-        return map(lambda x: PrototypeShowcaseCfgDescriptor(x), proto[TOKEN_SHOWCASE][TOKEN_SHOWCASE_CFGS])
+        return map(lambda x: PrototypeShowcaseCfgDescriptor(x), showcase[TOKEN_SHOWCASE_CFGS])
+
+#endregion
+
+#region Geometry Cache
+
+@dataclass(frozen = True)
+class GeometryCacheStats():
+    mEntries: int
+    mCapacity: int
+    mHits: int
+    mMisses: int
+
+_GeometryCacheKey = tuple[str, str, tuple[tuple[float, ...], ...]]
+
+class _GeometryCache():
+    """
+    The LRU cache of generated BME geometry.
+    Key is (prototype identifier, normalized params, transform). Value is generated parts.
+    """
+
+    __mEntries: collections.OrderedDict[_GeometryCacheKey, tuple[UTIL_bme_core.BMEStructPart, ...]]
+    __mCapacity: int
+    __mHits: int
+    __mMisses: int
+
+    def __init__(self, capacity: int):
+        self.__mEntries = collections.OrderedDict()
+        self.__mCapacity = capacity
+        self.__mHits = 0
+        self.__mMisses = 0
+
+    def set_capacity(self, capacity: int) -> None:
+        self.__mCapacity = max(0, capacity)
+        self.__evict()
+
+    def get(self, key: _GeometryCacheKey) -> tuple[UTIL_bme_core.BMEStructPart, ...] | None:
+        # zero capacity means disabled. do not count it.
+        if self.__mCapacity == 0: return None
+        parts: tuple[UTIL_bme_core.BMEStructPart, ...] | None = self.__mEntries.get(key, None)
+        if parts is None:
+            self.__mMisses += 1
+        else:
+            self.__mHits += 1
+            self.__mEntries.move_to_end(key)
+        return parts
+
+    def put(self, key: _GeometryCacheKey, parts: tuple[UTIL_bme_core.BMEStructPart, ...]) -> None:
+        if self.__mCapacity == 0: return
+        self.__mEntries[key] = parts
+        self.__mEntries.move_to_end(key)
+        self.__evict()
+
+    def clear(self) -> None:
+        self.__mEntries.clear()
+        self.__mHits = 0
+        self.__mMisses = 0
+
+    def get_stats(self) -> GeometryCacheStats:
+        return GeometryCacheStats(len(self.__mEntries), self.__mCapacity, self.__mHits, self.__mMisses)
+
+    def __evict(self) -> None:
+        # remove least recently used entries
+        while len(self.__mEntries) > self.__mCapacity:
+            self.__mEntries.popitem(last = False)
+
+_g_GeometryCache: _GeometryCache = _GeometryCache(PROP_preferences.DEFAULT_RAW_PREFERENCES.mBMEGeometryCacheSize)
+
+def _normalize_cache_param(value: typing.Any) -> typing.Any:
+    """
+    Normalize param value for building cache key.
+    Sequences (including mathutils vectors) are converted into tuple.
+
+    @return Normalized value, or None if it can not be used as cache key.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (tuple, list, mathutils.Vector)):
+        items: list[typing.Any] = []
+        for item in value:
+            norm_item: typing.Any = _normalize_cache_param(item)
+            if norm_item is None and item is not None: return None
+            items.append(norm_item)
+        return tuple(items)
+    return None
+
+def _get_geometry_cache_key(ident: str, transform: numpy.ndarray, params: dict[str, typing.Any]) -> _GeometryCacheKey | None:
+    """
+    Build cache key for given prototype creation.
+
+    @return The cache key, or None if given params can not be cached.
+    """
+    norm_params: list[tuple[str, typing.Any]] = []
+    for field, value in sorted(params.items()):
+        norm_value: typing.Any = _normalize_cache_param(value)
+        if norm_value is None and value is not None: return None
+        norm_params.append((field, norm_value))
+    # use repr to distinguish values which are equal in Python but different in generation, e.g. 1 and True.
+    return (ident, repr(norm_params), tuple(tuple(row) for row in transform.tolist()))
+
+def set_geometry_cache_size(size: int) -> None:
+    """
+    Set the maximum count of cached BME geometry. Zero to disable cache.
+    """
+    _g_GeometryCache.set_capacity(size)
+
+def clear_geometry_cache() -> None:
+    """
+    Clear cached BME geometry and reset statistics.
+    """
+    _g_GeometryCache.clear()
+
+def get_geometry_cache_stats() -> GeometryCacheStats:
+    """
+    Get the statistics of BME geometry cache.
+    """
+    return _g_GeometryCache.get_stats()
 
 #endregion
 
 #region Core Creator
 
-def create_bme_struct_wrapper(ident: str, cfgs: dict[str, typing.Any]) -> bpy.types.Object:
+## The name of mesh custom property recording the prototypes hash, identifier and cfgs which generate this mesh.
+#  Linked duplicate use it to find the mesh which can be shared.
+#  It is only written when linked duplicate is requested.
+_c_BMEStructMeshKeyProp: str = 'bbp_bme_struct'
+## The name of mesh custom property recording the geometry fingerprint of mesh when it is generated.
+#  The mesh edited by user after generating has different fingerprint, so it will not be shared.
+_c_BMEStructMeshFingerprintProp: str = 'bbp_bme_struct_fingerprint'
+
+def create_bme_struct_wrapper(ident: str, cfgs: dict[str, typing.Any], link_duplicate: bool = False) -> bpy.types.Object:
+    """
+    Create BME structure object.
+
+    :param ident: The identifier of prototype.
+    :param cfgs: The showcase cfgs of prototype.
+    :param link_duplicate: True to share the existing mesh generated with the same identifier and cfgs.
+    :return: The created object which is not added into scene.
+    """
     # get prototype first
     proto: dict[str, typing.Any] = _get_prototype_by_identifier(ident)
+
+    # try finding existing mesh if link duplicate is requested
+    mesh_key: str = _get_bme_struct_mesh_key(ident, cfgs)
+    mesh: bpy.types.Mesh | None = None
+    if link_duplicate:
+        mesh = _find_bme_struct_mesh(mesh_key)
+
+    if mesh is None:
+        # analyse params by given cfgs
+        params: dict[str, typing.Any] = _eval_bme_struct_params(proto, cfgs)
+        
+        # sync geometry cache size with preferences
+        set_geometry_cache_size(PROP_preferences.get_raw_preferences().mBMEGeometryCacheSize)
+
+        # create used mesh
+        mesh = bpy.data.meshes.new('BMEStruct')
+        
+        # create mesh writer and bme mtl helper
+        # recursively calling underlying creation function
+        with UTIL_blender_mesh.MeshWriter(mesh) as writer:
+            with PROP_bme_material.BMEMaterialsHelper(bpy.context.scene) as bmemtl:
+                create_bme_struct(
+                    ident,
+                    writer,
+                    bmemtl,
+                    mathutils.Matrix.Identity(4),
+                    params
+                )
+
+        # mark it for following linked duplicate
+        if link_duplicate:
+            _mark_bme_struct_mesh(mesh, mesh_key)
     
-    # analyse params by given cfgs
+    # create object and assign prop
+    return _create_bme_struct_object(_get_bme_struct_object_info(proto), mesh)
+
+def _get_bme_struct_mesh_key(ident: str, cfgs: dict[str, typing.Any]) -> str:
+    # prototypes hash is included, so that the mesh generated by old prototypes is not shared.
+    # use repr like geometry cache key, so that 1 and True are different.
+    (proto_hash, _) = _get_compiled_prototypes_code()
+    return repr((proto_hash, ident, sorted((field, _normalize_cache_param(value)) for field, value in cfgs.items())))
+
+def _get_bme_struct_mesh_fingerprint(mesh: bpy.types.Mesh) -> str:
+    # read mesh by loop triangles, which do not modify mesh.
+    with UTIL_blender_mesh.MeshReader(mesh, True) as reader:
+        return UTIL_blender_mesh.get_geometry_fingerprint(
+            reader.get_vertex_position_array(),
+            reader.get_vertex_normal_array(),
+            reader.get_vertex_uv_array(),
+            reader.get_face_array(),
+            (('' if mtl is None else mtl.name) for mtl in reader.get_material_slot())
+        )
+
+def _mark_bme_struct_mesh(mesh: bpy.types.Mesh, mesh_key: str) -> None:
+    """
+    Record the key and fingerprint of generated mesh, so that it can be found by _find_bme_struct_mesh().
+    """
+    mesh[_c_BMEStructMeshKeyProp] = mesh_key
+    mesh[_c_BMEStructMeshFingerprintProp] = _get_bme_struct_mesh_fingerprint(mesh)
+
+def _is_bme_struct_mesh_unchanged(mesh: bpy.types.Mesh) -> bool:
+    # linked library mesh can not be edited, so it is never shared.
+    if mesh.library is not None: return False
+    # compare fingerprint to detect user modification
+    return mesh.get(_c_BMEStructMeshFingerprintProp, None) == _get_bme_struct_mesh_fingerprint(mesh)
+
+def _find_bme_struct_mesh(mesh_key: str) -> bpy.types.Mesh | None:
+    """
+    Find the mesh generated by BME with given key for linked duplicate.
+    Only the meshes marked with the same key are fingerprinted.
+    The mesh which is modified after generating is skipped.
+    """
+    for mesh in bpy.data.meshes:
+        if mesh.get(_c_BMEStructMeshKeyProp, None) != mesh_key: continue
+        if _is_bme_struct_mesh_unchanged(mesh):
+            return mesh
+    return None
+
+def _find_bme_struct_meshes() -> dict[str, bpy.types.Mesh]:
+    """
+    Collect all meshes generated by BME for linked duplicate, keyed by their prototypes hash, identifier and cfgs.
+    The mesh which is modified after generating is skipped.
+    """
+    meshes: dict[str, bpy.types.Mesh] = {}
+    for mesh in bpy.data.meshes:
+        mesh_key: typing.Any = mesh.get(_c_BMEStructMeshKeyProp, None)
+        if not isinstance(mesh_key, str): continue
+        if mesh_key in meshes: continue
+        if _is_bme_struct_mesh_unchanged(mesh):
+            meshes[mesh_key] = mesh
+    return meshes
+
+def _eval_bme_struct_params(proto: dict[str, typing.Any], cfgs: dict[str, typing.Any]) -> dict[str, typing.Any]:
     params: dict[str, typing.Any] = {}
     for proto_param in proto[TOKEN_PARAMS]:
         params[proto_param[TOKEN_PARAMS_FIELD]] = _eval_params(proto_param[TOKEN_PARAMS_DATA], cfgs)
-    
-    # create used mesh
-    mesh: bpy.types.Mesh = bpy.data.meshes.new('BMEStruct')
-    
-    # create mesh writer and bme mtl helper
-    # recursively calling underlying creation function
-    with UTIL_blender_mesh.MeshWriter(mesh) as writer:
-        with PROP_bme_material.BMEMaterialsHelper(bpy.context.scene) as bmemtl:
-            create_bme_struct(
-                ident,
-                writer,
-                bmemtl,
-                mathutils.Matrix.Identity(4),
-                params
-            )
-    
-    # create object and assign prop
-    # get obj info first
-    obj_info: UTIL_naming_convention.BallanceObjectInfo
-    match(PrototypeShowcaseTypes(proto[TOKEN_SHOWCASE][TOKEN_SHOWCASE_TYPE])):
+    return params
+
+def _get_bme_struct_object_info(proto: dict[str, typing.Any]) -> UTIL_naming_convention.BallanceObjectInfo:
+    return _get_bme_struct_object_info_by_type(PrototypeShowcaseTypes(proto[TOKEN_SHOWCASE][TOKEN_SHOWCASE_TYPE]))
+
+def _get_bme_struct_object_info_by_type(proto_type: PrototypeShowcaseTypes) -> UTIL_naming_convention.BallanceObjectInfo:
+    match(proto_type):
         case PrototypeShowcaseTypes.No:
-            obj_info = UTIL_naming_convention.BallanceObjectInfo.create_from_others(UTIL_naming_convention.BallanceObjectType.DECORATION)
+            return UTIL_naming_convention.BallanceObjectInfo.create_from_others(UTIL_naming_convention.BallanceObjectType.DECORATION)
         case PrototypeShowcaseTypes.Floor:
-            obj_info = UTIL_naming_convention.BallanceObjectInfo.create_from_others(UTIL_naming_convention.BallanceObjectType.FLOOR)
+            return UTIL_naming_convention.BallanceObjectInfo.create_from_others(UTIL_naming_convention.BallanceObjectType.FLOOR)
         case PrototypeShowcaseTypes.Rail:
-            obj_info = UTIL_naming_convention.BallanceObjectInfo.create_from_others(UTIL_naming_convention.BallanceObjectType.RAIL)
+            return UTIL_naming_convention.BallanceObjectInfo.create_from_others(UTIL_naming_convention.BallanceObjectType.RAIL)
         case PrototypeShowcaseTypes.Wood:
-            obj_info = UTIL_naming_convention.BallanceObjectInfo.create_from_others(UTIL_naming_convention.BallanceObjectType.WOOD)
-    # then get object name
+            return UTIL_naming_convention.BallanceObjectInfo.create_from_others(UTIL_naming_convention.BallanceObjectType.WOOD)
+
+def _create_bme_struct_object(obj_info: UTIL_naming_convention.BallanceObjectInfo, mesh: bpy.types.Mesh) -> bpy.types.Object:
+    # get object name first
     obj_name: str | None = UTIL_naming_convention.YYCToolchainConvention.set_to_name(obj_info, None)
     if obj_name is None: raise UTIL_functions.BBPException('impossible null name')
     # create object by name
     obj: bpy.types.Object = bpy.data.objects.new(obj_name, mesh)
     # assign virtools groups
     UTIL_naming_convention.VirtoolsGroupConvention.set_to_object(obj, obj_info, None)
-    
-    # return object
     return obj
 
 def create_bme_struct(
@@ -325,260 +975,361 @@ def create_bme_struct(
         bmemtl: PROP_bme_material.BMEMaterialsHelper,
         transform: mathutils.Matrix,
         params: dict[str, typing.Any]) -> None:
-    # get prototype first
-    proto: dict[str, typing.Any] = _get_prototype_by_identifier(ident)
-    
-    # check whether skip the whole struct before cal vars
-    if _eval_skip(proto[TOKEN_SKIP], params) == True:
-        return
-    
-    # calc vars by given params
-    # please note i will add entries directly into params dict
-    # but the params dict will not used independently later,
-    # all following use is the union of params and vars dict.
-    # so it is safe.
-    for proto_var in proto[TOKEN_VARS]:
-        params[proto_var[TOKEN_VARS_FIELD]] = _eval_vars(proto_var[TOKEN_VARS_DATA], params)
-    
-    # collect valid face and vertices data for following using.
-    # if NOT skip, add into valid list
-    valid_vec_idx: list[int] = []
-    for vec_idx, proto_vec in enumerate(proto[TOKEN_VERTICES]):
-        if _eval_others(proto_vec[TOKEN_VERTICES_SKIP], params) == False:
-            valid_vec_idx.append(vec_idx)
-    valid_face_idx: list[int] = []
-    for face_idx, proto_face in enumerate(proto[TOKEN_FACES]):
-        if _eval_others(proto_face[TOKEN_FACES_SKIP], params) == False:
-            valid_face_idx.append(face_idx)
-    
-    # create mtl slot remap to help following mesh adding
-    # because mesh writer do not accept string format mtl slot visiting,
-    # it only accept int based mtl slot index.
-    #
-    # Also we build face used mtl slot index at the same time.
-    # So we do not analyse texture field again when providing face data.
-    # The result is in `prebuild_face_mtl_idx` and please note it will store all face's mtl index.
-    # For example: if face 0 is skipped and face 1 is used, the first entry in `prebuild_face_mtl_idx`
-    # will be the mtl slot index used by face 0, not 1. And its length is equal to the face count.
-    # However, because face 0 is skipped, so the entry is not used and default set to 0.
-    #
-    # NOTE: since Python 3.6, the item of builtin dict is ordered by inserting order.
-    # we rely on this to implement following features.
-    mtl_remap: dict[str, int] = {}
-    prebuild_face_mtl_idx: list[int] = [0] * len(proto[TOKEN_FACES])
-    for face_idx in valid_face_idx:
-        # eval mtl name
-        mtl_name: str = _eval_others(proto[TOKEN_FACES][face_idx][TOKEN_FACES_TEXTURE], params)
-        # try insert into remap and record to face mtl idx
-        if mtl_name not in mtl_remap:
-            # record index
-            prebuild_face_mtl_idx[face_idx] = len(mtl_remap)
-            # add into remap if not exist
-            mtl_remap[mtl_name] = len(mtl_remap)
-        else:
-            # if existing, no need to add into remap
-            # but we need get its index from remap
-            prebuild_face_mtl_idx[face_idx] = mtl_remap.get(mtl_name, 0)
-    
-    # pre-compute vertices data because we may need used later.
-    # Because if face normal data is null, it mean that we need to compute it
-    # by given vertices.
-    # The computed vertices is stored in `prebuild_vec_data` and is NOT like `prebuild_face_mtl_idx`,
-    # we only store valid one in `prebuild_vec_data`.
-    prebuild_vec_data: list[UTIL_virtools_types.ConstVxVector3 | None] = []
-    cache_bv: mathutils.Vector = mathutils.Vector((0, 0, 0))
-    for vec_idx in valid_vec_idx:
-        # but it need mul with transform matrix
-        cache_bv.x, cache_bv.y, cache_bv.z = _eval_others(proto[TOKEN_VERTICES][vec_idx][TOKEN_VERTICES_DATA], params)
-        # mul with transform matrix
-        cache_bv = typing.cast(mathutils.Vector, transform @ cache_bv)
-        # get result
-        prebuild_vec_data.append((cache_bv.x, cache_bv.y, cache_bv.z))
-    
-    # Check whether given transform is mirror matrix
-    # because mirror matrix will reverse triangle indice order.
-    # If matrix is mirror matrix, we need reverse it again in following procession,
-    # including getting uv, calculating normal and providing face data.
-    mirror_matrix: bool = _is_mirror_matrix(transform)
-    
-    # prepare mesh part data
-    mesh_part: UTIL_blender_mesh.MeshWriterIngredient = UTIL_blender_mesh.MeshWriterIngredient()
-    def vpos_iterator() -> typing.Iterator[UTIL_virtools_types.VxVector3]:
-        # simply get data from prebuild vec data
-        v: UTIL_virtools_types.VxVector3 = UTIL_virtools_types.VxVector3()
-        for vec_data in prebuild_vec_data:
-            # skip skipped vertices
-            if vec_data is None: continue
-            # yield result
-            v.x, v.y, v.z = vec_data
-            yield v
-    mesh_part.mVertexPosition = vpos_iterator()
-    def vnml_iterator() -> typing.Iterator[UTIL_virtools_types.VxVector3]:
-        # prepare normal used transform first
-        # ref: https://zhuanlan.zhihu.com/p/96717729
-        nml_transform: mathutils.Matrix = transform.inverted_safe().transposed()
-        # prepare vars
-        bv: mathutils.Vector = mathutils.Vector((0, 0, 0))
-        v: UTIL_virtools_types.VxVector3 = UTIL_virtools_types.VxVector3()
-        for face_idx in valid_face_idx:
-            face_data: dict[str, typing.Any] = proto[TOKEN_FACES][face_idx]
-            face_nml_data: list[str] | None = face_data[TOKEN_FACES_NORMALS]
-            if face_nml_data is None:
-                # nml is null, we need compute by ourselves
-                # get first 3 entries in indices list as the compution ref
-                # please note that we may need reverse it
-                face_indices_data: list[int]
-                if mirror_matrix:
-                    face_indices_data = face_data[TOKEN_FACES_INDICES][::-1]
-                else:
-                    face_indices_data = face_data[TOKEN_FACES_INDICES][:]
-                # compute it by getting vertices info from prebuild vertices data
-                # because the normals is computed from transformed vertices
-                # so no need to correct its by normal transform.
-                bv.x, bv.y, bv.z = _compute_normals(
-                    typing.cast(UTIL_virtools_types.ConstVxVector3, prebuild_vec_data[face_indices_data[0]]),
-                    typing.cast(UTIL_virtools_types.ConstVxVector3, prebuild_vec_data[face_indices_data[1]]),
-                    typing.cast(UTIL_virtools_types.ConstVxVector3, prebuild_vec_data[face_indices_data[2]])
-                )
-                # yield result with N times (N = indices count)
-                v.x, v.y, v.z = bv.x, bv.y, bv.z
-                for _ in range(len(face_indices_data)):
-                    yield v
-            else:
-                # nml is given, analyse programable fields
-                for mtl_data in face_nml_data:
-                    # BME normals need transform by matrix first,
-                    bv.x, bv.y, bv.z = _eval_others(mtl_data, params)
-                    bv = typing.cast(mathutils.Vector, nml_transform @ bv)
-                    # then normalize it
-                    bv.normalize()
-                    # yield result
-                    v.x, v.y, v.z = bv.x, bv.y, bv.z
-                    yield v
-    mesh_part.mVertexNormal = vnml_iterator()
-    def vuv_iterator() -> typing.Iterator[UTIL_virtools_types.VxVector2]:
-        v: UTIL_virtools_types.VxVector2 = UTIL_virtools_types.VxVector2()
-        for face_idx in valid_face_idx:
-            face_data: dict[str, typing.Any] = proto[TOKEN_FACES][face_idx]
-            # iterate uv list considering mirror matrix
-            indices_count: int = len(face_data[TOKEN_FACES_INDICES])
-            for i in (range(indices_count)[::-1] if mirror_matrix else range(indices_count)):
-                # BME uv do not need any extra process
-                v.x, v.y = _eval_others(face_data[TOKEN_FACES_UVS][i], params)
-                yield v
-    mesh_part.mVertexUV = vuv_iterator()
-    def mtl_iterator() -> typing.Iterator[bpy.types.Material | None]:
-        for mtl_name in mtl_remap.keys():
-            yield bmemtl.get_material(mtl_name)
-    mesh_part.mMaterial = mtl_iterator()
-    def face_iterator() -> typing.Iterator[UTIL_blender_mesh.FaceData]:
-        # create face data with 3 placeholder
-        f: UTIL_blender_mesh.FaceData = UTIL_blender_mesh.FaceData(
-            [UTIL_blender_mesh.FaceVertexData() for i in range(3)]
-        )
-        
-        # create a internal counter to count how many indices has been processed
-        # this counter will be used to calc uv and normal index
-        # because these are based on face, not vertex position index.
-        face_counter: int = 0
-        
-        # iterate valid face
-        for face_idx in valid_face_idx:
-            # get face data
-            face_data: dict[str, typing.Any] = proto[TOKEN_FACES][face_idx]
-            
-            # get face indices considering the mirror matrix
-            face_indices: list[int]
-            if mirror_matrix:
-                face_indices = face_data[TOKEN_FACES_INDICES][::-1]
-            else:
-                face_indices = face_data[TOKEN_FACES_INDICES][:]
-            # calc indices count
-            indices_count: int = len(face_indices)
-            # resize face data to fulfill req
-            while len(f.mIndices) > indices_count:
-                f.mIndices.pop()
-            while len(f.mIndices) < indices_count:
-                f.mIndices.append(UTIL_blender_mesh.FaceVertexData())
-            
-            # fill the data
-            for i in range(indices_count):
-                # fill vertex position data by indices
-                f.mIndices[i].mPosIdx = face_indices[i]
-                # fill nml and uv based on face index
-                f.mIndices[i].mNmlIdx = face_counter + i
-                f.mIndices[i].mUvIdx = face_counter + i
-            
-            # add current face indices count to internal counter
-            face_counter += indices_count
-            
-            # fill texture data
-            f.mMtlIdx = prebuild_face_mtl_idx[face_idx]
-            
-            # return data once
-            yield f
-    mesh_part.mFace = face_iterator()
-    # add part to writer
-    writer.add_ingredient(mesh_part)
-    
-    # then we incursively process instance creation
-    for proto_instance in proto[TOKEN_INSTANCES]:
-        # check whether skip this instance
-        if _eval_others(proto_instance[TOKEN_INSTANCES_SKIP], params) == True:
-            continue
-        
-        # calc instance params
-        instance_params: dict[str, typing.Any] = {}
-        proto_instance_params: dict[str, str] = proto_instance[TOKEN_INSTANCES_PARAMS]
-        for proto_inst_param_field, proto_inst_param_data in proto_instance_params.items():
-            instance_params[proto_inst_param_field] = _eval_others(proto_inst_param_data, params)
-        
-        # call recursively
-        create_bme_struct(
-            proto_instance[TOKEN_INSTANCES_IDENTIFIER],
-            writer,
-            bmemtl,
-            # left-mul transform, because self transform should be applied first, the apply parent's transform
-            transform @ _eval_others(proto_instance[TOKEN_INSTANCES_TRANSFORM], params),
-            instance_params
-        )
+    # add parts into writer
+    for part in _generate_bme_struct_parts(ident, transform, params):
+        _add_bme_struct_part(writer, bmemtl, part)
+
+def _generate_bme_struct_parts(
+        ident: str,
+        transform: mathutils.Matrix,
+        params: dict[str, typing.Any]) -> tuple[UTIL_bme_core.BMEStructPart, ...]:
+    """
+    Generate the geometry parts of given prototype, or fetch them from cache.
+    """
+    return _generate_bme_struct_parts_batch([(ident, transform, params)], False)[0]
+
+def _generate_bme_struct_parts_batch(
+        requests: list[tuple[str, mathutils.Matrix, dict[str, typing.Any]]],
+        parallel: bool) -> list[tuple[UTIL_bme_core.BMEStructPart, ...]]:
+    """
+    Generate the geometry parts of many prototypes, or fetch them from cache.
+
+    @param requests[in] The list of prototype identifier, transform and params.
+    @param parallel[in] True to generate the parts missing in cache in process pool.
+    @return The geometry parts of each request in the same order.
+    """
+    results: list[tuple[UTIL_bme_core.BMEStructPart, ...] | None] = [None] * len(requests)
+    # fetch generated geometry from cache first,
+    # and collect the requests which need to be generated.
+    keys: list[_GeometryCacheKey | None] = []
+    missing: list[int] = []
+    for i, (ident, transform, params) in enumerate(requests):
+        key: _GeometryCacheKey | None = _get_geometry_cache_key(ident, _to_numpy_matrix(transform), params)
+        keys.append(key)
+        if key is not None:
+            results[i] = _g_GeometryCache.get(key)
+        if results[i] is None:
+            missing.append(i)
+
+    # generate missing parts
+    generated: list[tuple[UTIL_bme_core.BMEStructPart, ...]] | None = None
+    if parallel and len(missing) > 1:
+        (proto_hash, code_data) = _get_compiled_prototypes_code()
+        try:
+            generated = UTIL_bme_core.generate_bme_struct_parts_parallel(
+                proto_hash,
+                code_data,
+                [(requests[i][0], requests[i][2], tuple(tuple(row) for row in _to_numpy_matrix(requests[i][1]).tolist())) for i in missing]
+            )
+        except concurrent.futures.process.BrokenProcessPool:
+            # worker process can not work in some environments.
+            # it is not an error of structures, so generate them serially instead.
+            generated = None
+        except Exception as e:
+            raise UTIL_functions.BBPException(f'fail to generate BME structures in process pool: {e}') from e
+    if generated is None:
+        generated = [
+            UTIL_bme_core.generate_bme_struct_parts(
+                _get_compiled_prototype(requests[i][0]),
+                _to_numpy_matrix(requests[i][1]),
+                requests[i][2]
+            ) for i in missing
+        ]
+
+    # put generated parts into cache
+    for i, parts in zip(missing, generated):
+        results[i] = parts
+        key = keys[i]
+        if key is not None:
+            _g_GeometryCache.put(key, parts)
+
+    return typing.cast(list[tuple[UTIL_bme_core.BMEStructPart, ...]], results)
+
+def _to_numpy_matrix(mat: mathutils.Matrix) -> numpy.ndarray:
+    return numpy.array(mat, dtype = numpy.float64).reshape(4, 4)
+
+def _add_bme_struct_part(
+        writer: UTIL_blender_mesh.MeshWriter,
+        bmemtl: PROP_bme_material.BMEMaterialsHelper,
+        part: UTIL_bme_core.BMEStructPart) -> None:
+    """
+    Add geometry part into writer.
+    Materials are fetched by name in each call, because cached part may outlive them.
+    """
+    # normal and uv are based on face corner, so their indices are the corner index.
+    corner_indices: numpy.ndarray = numpy.arange(len(part.mFacePosIndices), dtype = numpy.int64)
+    mesh_part: UTIL_blender_mesh.MeshWriterBulkIngredient = UTIL_blender_mesh.MeshWriterBulkIngredient()
+    mesh_part.mVertexPosition = part.mVertexPosition
+    mesh_part.mVertexNormal = part.mVertexNormal
+    mesh_part.mVertexUV = part.mVertexUV
+    mesh_part.mFacePosIndices = part.mFacePosIndices
+    mesh_part.mFaceNmlIndices = corner_indices
+    mesh_part.mFaceUvIndices = corner_indices
+    mesh_part.mFaceVertexCount = part.mFaceVertexCount
+    mesh_part.mFaceMtlIdx = part.mFaceMtlIdx
+    mesh_part.mMaterial = (bmemtl.get_material(mtl_name) for mtl_name in part.mMaterialNames)
+    writer.add_bulk_ingredient(mesh_part)
 
 #endregion
 
-#region Creation Assist Functions
+#region Layout Builder
 
-def _compute_normals(
-    point1: UTIL_virtools_types.ConstVxVector3,
-    point2: UTIL_virtools_types.ConstVxVector3,
-    point3: UTIL_virtools_types.ConstVxVector3) -> UTIL_virtools_types.ConstVxVector3:
-    # build vector
-    p1: mathutils.Vector = mathutils.Vector(point1)
-    p2: mathutils.Vector = mathutils.Vector(point2)
-    p3: mathutils.Vector = mathutils.Vector(point3)
-    
-    vector1: mathutils.Vector = p2 - p1
-    vector2: mathutils.Vector = p3 - p2
-    
-    # do vector x mutiply
-    # vector1 x vector2
-    corss_mul: mathutils.Vector = vector1.cross(vector2)
-    
-    # do a normalization
-    corss_mul.normalize()
-    return (corss_mul.x, corss_mul.y, corss_mul.z)
+class LayoutMergeMode(enum.IntEnum):
+    No = enum.auto()
+    Sector = enum.auto()
+    Material = enum.auto()
+
+@dataclass
+class LayoutEntry():
+    """
+    One BME structure described in layout file.
+    """
+    mIdentifier: str
+    mCfgs: dict[str, typing.Any]
+    mTransform: mathutils.Matrix
+    mSector: int
+
+def _parse_layout_cfgs(data: typing.Any) -> dict[str, typing.Any]:
+    if data is None: return {}
+    if not isinstance(data, dict):
+        raise UTIL_functions.BBPException('layout cfgs must be an object')
+    # JSON do not have tuple, but face cfg is 6 bool tuple.
+    return {k: tuple(v) if isinstance(v, list) else v for k, v in data.items()}
+
+def _is_layout_number(data: typing.Any) -> bool:
+    # bool is int in Python, but it is not a number in layout.
+    return isinstance(data, (int, float)) and not isinstance(data, bool)
+
+def _parse_layout_vector(data: typing.Any, default: tuple[float, float, float]) -> tuple[float, float, float]:
+    if data is None: return default
+    if not isinstance(data, list) or len(data) != 3 or not all(_is_layout_number(v) for v in data):
+        raise UTIL_functions.BBPException('layout location, rotation and scale must have 3 numbers')
+    return (float(data[0]), float(data[1]), float(data[2]))
+
+def _parse_layout_sector(data: typing.Any) -> int:
+    if data is None: return 1
+    # CSV layout gives sector in text.
+    if isinstance(data, str):
+        try:
+            return int(data)
+        except ValueError:
+            pass
+    elif isinstance(data, int) and not isinstance(data, bool):
+        return data
+    raise UTIL_functions.BBPException('layout sector must be an integer')
 
-def _is_mirror_matrix(mat: mathutils.Matrix) -> bool:
+def _parse_layout_transform(data: typing.Any) -> mathutils.Matrix:
+    if data is None: return mathutils.Matrix.Identity(4)
+    if isinstance(data, list):
+        # 4x4 matrix in row major, or flatten 16 numbers.
+        values: numpy.ndarray = numpy.array(data, dtype = numpy.float64)
+        if values.size != 16:
+            raise UTIL_functions.BBPException('layout matrix must have 16 numbers')
+        return mathutils.Matrix(values.reshape(4, 4).tolist())
+    if isinstance(data, dict):
+        # location, rotation (XYZ euler in degree) and scale
+        loc: tuple[float, ...] = _parse_layout_vector(data.get('location', None), (0.0, 0.0, 0.0))
+        rot: tuple[float, ...] = tuple(math.radians(v) for v in _parse_layout_vector(data.get('rotation', None), (0.0, 0.0, 0.0)))
+        scale: tuple[float, ...] = _parse_layout_vector(data.get('scale', None), (1.0, 1.0, 1.0))
+        return mathutils.Matrix.LocRotScale(
+            mathutils.Vector(loc),
+            mathutils.Euler(rot, 'XYZ'),
+            mathutils.Vector(scale)
+        )
+    raise UTIL_functions.BBPException('layout transform must be a matrix or an object')
+
+def _parse_layout_entry(data: typing.Any) -> LayoutEntry:
+    if not isinstance(data, dict) or not isinstance(data.get('identifier', None), str):
+        raise UTIL_functions.BBPException('layout entry must be an object with identifier')
+    ident: str = data['identifier']
+    if ident not in _g_BMEPrototypeIndex:
+        raise UTIL_functions.BBPException(f'unknown BME prototype in layout: {ident}')
+    return LayoutEntry(
+        ident,
+        _parse_layout_cfgs(data.get('cfgs', None)),
+        _parse_layout_transform(data.get('transform', None)),
+        _parse_layout_sector(data.get('sector', None))
+    )
+
+def load_layout(filepath: str) -> list[LayoutEntry]:
     """
-    Reflection matrix (aka. mirror matrix) is a special scaling matrix.
-    In this matrix, 1 or 3 scaling factor is minus number.
+    Load BME layout file.
+
+    JSON layout is an array of object with `identifier`, `cfgs`, `transform` and `sector` fields.
+    CSV layout has the columns with the same names,
+    and `cfgs` and `transform` columns are written in JSON text.
+    Only `identifier` is required. Transform can be a 4x4 matrix,
+    or an object with `location`, `rotation` (XYZ euler in degree) and `scale`.
 
-    Mirror matrix will cause the inverse of triangle indice order.
-    So we need detect it and re-reverse when creating bm struct.
-    This function can detect whether given matrix is mirror matrix.
+    :param filepath: The path to layout file.
+    :return: The list of layout entries.
+    """
+    try:
+        rows: list[typing.Any]
+        with open(filepath, 'r', encoding = 'utf-8', newline = '') as f:
+            if os.path.splitext(filepath)[1].lower() == '.csv':
+                rows = []
+                for row in csv.DictReader(f):
+                    # decode JSON columns and skip empty cells
+                    data: dict[str, typing.Any] = {k: v.strip() for k, v in row.items() if k is not None and v}
+                    if 'cfgs' in data: data['cfgs'] = json.loads(data['cfgs'])
+                    if 'transform' in data: data['transform'] = json.loads(data['transform'])
+                    rows.append(data)
+            else:
+                rows = json.load(f)
+                if not isinstance(rows, list):
+                    raise UTIL_functions.BBPException('JSON layout must be an array')
+        return [_parse_layout_entry(row) for row in rows]
+    except (OSError, ValueError, TypeError) as e:
+        raise UTIL_functions.BBPException(f'fail to load layout file: {e}') from e
 
-    Reference: https://zhuanlan.zhihu.com/p/96717729
+def _extract_bme_struct_part_material(part: UTIL_bme_core.BMEStructPart, mtl_idx: int) -> UTIL_bme_core.BMEStructPart:
     """
-    return mat.is_negative
-    #return mat.to_3x3().determinant() < 0
+    Extract the faces using given material slot from part, as a new part with only one material.
+    Unused vertices are dropped.
+    """
+    face_mask: numpy.ndarray = part.mFaceMtlIdx == mtl_idx
+    corner_mask: numpy.ndarray = numpy.repeat(face_mask, part.mFaceVertexCount)
+    pos_indices: numpy.ndarray = part.mFacePosIndices[corner_mask]
+    # compact vertices
+    used_pos: numpy.ndarray = numpy.unique(pos_indices)
+    face_vertex_count: numpy.ndarray = part.mFaceVertexCount[face_mask]
+    return UTIL_bme_core.BMEStructPart(
+        part.mVertexPosition[used_pos],
+        part.mVertexNormal[corner_mask],
+        part.mVertexUV[corner_mask],
+        numpy.searchsorted(used_pos, pos_indices),
+        face_vertex_count,
+        numpy.zeros(len(face_vertex_count), dtype = numpy.int64),
+        (part.mMaterialNames[mtl_idx], )
+    )
+
+def _resolve_layout_cfgs(entry: LayoutEntry, showcase: dict[str, typing.Any]) -> dict[str, typing.Any]:
+    """
+    Fill absent cfgs of layout entry with default value,
+    and convert given value to cfg type like what Blender property does.
+    """
+    cfgs: dict[str, typing.Any] = {}
+    for cfg in map(PrototypeShowcaseCfgDescriptor, showcase[TOKEN_SHOWCASE_CFGS]):
+        cfg_value: typing.Any = entry.mCfgs.get(cfg.get_field(), None)
+        if cfg_value is None:
+            cfgs[cfg.get_field()] = cfg.get_default()
+            continue
+        try:
+            match(cfg.get_type()):
+                case PrototypeShowcaseCfgsTypes.Integer:
+                    cfgs[cfg.get_field()] = int(cfg_value)
+                case PrototypeShowcaseCfgsTypes.Float:
+                    cfgs[cfg.get_field()] = float(cfg_value)
+                case PrototypeShowcaseCfgsTypes.Boolean:
+                    cfgs[cfg.get_field()] = bool(cfg_value)
+                case PrototypeShowcaseCfgsTypes.Face:
+                    cfgs[cfg.get_field()] = tuple(bool(v) for v in cfg_value)
+        except (TypeError, ValueError) as e:
+            raise UTIL_functions.BBPException(f'invalid cfg {cfg.get_field()} of {entry.mIdentifier} in layout') from e
+    return cfgs
+
+def create_bme_structs_from_layout(
+        entries: typing.Iterable[LayoutEntry],
+        merge_mode: LayoutMergeMode,
+        link_duplicate: bool = False,
+        parallel: bool = False) -> list[bpy.types.Object]:
+    """
+    Create BME structures described by layout in batch.
+
+    All structures share one BME material helper.
+    If merge is not requested, each structure become one object with its transform as world matrix.
+    Otherwise, the transform is applied to vertices and structures are merged into shared objects.
+    Created objects are not added into scene.
+
+    :param entries: The layout entries.
+    :param merge_mode: How to merge structures.
+    :param link_duplicate: True to share mesh between the structures with the same identifier and cfgs.
+        It only works when merge is not requested.
+    :param parallel: True to generate geometry in process pool.
+        It is only worth for large layout because starting worker process is expensive.
+    :return: The created objects.
+    """
+    # sync geometry cache size with preferences
+    set_geometry_cache_size(PROP_preferences.get_raw_preferences().mBMEGeometryCacheSize)
+    # collect existing meshes once for linked duplicate
+    shared_meshes: dict[str, bpy.types.Mesh] = _find_bme_struct_meshes() if link_duplicate else {}
+
+    # resolve all entries first and collect generation requests,
+    # so that all geometry can be generated in one batch.
+    # each resolved entry has its object type, mesh key and the index of generation request
+    # (None if it shares existing mesh).
+    requests: list[tuple[str, mathutils.Matrix, dict[str, typing.Any]]] = []
+    resolved: list[tuple[LayoutEntry, PrototypeShowcaseTypes, str, int | None]] = []
+    scheduled: dict[str, int] = {}
+    for entry in entries:
+        # only showcase prototype can be created as structure
+        showcase: typing.Any = _get_prototype_showcase(entry.mIdentifier)
+        if showcase is None:
+            raise UTIL_functions.BBPException(f'BME prototype is not creatable: {entry.mIdentifier}')
+        cfgs: dict[str, typing.Any] = _resolve_layout_cfgs(entry, showcase)
+        proto_type: PrototypeShowcaseTypes = PrototypeShowcaseTypes(showcase[TOKEN_SHOWCASE_TYPE])
+        mesh_key: str = _get_bme_struct_mesh_key(entry.mIdentifier, cfgs)
+
+        # the structure sharing mesh do not need to be generated
+        request_index: int | None
+        if merge_mode == LayoutMergeMode.No and link_duplicate and mesh_key in shared_meshes:
+            request_index = None
+        elif merge_mode == LayoutMergeMode.No and link_duplicate and mesh_key in scheduled:
+            request_index = scheduled[mesh_key]
+        else:
+            # evaluate params
+            proto: dict[str, typing.Any] = _get_prototype_by_identifier(entry.mIdentifier)
+            params: dict[str, typing.Any] = _eval_bme_struct_params(proto, cfgs)
+            # if not merged, generate without transform so that the geometry cache is shared by the same cfgs.
+            transform: mathutils.Matrix = mathutils.Matrix.Identity(4) if merge_mode == LayoutMergeMode.No else entry.mTransform
+            request_index = len(requests)
+            requests.append((entry.mIdentifier, transform, params))
+            scheduled[mesh_key] = request_index
+        resolved.append((entry, proto_type, mesh_key, request_index))
+
+    # generate all geometry
+    generated: list[tuple[UTIL_bme_core.BMEStructPart, ...]] = _generate_bme_struct_parts_batch(requests, parallel)
+
+    # merge group key is (object type, sector, material name).
+    # sector or material name is None if they are not used for grouping.
+    groups: dict[tuple[PrototypeShowcaseTypes, int | None, str | None], list[UTIL_bme_core.BMEStructPart]] = {}
+    objs: list[bpy.types.Object] = []
+    with PROP_bme_material.BMEMaterialsHelper(bpy.context.scene) as bmemtl:
+        for entry, proto_type, mesh_key, request_index in resolved:
+            match(merge_mode):
+                case LayoutMergeMode.No:
+                    mesh: bpy.types.Mesh | None = shared_meshes.get(mesh_key, None)
+                    if mesh is None:
+                        mesh = bpy.data.meshes.new('BMEStruct')
+                        with UTIL_blender_mesh.MeshWriter(mesh) as writer:
+                            for part in generated[typing.cast(int, request_index)]:
+                                _add_bme_struct_part(writer, bmemtl, part)
+                        if link_duplicate:
+                            _mark_bme_struct_mesh(mesh, mesh_key)
+                            shared_meshes[mesh_key] = mesh
+                    obj: bpy.types.Object = _create_bme_struct_object(_get_bme_struct_object_info_by_type(proto_type), mesh)
+                    obj.matrix_world = entry.mTransform
+                    objs.append(obj)
+                case LayoutMergeMode.Sector:
+                    groups.setdefault((proto_type, entry.mSector, None), []).extend(
+                        generated[typing.cast(int, request_index)]
+                    )
+                case LayoutMergeMode.Material:
+                    for part in generated[typing.cast(int, request_index)]:
+                        for mtl_idx, mtl_name in enumerate(part.mMaterialNames):
+                            groups.setdefault((proto_type, None, mtl_name), []).append(
+                                _extract_bme_struct_part_material(part, mtl_idx)
+                            )
+
+        # build merged objects
+        for (proto_type, _, _), parts in groups.items():
+            mesh = bpy.data.meshes.new('BMEStruct')
+            with UTIL_blender_mesh.MeshWriter(mesh) as writer:
+                for part in parts:
+                    _add_bme_struct_part(writer, bmemtl, part)
+            objs.append(_create_bme_struct_object(_get_bme_struct_object_info_by_type(proto_type), mesh))
+
+    return objs
 
 #endregion
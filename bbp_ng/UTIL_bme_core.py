@@ -0,0 +1,449 @@
+import numpy
+import os, sys, math, typing, types, marshal, importlib.util, site, contextlib, multiprocessing, concurrent.futures
+from dataclasses import dataclass
+
+## BME Geometry Core
+#  This module contains the BME geometry logic which do not depend on Blender.
+#  It only uses Python standard library and NumPy,
+#  so it can be imported outside of Blender (e.g. benchmark scripts) and by process pool workers.
+#
+#  Do NOT import any other module of this plugin in this file, including relative import,
+#  because process pool worker imports this file as a top level module (see Batch Engine below).
+#
+#  In this module, transform matrix is 4x4 float64 NumPy array, not mathutils.Matrix.
+
+#region Programmable Field Env
+
+def _env_fct_distance(x1: float, y1: float, x2: float, y2: float) -> float:
+    return math.hypot(x2 - x1, y2 - y1)
+
+def _env_fct_angle(x1: float, y1: float, x2: float, y2: float) -> float:
+    # compute counter-clockwise angle from +X axis first, which is ranged from -180 to 180.
+    # the same as the old implementation using mathutils,
+    # the zero vector has zero angle.
+    angle = math.degrees(math.atan2(y2 - y1, x2 - x1))
+    # process positove number and negative number respectively
+    # to let it range change from -180~180 to 0~360
+    if angle > 0: return angle
+    else: return 360 + angle
+
+def _env_fct_move(x: float, y: float, z: float) -> numpy.ndarray:
+    return numpy.array((
+        (1.0, 0.0, 0.0, x),
+        (0.0, 1.0, 0.0, y),
+        (0.0, 0.0, 1.0, z),
+        (0.0, 0.0, 0.0, 1.0),
+    ), dtype = numpy.float64)
+
+def _env_fct_rot(x: float, y: float, z: float) -> numpy.ndarray:
+    # XYZ euler in degree. X axis is rotated first, so matrix is Rz @ Ry @ Rx.
+    (sx, cx) = (math.sin(math.radians(x)), math.cos(math.radians(x)))
+    (sy, cy) = (math.sin(math.radians(y)), math.cos(math.radians(y)))
+    (sz, cz) = (math.sin(math.radians(z)), math.cos(math.radians(z)))
+    return numpy.array((
+        (cy * cz, sx * sy * cz - cx * sz, cx * sy * cz + sx * sz, 0.0),
+        (cy * sz, sx * sy * sz + cx * cz, cx * sy * sz - sx * cz, 0.0),
+        (-sy, sx * cy, cx * cy, 0.0),
+        (0.0, 0.0, 0.0, 1.0),
+    ), dtype = numpy.float64)
+
+def _env_fct_scale(x: float, y: float, z: float) -> numpy.ndarray:
+    return numpy.diag((x, y, z, 1.0)).astype(numpy.float64)
+
+def _env_fct_ident() -> numpy.ndarray:
+    return numpy.identity(4, dtype = numpy.float64)
+
+PROG_FIELD_GLOBALS: dict[str, typing.Any] = {
+    # constant
+    'pi': math.pi,
+    'tau': math.tau,
+
+    # math functions
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'asin': math.asin,
+    'acos': math.acos,
+    'atan': math.atan,
+
+    'pow': math.pow,
+    'sqrt': math.sqrt,
+
+    'fabs': math.fabs,
+
+    'degrees': math.degrees,
+    'radians': math.radians,
+
+    # builtin functions
+    'abs': abs,
+
+    'int': int,
+    'float': float,
+    'str': str,
+    'bool': bool,
+
+    # my custom matrix functions
+    'move': _env_fct_move,
+    'rot': _env_fct_rot,
+    'scale': _env_fct_scale,
+    'ident': _env_fct_ident,
+
+    # my misc custom functions
+    'distance': _env_fct_distance,
+    'angle': _env_fct_angle,
+}
+"""The globals used when evaluating programmable fields."""
+
+#endregion
+
+#region Compiled Prototypes
+
+## The signature of compiled prototype function: `fct(params, transform, emit)`.
+#  See the Prototype Compiler in UTIL_bme for more detail.
+CompiledPrototype = typing.Callable[[dict[str, typing.Any], numpy.ndarray, typing.Callable], None]
+
+def pack_prototypes_code(proto_hash: str, code: types.CodeType) -> bytes:
+    """
+    Pack the compiled code of generated prototypes source into bytes.
+
+    Like Python pyc file, marshaled code is interpreter specific,
+    so packed data is bound to both of Python magic number and prototypes hash.
+    """
+    return importlib.util.MAGIC_NUMBER + proto_hash.encode('utf-8') + b'\0' + marshal.dumps(code)
+
+def unpack_prototypes_code(data: bytes) -> tuple[str, types.CodeType] | None:
+    """
+    Unpack the data created by pack_prototypes_code().
+
+    @return The tuple of prototypes hash and compiled code, or None if data is broken or created by other interpreter.
+    """
+    if not data.startswith(importlib.util.MAGIC_NUMBER): return None
+    sep: int = data.find(b'\0', len(importlib.util.MAGIC_NUMBER))
+    if sep < 0: return None
+    try:
+        proto_hash: str = data[len(importlib.util.MAGIC_NUMBER):sep].decode('utf-8')
+        return (proto_hash, marshal.loads(data[sep + 1:]))
+    except (EOFError, ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+def _get_missing_prototype(ident: str) -> typing.NoReturn:
+    raise KeyError(f'invalid BME prototype identifier: {ident}')
+
+def exec_prototypes_code(
+        code: types.CodeType,
+        fct_missing: typing.Callable[[str], typing.NoReturn] = _get_missing_prototype,
+        fct_wrapper: typing.Callable[[CompiledPrototype], CompiledPrototype] | None = None) -> dict[str, CompiledPrototype]:
+    """
+    Execute the compiled code of generated prototypes source.
+
+    @param code[in] The compiled code.
+    @param fct_missing[in] The function called when prototype refers to a missing prototype.
+    @param fct_wrapper[in] The function wrapping each compiled prototype function (e.g. for counting calls), or None.
+    Because prototype function calls its instances by global name, the calls of instances are also wrapped.
+    @return The dict. Key is prototype identifier. Value is the compiled prototype function.
+    """
+    namespace: dict[str, typing.Any] = dict(PROG_FIELD_GLOBALS)
+    namespace['_get_missing_prototype'] = fct_missing
+    exec(code, namespace)
+    prototypes: dict[str, CompiledPrototype] = namespace['_bme_protos']
+    if fct_wrapper is not None:
+        wrapped: dict[str, CompiledPrototype] = {}
+        for ident, fct in prototypes.items():
+            wrapped[ident] = fct_wrapper(fct)
+            namespace[fct.__name__] = wrapped[ident]
+        prototypes = wrapped
+    return prototypes
+
+#endregion
+
+#region Geometry Part
+
+@dataclass(frozen = True)
+class BMEStructPart():
+    """
+    The geometry generated by one prototype (not including its instances), which has been transformed.
+    Normal and UV are stored per face corner.
+    """
+    mVertexPosition: numpy.ndarray
+    mVertexNormal: numpy.ndarray
+    mVertexUV: numpy.ndarray
+    mFacePosIndices: numpy.ndarray
+    mFaceVertexCount: numpy.ndarray
+    mFaceMtlIdx: numpy.ndarray
+    mMaterialNames: tuple[str, ...]
+
+    def set_read_only(self) -> None:
+        """
+        Set all arrays to read-only, because part may be shared by cache.
+        """
+        for arr in (self.mVertexPosition, self.mVertexNormal, self.mVertexUV, self.mFacePosIndices, self.mFaceVertexCount, self.mFaceMtlIdx):
+            arr.setflags(write = False)
+
+def build_bme_struct_part(
+        transform: numpy.ndarray,
+        vertices: list[typing.Any],
+        faces: list[tuple[tuple[int, ...], str, tuple[typing.Any, ...], tuple[typing.Any, ...] | None]]) -> BMEStructPart:
+    """
+    Build the vertices and faces emitted by compiled prototype function into geometry part.
+    All given vertices and faces are not skipped, and they are not transformed yet.
+    """
+    # create mtl slot remap to help following mesh adding
+    # because mesh writer do not accept string format mtl slot visiting,
+    # it only accept int based mtl slot index.
+    # NOTE: since Python 3.6, the item of builtin dict is ordered by inserting order.
+    # we rely on this to keep slot order.
+    mtl_remap: dict[str, int] = {}
+    face_mtl_idx: list[int] = []
+    for _, mtl_name, _, _ in faces:
+        face_mtl_idx.append(mtl_remap.setdefault(mtl_name, len(mtl_remap)))
+
+    # Check whether given transform is mirror matrix
+    # because mirror matrix will reverse triangle indice order.
+    # If matrix is mirror matrix, we need reverse it again in following procession,
+    # including getting uv, calculating normal and providing face data.
+    mirror_matrix: bool = is_mirror_matrix(transform)
+
+    # collect face corner data.
+    # normals are collected separately. given normals will be transformed later,
+    # and the faces without normals will compute them from transformed vertices later.
+    uv_data: list[typing.Any] = []
+    face_pos_indices: list[int] = []
+    face_vertex_count: list[int] = []
+    given_nml_data: list[typing.Any] = []
+    given_nml_corners: list[int] = []
+    computed_nml_tris: list[tuple[int, int, int]] = []
+    computed_nml_corners: list[int] = []
+    for face_indices, _, face_uvs, face_nmls in faces:
+        # get face indices considering the mirror matrix
+        if mirror_matrix:
+            face_indices = face_indices[::-1]
+            face_uvs = face_uvs[::-1]
+        face_pos_indices.extend(face_indices)
+        face_vertex_count.append(len(face_indices))
+
+        if face_nmls is None:
+            # nml is null, we need compute it by the first 3 vertices.
+            computed_nml_tris.append((face_indices[0], face_indices[1], face_indices[2]))
+            computed_nml_corners.extend([len(computed_nml_tris) - 1] * len(face_indices))
+            given_nml_corners.extend([-1] * len(face_indices))
+        else:
+            given_nml_corners.extend(range(len(given_nml_data), len(given_nml_data) + len(face_indices)))
+            given_nml_data.extend(face_nmls[:len(face_indices)])
+            computed_nml_corners.extend([-1] * len(face_indices))
+
+        # BME uv do not need any extra process
+        uv_data.extend(face_uvs)
+
+    # transform all vertices in batch.
+    # vertex is treated as point when multiplying it with 4x4 matrix.
+    vec_data: numpy.ndarray = numpy.array(vertices, dtype = numpy.float64).reshape(-1, 3)
+    vec_data = vec_data @ transform[:3, :3].T + transform[:3, 3]
+
+    # build corner normals
+    nml_data: numpy.ndarray = numpy.zeros((len(face_pos_indices), 3), dtype = numpy.float64)
+    if len(given_nml_data) != 0:
+        # BME normals need transform by the transposed inverse matrix first, then normalize it
+        # ref: https://zhuanlan.zhihu.com/p/96717729
+        nml_mat: numpy.ndarray = _get_inverted_safe(transform).T
+        given_nml: numpy.ndarray = numpy.array(given_nml_data, dtype = numpy.float64).reshape(-1, 3)
+        given_nml = normalize_rows(given_nml @ nml_mat[:3, :3].T + nml_mat[:3, 3])
+        corners: numpy.ndarray = numpy.array(given_nml_corners, dtype = numpy.int64)
+        used: numpy.ndarray = corners >= 0
+        nml_data[used] = given_nml[corners[used]]
+    if len(computed_nml_tris) != 0:
+        # because the normals is computed from transformed vertices
+        # so no need to correct its by normal transform.
+        tris: numpy.ndarray = numpy.array(computed_nml_tris, dtype = numpy.int64)
+        p1: numpy.ndarray = vec_data[tris[:, 0]]
+        p2: numpy.ndarray = vec_data[tris[:, 1]]
+        p3: numpy.ndarray = vec_data[tris[:, 2]]
+        computed_nml: numpy.ndarray = normalize_rows(numpy.cross(p2 - p1, p3 - p2))
+        corners = numpy.array(computed_nml_corners, dtype = numpy.int64)
+        used = corners >= 0
+        nml_data[used] = computed_nml[corners[used]]
+
+    # build part.
+    part: BMEStructPart = BMEStructPart(
+        numpy.array(vec_data, dtype = numpy.float32).reshape(-1, 3),
+        numpy.array(nml_data, dtype = numpy.float32).reshape(-1, 3),
+        numpy.array(uv_data, dtype = numpy.float32).reshape(-1, 2),
+        numpy.array(face_pos_indices, dtype = numpy.int64),
+        numpy.array(face_vertex_count, dtype = numpy.int64),
+        numpy.array(face_mtl_idx, dtype = numpy.int64),
+        tuple(mtl_remap.keys())
+    )
+    part.set_read_only()
+    return part
+
+def generate_bme_struct_parts(
+        prototype_fct: CompiledPrototype,
+        transform: numpy.ndarray,
+        params: dict[str, typing.Any]) -> tuple[BMEStructPart, ...]:
+    """
+    Generate the geometry parts of given compiled prototype.
+
+    @param prototype_fct[in] The compiled prototype function.
+    @param transform[in] The 4x4 transform matrix applied to generated geometry.
+    @param params[in] The params of prototype.
+    @return The geometry parts of prototype and its instances.
+    """
+    # call compiled prototype function.
+    # it recursively calls the functions of its instances,
+    # and pass each prototype data to emitter which build them into parts.
+    collected: list[BMEStructPart] = []
+    def emitter(
+            struct_transform: numpy.ndarray,
+            vertices: list[typing.Any],
+            faces: list[tuple[tuple[int, ...], str, tuple[typing.Any, ...], tuple[typing.Any, ...] | None]]) -> None:
+        collected.append(build_bme_struct_part(struct_transform, vertices, faces))
+
+    prototype_fct(params, transform, emitter)
+    return tuple(collected)
+
+def normalize_rows(vecs: numpy.ndarray) -> numpy.ndarray:
+    """
+    Normalize each row vector. Zero vector is kept as zero, like mathutils does.
+    """
+    lengths: numpy.ndarray = numpy.linalg.norm(vecs, axis = 1, keepdims = True)
+    return numpy.divide(vecs, lengths, out = numpy.zeros_like(vecs), where = lengths != 0)
+
+def is_mirror_matrix(mat: numpy.ndarray) -> bool:
+    """
+    Reflection matrix (aka. mirror matrix) is a special scaling matrix.
+    In this matrix, 1 or 3 scaling factor is minus number.
+
+    Mirror matrix will cause the inverse of triangle indice order.
+    So we need detect it and re-reverse when creating bm struct.
+    This function can detect whether given matrix is mirror matrix.
+
+    Reference: https://zhuanlan.zhihu.com/p/96717729
+    """
+    return bool(numpy.linalg.det(mat[:3, :3]) < 0)
+
+def _get_inverted_safe(mat: numpy.ndarray) -> numpy.ndarray:
+    # like mathutils.Matrix.inverted_safe, singular matrix still get a usable result.
+    try:
+        return numpy.linalg.inv(mat)
+    except numpy.linalg.LinAlgError:
+        return numpy.linalg.pinv(mat)
+
+#endregion
+
+#region Batch Engine
+
+# YYC MARK:
+# Process pool worker can not import this module as the member of plugin package,
+# because importing plugin package will execute its __init__ which requires Blender.
+# So worker adds the folder of this file into its path and imports this file as a top level module.
+# For pickling worker function by this top level name in main process,
+# this module is also registered with this name in main process when creating pool.
+# It is safe because this module do not have any relative import.
+#
+# Spawned worker also re-runs the `__main__` module of main process if it has a file path or a module spec.
+# When structures are generated by a script executed by `blender --background --python gen.py`,
+# `__main__` is that script which usually imports bpy, and it kills every worker.
+# So a stub `__main__` module is installed while workers are starting (see _stub_main_module()).
+
+## The top level module name of this file used by process pool worker.
+_c_WorkerModuleName: str = 'UTIL_bme_core'
+
+## The request of generating geometry in batch.
+#  It is the tuple of prototype identifier, params and 4x4 transform matrix.
+#  Only builtin types are used, because it need to be sent to worker process.
+GenerationRequest = tuple[str, dict[str, typing.Any], tuple[tuple[float, ...], ...]]
+
+## The geometry part sent from worker process.
+#  It is the tuple of BMEStructPart fields by declared order.
+_RawPart = tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, tuple[str, ...]]
+
+_g_WorkerPrototypes: tuple[str, dict[str, CompiledPrototype]] | None = None
+"""The compiled prototypes in worker process, with its prototypes hash."""
+
+def _generate_in_worker(proto_hash: str, code_data: bytes, requests: list[GenerationRequest]) -> list[list[_RawPart]]:
+    global _g_WorkerPrototypes
+    # compiled prototypes are only loaded once in each worker.
+    if _g_WorkerPrototypes is None or _g_WorkerPrototypes[0] != proto_hash:
+        unpacked: tuple[str, types.CodeType] | None = unpack_prototypes_code(code_data)
+        if unpacked is None:
+            raise RuntimeError('fail to load compiled BME prototypes in worker')
+        _g_WorkerPrototypes = (proto_hash, exec_prototypes_code(unpacked[1]))
+    prototypes: dict[str, CompiledPrototype] = _g_WorkerPrototypes[1]
+
+    result: list[list[_RawPart]] = []
+    for ident, params, transform in requests:
+        parts: tuple[BMEStructPart, ...] = generate_bme_struct_parts(
+            prototypes[ident],
+            numpy.array(transform, dtype = numpy.float64),
+            params
+        )
+        result.append([(
+            part.mVertexPosition, part.mVertexNormal, part.mVertexUV,
+            part.mFacePosIndices, part.mFaceVertexCount, part.mFaceMtlIdx,
+            part.mMaterialNames
+        ) for part in parts])
+    return result
+_generate_in_worker.__module__ = _c_WorkerModuleName
+
+@contextlib.contextmanager
+def _stub_main_module() -> typing.Iterator[None]:
+    """
+    Replace `__main__` module by an empty module in this context,
+    so that spawned worker process do not re-run the main script of this process.
+    """
+    main_module: types.ModuleType | None = sys.modules.get('__main__', None)
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        if main_module is None: del sys.modules['__main__']
+        else: sys.modules['__main__'] = main_module
+
+def generate_bme_struct_parts_parallel(
+        proto_hash: str,
+        code_data: bytes,
+        requests: list[GenerationRequest],
+        max_workers: int | None = None) -> list[tuple[BMEStructPart, ...]]:
+    """
+    Generate the geometry parts of many prototypes in process pool.
+
+    Starting worker process is expensive (each worker need import NumPy and load compiled prototypes),
+    so this function is only worth for generating a large amount of structures.
+
+    @param proto_hash[in] The hash of prototypes.
+    @param code_data[in] The compiled prototypes packed by pack_prototypes_code().
+    @param requests[in] The generation requests.
+    @param max_workers[in] The count of worker process. None to use the count of CPU.
+    @return The geometry parts of each request in the same order.
+    @exception concurrent.futures.process.BrokenProcessPool Worker process can not be started or it is terminated abruptly.
+    """
+    if len(requests) == 0: return []
+    workers: int = max(1, min(max_workers or os.cpu_count() or 1, len(requests)))
+    # split requests into chunks.
+    # a few chunks per worker, so that the workload is balanced but code data is not sent too many times.
+    chunk_count: int = min(len(requests), workers * 4)
+    chunk_size: int = (len(requests) + chunk_count - 1) // chunk_count
+    chunks: list[list[GenerationRequest]] = [requests[i:i + chunk_size] for i in range(0, len(requests), chunk_size)]
+
+    # register this module with worker module name, see the comment of _c_WorkerModuleName.
+    sys.modules.setdefault(_c_WorkerModuleName, sys.modules[__name__])
+    # always use spawn, because fork is not available on Windows and not safe for Blender.
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers = workers,
+            mp_context = multiprocessing.get_context('spawn'),
+            initializer = site.addsitedir,
+            initargs = (os.path.dirname(os.path.abspath(__file__)), )) as executor:
+        # worker processes are spawned when submitting tasks.
+        with _stub_main_module():
+            futures = [executor.submit(_generate_in_worker, proto_hash, code_data, chunk) for chunk in chunks]
+        result: list[tuple[BMEStructPart, ...]] = []
+        for future in futures:
+            for raw_parts in future.result():
+                parts: list[BMEStructPart] = []
+                for raw_part in raw_parts:
+                    part: BMEStructPart = BMEStructPart(*raw_part)
+                    part.set_read_only()
+                    parts.append(part)
+                result.append(tuple(parts))
+    return result
+
+#endregion
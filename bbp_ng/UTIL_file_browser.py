@@ -85,6 +85,18 @@ class ExportVirtoolsFile(bpy_extras.io_utils.ExportHelper):
     def general_get_filename(self) -> str:
         return self.filepath
     
+class ImportBmeLayoutFile(bpy_extras.io_utils.ImportHelper):
+
+    # we support multiple file ext, set like ImportBallanceImage
+    # filename_ext = ".json"
+    filter_glob: bpy.props.StringProperty(
+        default = "*.json;*.csv",
+        options = {'HIDDEN'}
+    ) # type: ignore
+
+    def general_get_filename(self) -> str:
+        return self.filepath
+    
 class ImportDirectory(bpy_extras.io_utils.ImportHelper):
 
     # add directory prop to receive directory
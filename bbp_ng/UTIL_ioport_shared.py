@@ -377,6 +377,41 @@ class VirtoolsParams():
         translation_context = 'BBP/UTIL_ioport_shared.VirtoolsParams/property'
     ) # type: ignore
 
+    use_fast_triangulation: bpy.props.BoolProperty(
+        name = "Fast Triangulation",
+        description = "Read triangles from Blender tessellation directly instead of triangulating mesh by BMesh. Faster, but quads and n-gons may be split in different diagonal.",
+        default = False,
+        translation_context = 'BBP/UTIL_ioport_shared.VirtoolsParams/property'
+    ) # type: ignore
+
+    use_vertex_welding: bpy.props.BoolProperty(
+        name = "Weld Vertices",
+        description = "Merge face vertices sharing the same position, normal and UV into one Virtools vertex. It produces smaller file, but the values which differ less than 0.00001 are also treated as the same.",
+        default = False,
+        translation_context = 'BBP/UTIL_ioport_shared.VirtoolsParams/property'
+    ) # type: ignore
+
+    use_mesh_instancing: bpy.props.BoolProperty(
+        name = "Share Identical Meshes",
+        description = "Export only one Virtools mesh for objects whose evaluated geometry, materials and lit mode are identical, even if they use different Blender meshes.",
+        default = False,
+        translation_context = 'BBP/UTIL_ioport_shared.VirtoolsParams/property'
+    ) # type: ignore
+
+    use_import_welding: bpy.props.BoolProperty(
+        name = "Weld Vertices",
+        description = "Merge imported vertices sharing the same position into one Blender vertex. Split normals and UVs are kept. Coincident faces, e.g. double-sided faces, may be removed by mesh validation.",
+        default = False,
+        translation_context = 'BBP/UTIL_ioport_shared.VirtoolsParams/property'
+    ) # type: ignore
+
+    use_import_sharing: bpy.props.BoolProperty(
+        name = "Share Identical Meshes",
+        description = "Create only one Blender mesh for imported meshes which have identical geometry, materials and lit mode. Shared mesh is named by the first one.",
+        default = False,
+        translation_context = 'BBP/UTIL_ioport_shared.VirtoolsParams/property'
+    ) # type: ignore
+
     def preset_vt_encodings_if_possible(self, context: bpy.types.Context):
         """
         Set preset value for Virtools Encoding list if there is no value inside it.
@@ -397,6 +432,13 @@ class VirtoolsParams():
         ptrprops = PROP_ptrprop_resolver.PropsVisitor(context.scene)
         ptrprops.draw_ioport_encodings(body)
 
+        # following field are only valid in importer
+        if is_importer:
+            body.separator()
+            body.label(text='Mesh', text_ctxt='BBP/UTIL_ioport_shared.VirtoolsParams/draw')
+            body.prop(self, 'use_import_welding')
+            body.prop(self, 'use_import_sharing')
+
         # following field are only valid in exporter
         if not is_importer:
             body.separator()
@@ -409,6 +451,12 @@ class VirtoolsParams():
             if self.use_compress:
                 body.prop(self, 'compress_level')
 
+            body.separator()
+            body.label(text='Mesh', text_ctxt='BBP/UTIL_ioport_shared.VirtoolsParams/draw')
+            body.prop(self, 'use_fast_triangulation')
+            body.prop(self, 'use_vertex_welding')
+            body.prop(self, 'use_mesh_instancing')
+
     def general_get_vt_encodings(self, context: bpy.types.Context) -> tuple[str, ...]:
         # get from ptrprop resolver then filter empty item
         ptrprops = PROP_ptrprop_resolver.PropsVisitor(context.scene)
@@ -422,6 +470,21 @@ class VirtoolsParams():
 
     def general_get_compress_level(self) -> int:
         return self.compress_level
+
+    def general_get_use_fast_triangulation(self) -> bool:
+        return self.use_fast_triangulation
+
+    def general_get_use_vertex_welding(self) -> bool:
+        return self.use_vertex_welding
+
+    def general_get_use_mesh_instancing(self) -> bool:
+        return self.use_mesh_instancing
+
+    def general_get_use_import_welding(self) -> bool:
+        return self.use_import_welding
+
+    def general_get_use_import_sharing(self) -> bool:
+        return self.use_import_sharing
     
 #endregion
 
@@ -1,129 +1,390 @@
-import bpy, bmesh, mathutils, math
+import bpy, mathutils, math, numpy
 import typing
 from . import UTIL_functions, UTIL_naming_convention
 from . import PROP_bme_material
 
-#region BMesh Operations Helper
-
-def _bmesh_extrude(
-        bm: bmesh.types.BMesh, 
-        start_edges: list[bmesh.types.BMEdge], 
-        direction: mathutils.Vector) -> list[bmesh.types.BMEdge]:
-    # extrude
-    ret: dict[str, typing.Any] = bmesh.ops.extrude_edge_only(
-        bm,
-        edges = start_edges, 
-        use_normal_flip = True, # NOTE: flip normal according to test result.
-        use_select_history = False
-    )
+## The segment count of each circle in rail section.
+c_RailSectionSegments: int = 8
 
-    # get end edges
-    ret_geom = ret['geom']
-    del ret
-    end_verts: list[bmesh.types.BMVert] = list(filter(lambda x: isinstance(x, bmesh.types.BMVert), ret_geom))
-    end_edges: list[bmesh.types.BMEdge] = list(filter(lambda x: isinstance(x, bmesh.types.BMEdge) and x.is_boundary, ret_geom))
-    # and move it
-    bmesh.ops.translate(
-        bm,
-        vec = direction, space = mathutils.Matrix.Identity(4),
-        verts = end_verts,
-        use_shapekey = False
-    )
+#region Rail Mesh Builder
+
+def _create_circle_ring(radius: float, matrix: mathutils.Matrix) -> numpy.ndarray:
+    """
+    Compute the vertices of a circle in closed form.
 
-    # return value
-    return end_edges
+    The vertex order and the start point are the same as `bmesh.ops.create_circle`,
+    that is, the k-th vertex is (-r * sin(phi), r * cos(phi), 0) with phi = 2 * pi * k / segments,
+    then transformed by given matrix.
 
-def _bmesh_screw(
-        bm: bmesh.types.BMesh,
-        start_verts: list[bmesh.types.BMVert], start_edges: list[bmesh.types.BMEdge],
-        angle: float, steps: int, iterations: int,
-        center: mathutils.Vector, screw_per_iteration: float) -> list[bmesh.types.BMEdge]:
+    @return The (segments, 3) array of vertex positions.
     """
-    Hints: Angle is input as degree unit.
+    phi: numpy.ndarray = numpy.arange(c_RailSectionSegments, dtype = numpy.float64) * (2 * math.pi / c_RailSectionSegments)
+    ring: numpy.ndarray = numpy.stack((
+        -radius * numpy.sin(phi),
+        radius * numpy.cos(phi),
+        numpy.zeros_like(phi),
+        numpy.ones_like(phi)
+    ), axis = 1)
+    return (ring @ numpy.asarray(matrix, dtype = numpy.float64).T)[:, :3]
+
+def _get_straight_frames(direction: mathutils.Vector) -> numpy.ndarray:
     """
-    # screw
-    ret: dict[str, typing.Any] = bmesh.ops.spin(
-        bm,
-        geom = start_edges,
-        cent = center, 
-        axis = mathutils.Vector((0, 0, 1)), # default to +Z
-        dvec = mathutils.Vector((0, 0, screw_per_iteration / steps)), # conv to step delta
-        angle = math.radians(angle) * iterations,
-        space = mathutils.Matrix.Identity(4),
-        steps = steps * iterations,
-        use_merge = False,
-        use_normal_flip = True, # NOTE: flip normal according to test result.
-        use_duplicate = False
-    )
-
-    # return last segment
-    geom_last = ret['geom_last']
-    del ret
-    return list(filter(lambda x: isinstance(x, bmesh.types.BMEdge), geom_last))
+    Get the sweep frames of a straight extrusion along given direction.
 
-def _bmesh_cap(bm: bmesh.types.BMesh, edges: list[bmesh.types.BMEdge]) -> None:
+    @return The (2, 4, 4) array of transform matrices.
     """
-    Cap given edges. And mark it as sharp edge.
-    Please reset all edges to smooth one before calling this.
+    frames: numpy.ndarray = numpy.tile(numpy.identity(4, dtype = numpy.float64), (2, 1, 1))
+    frames[1, :3, 3] = tuple(direction)
+    return frames
+
+def _get_screw_frames(
+        angle: float, steps: int, iterations: int,
+        center: mathutils.Vector, screw_per_iteration: float) -> numpy.ndarray:
     """
-    # fill holes
-    bmesh.ops.triangle_fill(
-        bm,
-        use_beauty = False, use_dissolve = False,
-        edges = edges
-        # no pass to normal.
-    )
-    
-    # and only set sharp for cap's edges
-    for edge in edges:
-        edge.smooth = False
+    Get the sweep frames of a screw, which is the closed form of `bmesh.ops.spin`.
+    Each step rotates around +Z axis at given center and then moves along +Z.
+
+    Hints: Angle is input as degree unit.
 
-def _bmesh_smooth_all_edges(bm: bmesh.types.BMesh) -> None:
+    @return The (steps * iterations + 1, 4, 4) array of transform matrices.
     """
-    Reset all edges to smooth. Call this before calling edge cap function.
+    total_steps: int = steps * iterations
+    k: numpy.ndarray = numpy.arange(total_steps + 1, dtype = numpy.float64)
+    theta: numpy.ndarray = math.radians(angle) * iterations * k / total_steps
+    cos_theta: numpy.ndarray = numpy.cos(theta)
+    sin_theta: numpy.ndarray = numpy.sin(theta)
+    cx, cy, _ = tuple(center)
+
+    # T(center + dz) @ Rz(theta) @ T(-center)
+    frames: numpy.ndarray = numpy.zeros((total_steps + 1, 4, 4), dtype = numpy.float64)
+    frames[:, 0, 0] = cos_theta
+    frames[:, 0, 1] = -sin_theta
+    frames[:, 1, 0] = sin_theta
+    frames[:, 1, 1] = cos_theta
+    frames[:, 2, 2] = 1
+    frames[:, 3, 3] = 1
+    frames[:, 0, 3] = cx - (cos_theta * cx - sin_theta * cy)
+    frames[:, 1, 3] = cy - (sin_theta * cx + cos_theta * cy)
+    frames[:, 2, 3] = k * (screw_per_iteration / steps)
+    return frames
+
+def compute_adaptive_screw_steps(
+        is_monorail: bool, rail_radius: float, rail_span: float,
+        angle: float, iterations: int, screw_radius: float,
+        max_chord_error: float, max_triangles: int) -> int:
+    """
+    Compute the segment count per iteration of screw rail by chord error.
+
+    The chord error (sagitta) of a segment spanning angle `a` on a circle with radius `R` is `R * (1 - cos(a / 2))`.
+    `R` is the distance from screw axis to the outmost point of rail section,
+    so that no point of rail deviates from ideal screw more than given tolerance.
+    Gentle arcs therefore get less segments than tight spirals.
+
+    If `max_triangles` is positive, the segment count is also limited
+    so that the triangle count of rail body (caps excluded) do not exceed it.
+    The limit is applied after chord error so it always wins.
+
+    Hints: Angle is input as degree unit.
+
+    @return The segment count per iteration. At least 1.
     """
-    # reset all edges to smooth
-    edge: bmesh.types.BMEdge
-    for edge in bm.edges:
-        edge.smooth = True
+    # get the outmost radius of section
+    ring_count: int = 1 if is_monorail else 2
+    outmost_radius: float = abs(screw_radius) + rail_radius + (0 if is_monorail else rail_span / 2)
+
+    # compute max angle of each segment by chord error
+    steps: int
+    if max_chord_error <= 0 or angle <= 0:
+        steps = 1
+    elif max_chord_error >= outmost_radius:
+        # any segment can not exceed this tolerance, but at least use 3 segments for a full circle.
+        steps = max(1, math.ceil(angle / 120))
+    else:
+        max_segment_angle: float = 2 * math.acos(1 - max_chord_error / outmost_radius)
+        steps = max(1, math.ceil(math.radians(angle) / max_segment_angle))
+
+    # apply triangle budget.
+    # each segment produce 1 quad (2 triangles) for each ring edge.
+    if max_triangles > 0:
+        triangles_per_step: int = ring_count * c_RailSectionSegments * 2
+        budget_steps: int = max_triangles // (triangles_per_step * iterations)
+        steps = max(1, min(steps, budget_steps))
 
-def _bmesh_flip_all_faces(bm: bmesh.types.BMesh, flip_x: bool, flip_y: bool, flip_z: bool) -> None:
+    return steps
+
+class RailMeshBuilder():
     """
-    Flip the whole geometry in given bmesh with given axis.
+    The geometry collector of rail creators.
+
+    Rail creators add section rings, sweep them along frames and request caps.
+    All geometry is computed as arrays in closed form when writing mesh,
+    and pushed into Blender mesh via `foreach_set`.
+
+    The generated topology is the same as the old bmesh way
+    (create_circle, extrude_edge_only / spin and triangle_fill):
+    each swept ring edge produces a quad, each cap is a triangle fan of ring,
+    all faces are smooth and only the cap boundary edges are sharp.
+    All faces are wound to face outside.
     """
-    # get mirror result
-    scale_factor: mathutils.Vector = mathutils.Vector((
-        (-1 if flip_x else 1),
-        (-1 if flip_y else 1),
-        (-1 if flip_z else 1)
-    ))
-    bmesh.ops.scale(bm, vec = scale_factor, verts = bm.verts[:])
 
-    # check whether we need perform normal flip.
-    # see UTIL_bme._is_mirror_matrix for more detail
-    test_matrix: mathutils.Matrix = mathutils.Matrix.LocRotScale(None, None, scale_factor)
-    if test_matrix.is_negative:
-        bmesh.ops.reverse_faces(bm, faces = bm.faces[:])
+    __mRings: list[numpy.ndarray]
+    __mFrames: numpy.ndarray | None
+    __mIsCyclic: bool
+    __mStartCap: bool
+    __mEndCap: bool
+    __mFlipFactor: numpy.ndarray
+
+    def __init__(self):
+        self.__mRings = []
+        self.__mFrames = None
+        self.__mIsCyclic = False
+        self.__mStartCap = False
+        self.__mEndCap = False
+        self.__mFlipFactor = numpy.ones(3, dtype = numpy.float64)
+
+    def add_ring(self, ring: numpy.ndarray) -> None:
+        """
+        Add a section ring. It must be called before sweeping.
+        """
+        if self.__mFrames is not None:
+            raise UTIL_functions.BBPException('can not add ring after sweeping.')
+        self.__mRings.append(ring)
+
+    def sweep(self, frames: numpy.ndarray, is_cyclic: bool = False) -> None:
+        """
+        Sweep all added rings along given (n, 4, 4) frames.
+        The first frame is usually identity.
+        If sweep is cyclic, the rings of last frame are joined to the rings of first frame,
+        so the last frame should not duplicate the first one, and caps are not allowed.
+        """
+        if self.__mFrames is not None:
+            raise UTIL_functions.BBPException('rings can only be swept once.')
+        if len(frames) < (3 if is_cyclic else 2):
+            raise UTIL_functions.BBPException('sweep frames must have at least 2 items, or 3 items if sweep is cyclic.')
+        self.__mFrames = frames
+        self.__mIsCyclic = is_cyclic
+
+    def cap(self, start_cap: bool, end_cap: bool) -> None:
+        """
+        Request caps on the start rings and the end rings of sweep.
+        Cyclic sweep has no start and end, so caps are ignored.
+        """
+        self.__mStartCap = start_cap
+        self.__mEndCap = end_cap
+
+    def flip(self, flip_x: bool, flip_y: bool, flip_z: bool) -> None:
+        """
+        Flip the whole geometry with given axis.
+        """
+        self.__mFlipFactor = numpy.array((
+            (-1 if flip_x else 1),
+            (-1 if flip_y else 1),
+            (-1 if flip_z else 1)
+        ), dtype = numpy.float64)
+
+    def __get_swept_positions(self) -> numpy.ndarray:
+        """
+        @return The (frames, rings, segments, 3) array of vertex positions before flip.
+        """
+        rings: numpy.ndarray = numpy.stack(self.__mRings)
+        if self.__mFrames is None:
+            return rings[numpy.newaxis]
+        # apply each frame to all rings at once.
+        return numpy.einsum('fij,rsj->frsi', self.__mFrames[:, :3, :3], rings) + self.__mFrames[:, numpy.newaxis, numpy.newaxis, :3, 3]
+
+    def __build_geometry(self) -> tuple[numpy.ndarray, list[numpy.ndarray], numpy.ndarray, numpy.ndarray]:
+        """
+        Build geometry arrays.
+
+        @return The tuple of vertex positions (n, 3), the list of (n, corners) face arrays,
+        loose edges (n, 2) and sharp edges (n, 2).
+        """
+        positions: numpy.ndarray = self.__get_swept_positions()
+        frame_count, ring_count, seg_count, _ = positions.shape
+        indices: numpy.ndarray = numpy.arange(positions.shape[0] * ring_count * seg_count, dtype = numpy.int64).reshape(frame_count, ring_count, seg_count)
+        # the ring edge is (k, k + 1), same as bmesh create_circle.
+        next_indices: numpy.ndarray = numpy.roll(indices, -1, axis = 2)
+        # the frame pairs connected by quads. cyclic sweep also joins the last frame to the first one.
+        (from_indices, to_indices) = (indices, numpy.roll(indices, -1, axis = 0)) if self.__mIsCyclic else (indices[:-1], indices[1:])
+        (from_next_indices, to_next_indices) = (next_indices, numpy.roll(next_indices, -1, axis = 0)) if self.__mIsCyclic else (next_indices[:-1], next_indices[1:])
+
+        faces: list[numpy.ndarray] = []
+        loose_edges: numpy.ndarray = numpy.zeros((0, 2), dtype = numpy.int64)
+        sharp_edges: list[numpy.ndarray] = []
+
+        if frame_count < 2:
+            # no sweep, only output rings as loose edges
+            loose_edges = numpy.stack((indices, next_indices), axis = -1).reshape(-1, 2)
+        else:
+            # pick quad winding for each ring.
+            # use the first segment to test whether (a, b, b', a') faces outside.
+            a: numpy.ndarray = positions[0]
+            b: numpy.ndarray = numpy.roll(a, -1, axis = 1)
+            a1: numpy.ndarray = positions[1]
+            b1: numpy.ndarray = numpy.roll(a1, -1, axis = 1)
+            quad_normal: numpy.ndarray = numpy.cross(b1 - a, a1 - b)
+            quad_center: numpy.ndarray = (a + b + a1 + b1) / 4
+            ring_center: numpy.ndarray = (a.mean(axis = 1) + a1.mean(axis = 1)) / 2
+            is_forward: numpy.ndarray = numpy.einsum('rsi,rsi->r', quad_normal, quad_center - ring_center[:, numpy.newaxis, :]) > 0
+
+            quad_forward: numpy.ndarray = numpy.stack((from_indices, from_next_indices, to_next_indices, to_indices), axis = -1)
+            quad_backward: numpy.ndarray = numpy.stack((from_indices, to_indices, to_next_indices, from_next_indices), axis = -1)
+            faces.append(numpy.where(
+                is_forward[numpy.newaxis, :, numpy.newaxis, numpy.newaxis],
+                quad_forward, quad_backward
+            ).reshape(-1, 4))
+
+            # caps are triangle fans, facing opposite to sweep direction at start, and along it at end.
+            fan: numpy.ndarray = numpy.stack((
+                numpy.zeros(seg_count - 2, dtype = numpy.int64),
+                numpy.arange(1, seg_count - 1, dtype = numpy.int64),
+                numpy.arange(2, seg_count, dtype = numpy.int64)
+            ), axis = 1)
+            caps: list[tuple[int, int, bool]] = []
+            if self.__mStartCap and not self.__mIsCyclic: caps.append((0, 1, False))
+            if self.__mEndCap and not self.__mIsCyclic: caps.append((frame_count - 1, frame_count - 2, True))
+            for cap_frame, neighbor_frame, is_end in caps:
+                cap_positions: numpy.ndarray = positions[cap_frame]
+                direction: numpy.ndarray = cap_positions.mean(axis = 1) - positions[neighbor_frame].mean(axis = 1)
+                fan_normal: numpy.ndarray = numpy.cross(
+                    cap_positions[:, fan[:, 1]] - cap_positions[:, fan[:, 0]],
+                    cap_positions[:, fan[:, 2]] - cap_positions[:, fan[:, 0]]
+                ).sum(axis = 1)
+                # direction points from neighbor to cap, so cap should face along it.
+                is_reversed: numpy.ndarray = numpy.einsum('ri,ri->r', fan_normal, direction) < 0
+                ring_fan: numpy.ndarray = indices[cap_frame][:, fan]
+                faces.append(numpy.where(
+                    is_reversed[:, numpy.newaxis, numpy.newaxis],
+                    ring_fan[:, :, ::-1], ring_fan
+                ).reshape(-1, 3))
+                sharp_edges.append(numpy.stack((indices[cap_frame], next_indices[cap_frame]), axis = -1).reshape(-1, 2))
+
+        # apply flip, and reverse faces if it is a mirror.
+        # see UTIL_bme_core.is_mirror_matrix for more detail
+        flat_positions: numpy.ndarray = positions.reshape(-1, 3) * self.__mFlipFactor
+        if numpy.prod(self.__mFlipFactor) < 0:
+            faces = [face[:, ::-1] for face in faces]
+
+        return (
+            flat_positions,
+            faces,
+            loose_edges,
+            numpy.concatenate(sharp_edges) if sharp_edges else numpy.zeros((0, 2), dtype = numpy.int64)
+        )
+
+    def write_mesh(self, mesh: bpy.types.Mesh) -> None:
+        """
+        Write built geometry into given empty mesh.
+        """
+        RailMeshBuilder.write_merged_mesh(mesh, (self, ))
+
+    @staticmethod
+    def write_merged_mesh(mesh: bpy.types.Mesh, builders: typing.Iterable['RailMeshBuilder']) -> None:
+        """
+        Write the geometry of all given builders into given empty mesh as one mesh.
+        """
+        # build each builder and offset their indices
+        geometries: list[tuple[numpy.ndarray, list[numpy.ndarray], numpy.ndarray, numpy.ndarray]] = []
+        vertex_offset: int = 0
+        for builder in builders:
+            if len(builder.__mRings) == 0: continue
+            builder_positions, builder_faces, builder_loose_edges, builder_sharp_edges = builder.__build_geometry()
+            geometries.append((
+                builder_positions,
+                [face + vertex_offset for face in builder_faces],
+                builder_loose_edges + vertex_offset,
+                builder_sharp_edges + vertex_offset
+            ))
+            vertex_offset += len(builder_positions)
+        if len(geometries) == 0:
+            return
+
+        positions: numpy.ndarray = numpy.concatenate([geometry[0] for geometry in geometries])
+        faces: list[numpy.ndarray] = [face for geometry in geometries for face in geometry[1]]
+        loose_edges: numpy.ndarray = numpy.concatenate([geometry[2] for geometry in geometries])
+        sharp_edges: numpy.ndarray = numpy.concatenate([geometry[3] for geometry in geometries])
+        vertex_count: int = len(positions)
+
+        # flat faces into loops
+        loops: numpy.ndarray = numpy.concatenate([face.ravel() for face in faces]) if faces else numpy.zeros(0, dtype = numpy.int64)
+        face_vertex_count: numpy.ndarray = numpy.concatenate([
+            numpy.full(len(face), face.shape[1], dtype = numpy.int32) for face in faces
+        ]) if faces else numpy.zeros(0, dtype = numpy.int32)
+        loop_start: numpy.ndarray = numpy.zeros(len(face_vertex_count), dtype = numpy.int32)
+        loop_start[1:] = numpy.cumsum(face_vertex_count[:-1])
+
+        # collect edges of each loop, then all unique edges.
+        # edge is represented by a scalar key (min * vertex_count + max) to let numpy.unique work on 1D array.
+        loop_edges: numpy.ndarray = numpy.concatenate(
+            [numpy.stack((face, numpy.roll(face, -1, axis = 1)), axis = -1).reshape(-1, 2) for face in faces]
+            + [loose_edges]
+        )
+        def to_key(edges: numpy.ndarray) -> numpy.ndarray:
+            return edges.min(axis = 1) * vertex_count + edges.max(axis = 1)
+        edge_keys, edge_inverse = numpy.unique(to_key(loop_edges), return_inverse = True)
+        edge_inverse = edge_inverse.reshape(-1)
+        edges: numpy.ndarray = numpy.stack((edge_keys // vertex_count, edge_keys % vertex_count), axis = 1)
+
+        # push into mesh
+        mesh.vertices.add(vertex_count)
+        mesh.vertices.foreach_set('co', positions.astype(numpy.float32).ravel())
+        mesh.edges.add(len(edges))
+        mesh.edges.foreach_set('vertices', edges.astype(numpy.int32).ravel())
+        mesh.loops.add(len(loops))
+        mesh.loops.foreach_set('vertex_index', loops.astype(numpy.int32))
+        mesh.loops.foreach_set('edge_index', edge_inverse[:len(loops)].astype(numpy.int32))
+        mesh.polygons.add(len(face_vertex_count))
+        # NOTE: loop_total is read-only and calculated from the next loop_start.
+        mesh.polygons.foreach_set('loop_start', loop_start)
+        # same as mesh.shade_smooth()
+        mesh.polygons.foreach_set('use_smooth', numpy.ones(len(face_vertex_count), dtype = bool))
+
+        # mark sharp edges
+        if len(sharp_edges) != 0:
+            sharp_attribute: bpy.types.BoolAttribute = typing.cast(
+                bpy.types.BoolAttribute,
+                mesh.attributes.new('sharp_edge', 'BOOLEAN', 'EDGE')
+            )
+            sharp_attribute.data.foreach_set('value', numpy.isin(edge_keys, to_key(sharp_edges)))
+
+        mesh.validate()
+        mesh.update()
 
 #endregion
 
 #region Real Rail Creators
 
-def rail_creator_wrapper(fct_poly_cret: typing.Callable[[bmesh.types.BMesh], None], extra_transform: mathutils.Matrix) -> bpy.types.Object:
-    # create mesh first
-    bm: bmesh.types.BMesh = bmesh.new()
+def rail_creator_wrapper(fct_poly_cret: typing.Callable[[RailMeshBuilder], None], extra_transform: mathutils.Matrix) -> bpy.types.Object:
+    # create builder first
+    builder: RailMeshBuilder = RailMeshBuilder()
 
     # call cret fct
-    fct_poly_cret(bm)
+    fct_poly_cret(builder)
 
     # finish up
+    # smooth shading is set by builder.
     mesh: bpy.types.Mesh = bpy.data.meshes.new('Rail')
-    bm.to_mesh(mesh)
-    bm.free()
+    builder.write_mesh(mesh)
+
+    # create object
+    obj: bpy.types.Object = _create_rail_object(mesh)
+
+    # move to cursor
+    UTIL_functions.add_into_scene_and_move_to_cursor(obj)
+    # add extra transform
+    obj.matrix_world = obj.matrix_world @ extra_transform
+    # select created object
+    UTIL_functions.select_certain_objects((obj, ))
     
-    # setup smooth for mesh
-    mesh.shade_smooth()
+    # return rail
+    return obj
 
+def _create_rail_object(mesh: bpy.types.Mesh) -> bpy.types.Object:
+    """
+    Setup rail material for given mesh, then create rail object with it
+    and assign Virtools groups by naming convention.
+    The created object is not added into scene.
+    """
     # setup default material
     with PROP_bme_material.BMEMaterialsHelper(bpy.context.scene) as bmemtl:
         mesh.materials.clear()
@@ -143,18 +404,10 @@ def rail_creator_wrapper(fct_poly_cret: typing.Callable[[bmesh.types.BMesh], Non
     # assign virtools groups
     UTIL_naming_convention.VirtoolsGroupConvention.set_to_object(obj, rail_info, None)
 
-    # move to cursor
-    UTIL_functions.add_into_scene_and_move_to_cursor(obj)
-    # add extra transform
-    obj.matrix_world = obj.matrix_world @ extra_transform
-    # select created object
-    UTIL_functions.select_certain_objects((obj, ))
-    
-    # return rail
     return obj
 
 def create_rail_section(
-        bm: bmesh.types.BMesh,
+        builder: RailMeshBuilder,
         is_monorail: bool, rail_radius: float, rail_span: float, 
         matrix: mathutils.Matrix = mathutils.Matrix.Identity(4)) -> None:
     """
@@ -168,46 +421,43 @@ def create_rail_section(
     """
     if is_monorail:
         # create monorail
-        bmesh.ops.create_circle(
-            bm, cap_ends = False, cap_tris = False, segments = 8, radius = rail_radius,
-            matrix = typing.cast(mathutils.Matrix, matrix @ mathutils.Matrix.LocRotScale(
+        builder.add_ring(_create_circle_ring(
+            rail_radius,
+            typing.cast(mathutils.Matrix, matrix @ mathutils.Matrix.LocRotScale(
                 None,
                 mathutils.Euler((math.radians(90), math.radians(22.5), 0), 'XYZ'),
                 None
-            )), 
-            calc_uvs = False
-        )
+            ))
+        ))
     else:
         # create rail
         # create left rail
-        bmesh.ops.create_circle(
-            bm, cap_ends = False, cap_tris = False, segments = 8, radius = rail_radius,
-            matrix = typing.cast(mathutils.Matrix, matrix @ mathutils.Matrix.LocRotScale(
+        builder.add_ring(_create_circle_ring(
+            rail_radius,
+            typing.cast(mathutils.Matrix, matrix @ mathutils.Matrix.LocRotScale(
                 mathutils.Vector((-rail_span / 2, 0, 0)), 
                 mathutils.Euler((math.radians(90), 0, 0), 'XYZ'),
                 None
-            )),
-            calc_uvs = False
-        )
+            ))
+        ))
         # create right rail
-        bmesh.ops.create_circle(
-            bm, cap_ends = False, cap_tris = False, segments = 8, radius = rail_radius,
-            matrix = typing.cast(mathutils.Matrix, matrix @ mathutils.Matrix.LocRotScale(
+        builder.add_ring(_create_circle_ring(
+            rail_radius,
+            typing.cast(mathutils.Matrix, matrix @ mathutils.Matrix.LocRotScale(
                 mathutils.Vector((rail_span / 2, 0, 0)), 
                 mathutils.Euler((math.radians(90), 0, 0), 'XYZ'),
                 None
-            )),
-            calc_uvs = False
-        )
+            ))
+        ))
 
 def create_transition_section(
-        bm: bmesh.types.BMesh,
+        builder: RailMeshBuilder,
         rail_radius: float, rail_span: float) -> None:
     """
     Create the transition section between rail and monorail.
     """
     # create rail section
-    create_rail_section(bm, False, rail_radius, rail_span)
+    create_rail_section(builder, False, rail_radius, rail_span)
 
     # create monorail
     # calc sink first
@@ -218,12 +468,12 @@ def create_transition_section(
         monorail_sink = -2 # if sqrt(minus number) happended, it mean no triangle relation. the depth should always be -2.
     # create monorail with calculated sink
     create_rail_section(
-        bm, True, rail_radius, rail_span,
+        builder, True, rail_radius, rail_span,
         mathutils.Matrix.Translation((0, 0, monorail_sink))
     )
 
 def create_straight_rail(
-        bm: bmesh.types.BMesh,
+        builder: RailMeshBuilder,
         is_monorail: bool, rail_radius: float, rail_span: float,
         rail_length: float, rail_angle: float,
         rail_start_cap: bool, rail_end_cap: bool) -> None:
@@ -241,7 +491,7 @@ def create_straight_rail(
     """
     # create section first
     create_rail_section(
-        bm, is_monorail, rail_radius, rail_span,
+        builder, is_monorail, rail_radius, rail_span,
         mathutils.Matrix.LocRotScale(
             None,
             mathutils.Euler((0, math.radians(rail_angle), 0), 'XYZ'),
@@ -249,26 +499,14 @@ def create_straight_rail(
         )
     )
 
-    # get start edges
-    start_edges: list[bmesh.types.BMEdge] = bm.edges[:]
-    # extrude and get end edges
-    end_edges: list[bmesh.types.BMEdge] = _bmesh_extrude(
-        bm, 
-        start_edges, 
-        mathutils.Vector((0, rail_length, 0))
-    )
-
-    # smooth geometry
-    _bmesh_smooth_all_edges(bm)
+    # extrude along +Y
+    builder.sweep(_get_straight_frames(mathutils.Vector((0, rail_length, 0))))
 
     # cap start and end edges if needed
-    if rail_start_cap:
-        _bmesh_cap(bm, start_edges)
-    if rail_end_cap:
-        _bmesh_cap(bm, end_edges)
+    builder.cap(rail_start_cap, rail_end_cap)
 
 def create_transition_rail(
-        bm: bmesh.types.BMesh,
+        builder: RailMeshBuilder,
         rail_radius: float, rail_span: float,
         rail_length: float,
         rail_start_cap: bool, rail_end_cap: bool) -> None:
@@ -280,28 +518,16 @@ def create_transition_rail(
     The expand direction is +Y.
     """
     # create section first
-    create_transition_section(bm, rail_radius, rail_span)
-
-    # get start edges
-    start_edges: list[bmesh.types.BMEdge] = bm.edges[:]
-    # extrude and get end edges
-    end_edges: list[bmesh.types.BMEdge] = _bmesh_extrude(
-        bm, 
-        start_edges, 
-        mathutils.Vector((0, rail_length, 0))
-    )
+    create_transition_section(builder, rail_radius, rail_span)
 
-    # smooth geometry
-    _bmesh_smooth_all_edges(bm)
+    # extrude along +Y
+    builder.sweep(_get_straight_frames(mathutils.Vector((0, rail_length, 0))))
 
     # cap start and end edges if needed
-    if rail_start_cap:
-        _bmesh_cap(bm, start_edges)
-    if rail_end_cap:
-        _bmesh_cap(bm, end_edges)
+    builder.cap(rail_start_cap, rail_end_cap)
 
 def create_screw_rail(
-        bm: bmesh.types.BMesh, 
+        builder: RailMeshBuilder,
         is_monorail: bool, rail_radius: float, rail_span: float,
         rail_start_cap: bool, rail_end_cap: bool,
         rail_screw_angle: float, rail_screw_screw: float, rail_screw_iterations: int,
@@ -319,29 +545,284 @@ def create_screw_rail(
     Angle is input as degree unit.
     """
     # create section first
-    create_rail_section(bm, is_monorail, rail_radius, rail_span)
+    create_rail_section(builder, is_monorail, rail_radius, rail_span)
 
-    start_edges: list[bmesh.types.BMEdge] = bm.edges[:]
-    end_edges: list[bmesh.types.BMEdge] = _bmesh_screw(
-        bm,
-        bm.verts[:], start_edges,
+    # screw
+    builder.sweep(_get_screw_frames(
         rail_screw_angle, 
         rail_screw_steps, rail_screw_iterations,
         mathutils.Vector((rail_screw_radius, 0, 0)),
         rail_screw_screw
-    )
+    ))
 
     # flip geometry
     if rail_screw_flip_x or rail_screw_flip_y or rail_screw_flip_z:
-        _bmesh_flip_all_faces(bm, rail_screw_flip_x, rail_screw_flip_y, rail_screw_flip_z)
-
-    # smooth geometry
-    _bmesh_smooth_all_edges(bm)
+        builder.flip(rail_screw_flip_x, rail_screw_flip_y, rail_screw_flip_z)
 
     # cap start and end edges if needed
-    if rail_start_cap:
-        _bmesh_cap(bm, start_edges)
-    if rail_end_cap:
-        _bmesh_cap(bm, end_edges)
+    builder.cap(rail_start_cap, rail_end_cap)
+
+#endregion
+
+#region Path Rail Creator
+
+## The dense sample count of each Bezier segment before simplification.
+_c_BezierSampleResolution: int = 64
+## The minimum distance between adjacent samples. Closer samples are merged.
+_c_SampleMergeDistance: float = 1e-6
+## The minimum cosine of half bending angle used in miter scaling, to avoid infinite scale on sharp corners.
+_c_MinMiterCosine: float = 0.25
+
+def _sample_bezier_spline(spline: bpy.types.Spline) -> numpy.ndarray:
+    """
+    Densely sample given Bezier spline in closed form.
+
+    @return The (n, 3) array of sample points. For cyclic spline, the last point is the same as the first one.
+    """
+    point_count: int = len(spline.bezier_points)
+    co: numpy.ndarray = numpy.empty(point_count * 3, dtype = numpy.float32)
+    spline.bezier_points.foreach_get('co', co)
+    handle_left: numpy.ndarray = numpy.empty(point_count * 3, dtype = numpy.float32)
+    spline.bezier_points.foreach_get('handle_left', handle_left)
+    handle_right: numpy.ndarray = numpy.empty(point_count * 3, dtype = numpy.float32)
+    spline.bezier_points.foreach_get('handle_right', handle_right)
+    co = co.reshape(-1, 3).astype(numpy.float64)
+    handle_left = handle_left.reshape(-1, 3).astype(numpy.float64)
+    handle_right = handle_right.reshape(-1, 3).astype(numpy.float64)
+
+    # get control points of each segment
+    start_indices: numpy.ndarray = numpy.arange(point_count if spline.use_cyclic_u else point_count - 1)
+    end_indices: numpy.ndarray = (start_indices + 1) % point_count
+    p0: numpy.ndarray = co[start_indices]
+    p1: numpy.ndarray = handle_right[start_indices]
+    p2: numpy.ndarray = handle_left[end_indices]
+    p3: numpy.ndarray = co[end_indices]
+
+    # evaluate Bernstein polynomial for all segments at once.
+    # the end point of each segment is skipped because it is the start point of next segment.
+    t: numpy.ndarray = numpy.linspace(0, 1, _c_BezierSampleResolution, endpoint = False)[numpy.newaxis, :, numpy.newaxis]
+    mt: numpy.ndarray = 1 - t
+    samples: numpy.ndarray = (
+        (mt ** 3) * p0[:, numpy.newaxis] + 
+        (3 * mt * mt * t) * p1[:, numpy.newaxis] + 
+        (3 * mt * t * t) * p2[:, numpy.newaxis] + 
+        (t ** 3) * p3[:, numpy.newaxis]
+    ).reshape(-1, 3)
+    # append the end point of last segment
+    return numpy.concatenate((samples, p3[-1:]))
+
+def _sample_poly_spline(spline: bpy.types.Spline) -> numpy.ndarray:
+    """
+    Get the points of given poly spline.
+
+    @return The (n, 3) array of points. For cyclic spline, the last point is the same as the first one.
+    """
+    # spline point is 4D (the last one is weight).
+    co: numpy.ndarray = numpy.empty(len(spline.points) * 4, dtype = numpy.float32)
+    spline.points.foreach_get('co', co)
+    points: numpy.ndarray = co.reshape(-1, 4)[:, :3].astype(numpy.float64)
+    if spline.use_cyclic_u:
+        points = numpy.concatenate((points, points[:1]))
+    return points
+
+def _simplify_polyline(points: numpy.ndarray, max_chord_error: float) -> numpy.ndarray:
+    """
+    Simplify given polyline by Ramer-Douglas-Peucker algorithm.
+
+    Each removed point is within `max_chord_error` from the kept chord.
+    So straight part is reduced to its ends, and more points are kept where curvature is high.
+
+    @return The (m, 3) array of kept points.
+    """
+    # merge coincident points first, they produce zero-length segments.
+    distances: numpy.ndarray = numpy.linalg.norm(numpy.diff(points, axis = 0), axis = 1)
+    points = points[numpy.concatenate(((True, ), distances > _c_SampleMergeDistance))]
+    point_count: int = len(points)
+    if point_count < 3:
+        return points
+
+    keep: numpy.ndarray = numpy.zeros(point_count, dtype = bool)
+    keep[0] = keep[-1] = True
+    stack: list[tuple[int, int]] = [(0, point_count - 1)]
+    while len(stack) != 0:
+        start, end = stack.pop()
+        if end - start < 2: continue
+
+        # compute the distance of all middle points to chord
+        inner: numpy.ndarray = points[start + 1:end]
+        chord_start: numpy.ndarray = points[start]
+        chord: numpy.ndarray = points[end] - chord_start
+        chord_length_sq: float = float(chord @ chord)
+        if chord_length_sq == 0:
+            # this happens on cyclic spline.
+            deviation: numpy.ndarray = numpy.linalg.norm(inner - chord_start, axis = 1)
+        else:
+            factor: numpy.ndarray = numpy.clip(((inner - chord_start) @ chord) / chord_length_sq, 0, 1)
+            deviation = numpy.linalg.norm(inner - (chord_start + factor[:, numpy.newaxis] * chord), axis = 1)
+
+        # split at the farthest point if it is out of tolerance
+        farthest: int = int(numpy.argmax(deviation))
+        if deviation[farthest] > max_chord_error:
+            middle: int = start + 1 + farthest
+            keep[middle] = True
+            stack.append((start, middle))
+            stack.append((middle, end))
+
+    return points[keep]
+
+def _normalize_rows(vectors: numpy.ndarray) -> numpy.ndarray:
+    lengths: numpy.ndarray = numpy.linalg.norm(vectors, axis = 1, keepdims = True)
+    return vectors / numpy.where(lengths == 0, 1, lengths)
+
+def _rotate_around_axes(vectors: numpy.ndarray, axes: numpy.ndarray, angles: numpy.ndarray) -> numpy.ndarray:
+    # Rodrigues' rotation formula for each row
+    cos_angles: numpy.ndarray = numpy.cos(angles)[:, numpy.newaxis]
+    sin_angles: numpy.ndarray = numpy.sin(angles)[:, numpy.newaxis]
+    return (
+        vectors * cos_angles + 
+        numpy.cross(axes, vectors) * sin_angles + 
+        axes * numpy.einsum('ij,ij->i', axes, vectors)[:, numpy.newaxis] * (1 - cos_angles)
+    )
+
+def _get_path_frames(points: numpy.ndarray, is_cyclic: bool) -> numpy.ndarray:
+    """
+    Get the sweep frames along given polyline.
+
+    The frame maps section space (XZ panel, expanding to +Y) into path,
+    local +Y is mapped to path tangent and local +Z is mapped to path up direction.
+    The up direction is computed by rotation minimizing frame (double reflection method),
+    starting from the world +Z, so planar path on XY panel always keeps its up direction.
+    On corners, tangent is the bisector of adjacent segments,
+    and section is stretched along bending direction to keep rail thickness.
+
+    For cyclic path, the last point must be the same as the first one.
+    Its frame is dropped, so the result can be swept cyclically.
+
+    @return The (n, 4, 4) array of transform matrices, or (n - 1, 4, 4) for cyclic path.
+    """
+    point_count: int = len(points)
+    directions: numpy.ndarray = _normalize_rows(numpy.diff(points, axis = 0))
+    # incoming and outgoing direction of each point.
+    # for open path, the ends use their only adjacent segment.
+    incoming: numpy.ndarray = numpy.concatenate((directions[:1], directions))
+    outgoing: numpy.ndarray = numpy.concatenate((directions, directions[-1:]))
+    if is_cyclic:
+        incoming[0] = directions[-1]
+        outgoing[-1] = directions[0]
+    tangents: numpy.ndarray = _normalize_rows(incoming + outgoing)
+    # a U-turn produce zero bisector, fallback to incoming direction.
+    is_degenerated: numpy.ndarray = numpy.linalg.norm(incoming + outgoing, axis = 1) < 1e-6
+    tangents[is_degenerated] = incoming[is_degenerated]
+
+    # compute up direction by double reflection
+    ups: numpy.ndarray = numpy.empty_like(points)
+    up: numpy.ndarray = numpy.array((0, 0, 1), dtype = numpy.float64)
+    up = up - (up @ tangents[0]) * tangents[0]
+    if numpy.linalg.norm(up) < 1e-6:
+        # vertical start, pick world +Y instead.
+        up = numpy.array((0, 1, 0), dtype = numpy.float64)
+        up = up - (up @ tangents[0]) * tangents[0]
+    ups[0] = up / numpy.linalg.norm(up)
+    for i in range(point_count - 1):
+        v1: numpy.ndarray = points[i + 1] - points[i]
+        c1: float = float(v1 @ v1)
+        reflected_up: numpy.ndarray = ups[i] - (2 / c1) * (v1 @ ups[i]) * v1
+        reflected_tangent: numpy.ndarray = tangents[i] - (2 / c1) * (v1 @ tangents[i]) * v1
+        v2: numpy.ndarray = tangents[i + 1] - reflected_tangent
+        c2: float = float(v2 @ v2)
+        ups[i + 1] = reflected_up if c2 < 1e-12 else reflected_up - (2 / c2) * (v2 @ reflected_up) * v2
+
+    # for cyclic path, the up direction may not back to the start one.
+    # distribute the difference along path length to close the seam.
+    if is_cyclic:
+        mismatch: float = math.atan2(
+            float(numpy.cross(ups[-1], ups[0]) @ tangents[0]),
+            float(ups[-1] @ ups[0])
+        )
+        path_length: numpy.ndarray = numpy.concatenate(((0, ), numpy.cumsum(numpy.linalg.norm(numpy.diff(points, axis = 0), axis = 1))))
+        if path_length[-1] > 0:
+            ups = _rotate_around_axes(ups, tangents, mismatch * path_length / path_length[-1])
+    ups = _normalize_rows(ups - numpy.einsum('ij,ij->i', ups, tangents)[:, numpy.newaxis] * tangents)
+    sides: numpy.ndarray = numpy.cross(tangents, ups)
+
+    # build frames. columns are side (X), tangent (Y), up (Z) and position.
+    frames: numpy.ndarray = numpy.zeros((point_count, 4, 4), dtype = numpy.float64)
+    frames[:, :3, 0] = sides
+    frames[:, :3, 1] = tangents
+    frames[:, :3, 2] = ups
+    frames[:, :3, 3] = points
+    frames[:, 3, 3] = 1
+
+    # miter scale on corners.
+    # the section is stretched by 1 / cos(half bending angle) along bending direction.
+    half_cosine: numpy.ndarray = numpy.clip(numpy.einsum('ij,ij->i', tangents, incoming), _c_MinMiterCosine, 1)
+    bending: numpy.ndarray = _normalize_rows(outgoing - incoming)
+    stretch: numpy.ndarray = numpy.identity(3)[numpy.newaxis] + ((1 / half_cosine) - 1)[:, numpy.newaxis, numpy.newaxis] * numpy.einsum('ni,nj->nij', bending, bending)
+    frames[:, :3, :3] = stretch @ frames[:, :3, :3]
+
+    # the frame of last point is the same as the first one on cyclic path.
+    return frames[:-1] if is_cyclic else frames
+
+def create_path_rail(
+        curve_obj: bpy.types.Object,
+        is_monorail: bool, rail_radius: float, rail_span: float,
+        rail_start_cap: bool, rail_end_cap: bool,
+        max_chord_error: float) -> bpy.types.Object | None:
+    """
+    Create a rail following the splines of given curve object.
+
+    Bezier splines are sampled in closed form and poly splines use their points,
+    then they are simplified by `max_chord_error`, so only curved part get dense segments.
+    The rail section is the same as `create_rail_section()` and swept along each spline.
+    Other spline types are ignored. Spline tilt is not respected.
+    Cyclic spline has no cap, and its seam is welded.
+
+    The created rail object has the same world matrix with curve object,
+    has Virtools groups of rail and is added into scene.
+
+    @return The created rail object, or None if there is no valid spline.
+    """
+    curve: bpy.types.Curve = typing.cast(bpy.types.Curve, curve_obj.data)
+
+    builders: list[RailMeshBuilder] = []
+    spline: bpy.types.Spline
+    for spline in curve.splines:
+        # sample spline
+        points: numpy.ndarray
+        match spline.type:
+            case 'BEZIER':
+                if len(spline.bezier_points) < 2: continue
+                points = _sample_bezier_spline(spline)
+            case 'POLY':
+                if len(spline.points) < 2: continue
+                points = _sample_poly_spline(spline)
+            case _:
+                continue
+        points = _simplify_polyline(points, max_chord_error)
+        if len(points) < 2: continue
+        # cyclic sweep need at least 3 distinct points (the last point is the same as the first one).
+        is_cyclic: bool = spline.use_cyclic_u and len(points) > 3
+
+        # sweep section along it
+        builder: RailMeshBuilder = RailMeshBuilder()
+        create_rail_section(builder, is_monorail, rail_radius, rail_span)
+        builder.sweep(_get_path_frames(points, is_cyclic), is_cyclic)
+        if not is_cyclic:
+            builder.cap(rail_start_cap, rail_end_cap)
+        builders.append(builder)
+
+    if len(builders) == 0:
+        return None
+
+    # write mesh and create object
+    mesh: bpy.types.Mesh = bpy.data.meshes.new('Rail')
+    RailMeshBuilder.write_merged_mesh(mesh, builders)
+    obj: bpy.types.Object = _create_rail_object(mesh)
+
+    # place it at curve
+    UTIL_functions.add_into_scene(obj)
+    obj.matrix_world = curve_obj.matrix_world.copy()
+
+    return obj
 
 #endregion
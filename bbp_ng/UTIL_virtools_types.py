@@ -1,4 +1,4 @@
-import bpy, mathutils
+import bpy, mathutils, numpy
 import typing, math
 from dataclasses import dataclass
 from . import UTIL_functions
@@ -18,6 +18,13 @@ def vxvector2_conv_co(self: VxVector2) -> None:
     """
     self.y = -self.y
 
+def vxvector2_array_conv_co(data: numpy.ndarray) -> None:
+    """
+    The array version of vxvector2_conv_co().
+    Convert UV coordinate system for the whole (N, 2) shape array in place.
+    """
+    data[:, 1] = -data[:, 1]
+
 #endregion
 
 #region VxVector3 Patch
@@ -28,6 +35,13 @@ def vxvector3_conv_co(self: VxVector3) -> None:
     """
     self.y, self.z = self.z, self.y
 
+def vxvector3_array_conv_co(data: numpy.ndarray) -> None:
+    """
+    The array version of vxvector3_conv_co().
+    Convert Position or Normal coordinate system for the whole (N, 3) shape array in place.
+    """
+    data[:, [1, 2]] = data[:, [2, 1]]
+
 #endregion
 
 #region VxMatrix Patch
@@ -296,6 +310,71 @@ class EnumPropHelper(UTIL_functions.EnumPropHelper[_TRawEnum]):
 
 #endregion
 
+#region Numpy Array Bridge
+
+# pybmap only provide iterator based interface for bulk data.
+# These functions convert these iterators into contiguous numpy array, or vice versa,
+# so that the caller can process them with whole-array operations.
+
+def vxvector2_array_from_iterator(it: typing.Iterator[VxVector2], count: int) -> numpy.ndarray:
+    """
+    Collect given VxVector2 iterator into a (count, 2) shape float32 array.
+    """
+    return numpy.fromiter(
+        ((v.x, v.y) for v in it),
+        dtype = numpy.dtype((numpy.float32, 2)), count = count
+    )
+
+def vxvector3_array_from_iterator(it: typing.Iterator[VxVector3], count: int) -> numpy.ndarray:
+    """
+    Collect given VxVector3 iterator into a (count, 3) shape float32 array.
+    """
+    return numpy.fromiter(
+        ((v.x, v.y, v.z) for v in it),
+        dtype = numpy.dtype((numpy.float32, 3)), count = count
+    )
+
+def ckfaceindices_array_from_iterator(it: typing.Iterator[CKFaceIndices], count: int) -> numpy.ndarray:
+    """
+    Collect given CKFaceIndices iterator into a (count, 3) shape int32 array.
+    """
+    return numpy.fromiter(
+        ((v.i1, v.i2, v.i3) for v in it),
+        dtype = numpy.dtype((numpy.int32, 3)), count = count
+    )
+
+def vxvector2_array_to_iterator(data: numpy.ndarray) -> typing.Iterator[VxVector2]:
+    """
+    Iterate given (N, 2) shape array as VxVector2.
+    The yielded VxVector2 is reused, so caller should not hold it.
+    """
+    cache: VxVector2 = VxVector2()
+    for x, y in data.tolist():
+        cache.x, cache.y = x, y
+        yield cache
+
+def vxvector3_array_to_iterator(data: numpy.ndarray) -> typing.Iterator[VxVector3]:
+    """
+    Iterate given (N, 3) shape array as VxVector3.
+    The yielded VxVector3 is reused, so caller should not hold it.
+    """
+    cache: VxVector3 = VxVector3()
+    for x, y, z in data.tolist():
+        cache.x, cache.y, cache.z = x, y, z
+        yield cache
+
+def ckfaceindices_array_to_iterator(data: numpy.ndarray) -> typing.Iterator[CKFaceIndices]:
+    """
+    Iterate given (N, 3) shape array as CKFaceIndices.
+    The yielded CKFaceIndices is reused, so caller should not hold it.
+    """
+    cache: CKFaceIndices = CKFaceIndices()
+    for i1, i2, i3 in data.tolist():
+        cache.i1, cache.i2, cache.i3 = i1, i2, i3
+        yield cache
+
+#endregion
+
 #region Virtools Blender Bridge Funcs & Vars
 
 def virtools_name_regulator(name: str | None) -> str:
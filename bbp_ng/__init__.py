@@ -46,6 +46,7 @@ def reuse_create_layout(layout: bpy.types.UILayout, target: DrawTarget) -> bpy.t
 def reuse_draw_add_bme(layout: bpy.types.UILayout, target: DrawTarget):
     # Draw operators.
     OP_ADDS_bme.BBP_OT_add_bme_struct.draw_blc_menu(reuse_create_layout(layout, target))
+    layout.operator(OP_ADDS_bme.BBP_OT_add_bme_layout.bl_idname, icon='FILE')
 
 def reuse_draw_add_rail(layout: bpy.types.UILayout, target: DrawTarget):
     layout.label(text="Sections", icon='MESH_CIRCLE', text_ctxt='BBP/__init__.reuse_draw_add_rail()')
@@ -66,6 +67,7 @@ def reuse_draw_add_rail(layout: bpy.types.UILayout, target: DrawTarget):
     sublayout.operator(OP_ADDS_rail.BBP_OT_add_arc_rail.bl_idname)
     sublayout.operator(OP_ADDS_rail.BBP_OT_add_spiral_rail.bl_idname)
     sublayout.operator(OP_ADDS_rail.BBP_OT_add_side_spiral_rail.bl_idname)
+    sublayout.operator(OP_ADDS_rail.BBP_OT_add_path_rail.bl_idname)
 
 def reuse_draw_add_component(layout: bpy.types.UILayout, target: DrawTarget):
     # We only use Grid for basic components
@@ -0,0 +1,294 @@
+import logging, argparse, json, math, sys, time, typing
+from pathlib import Path
+
+# This script is executed by Blender, not UV,
+# so we need add this folder and the root of repository into path manually.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import common
+
+sys.path.insert(0, str(common.get_root_folder()))
+import bpy
+from bbp_ng import UTIL_bme, UTIL_bme_core
+from bbp_ng.OP_ADDS_bme import BBP_PG_bme_adder_cfgs
+
+_g_EnumHelper_BmeStructType = UTIL_bme.EnumPropHelper()
+
+#region Cfg Sweeper
+
+
+def _get_declared_range(prop_name: str) -> tuple[typing.Any, typing.Any]:
+    """
+    Get the soft range of cfg property declared in BME adder operator.
+
+    :param prop_name: The name of property in BBP_PG_bme_adder_cfgs.
+    :return: The soft min and soft max value.
+    """
+    keywords = BBP_PG_bme_adder_cfgs.__annotations__[prop_name].keywords
+    return (keywords['soft_min'], keywords['soft_max'])
+
+
+def _get_int_sweep() -> list[int]:
+    # 0, then power of 2 until soft max.
+    low, high = _get_declared_range('prop_int')
+    values = [low]
+    value = max(1, low)
+    while value <= high:
+        if value != low:
+            values.append(value)
+        value *= 2
+    return values
+
+
+def _get_float_sweep() -> list[float]:
+    # a few representative values until soft max.
+    low, high = _get_declared_range('prop_float')
+    values = [low, 1.0, 5.0, 32.0, high]
+    return sorted(set(v for v in values if low <= v <= high))
+
+
+def _get_cfg_sweep(cfg: UTIL_bme.PrototypeShowcaseCfgDescriptor) -> list[typing.Any]:
+    match cfg.get_type():
+        case UTIL_bme.PrototypeShowcaseCfgsTypes.Integer:
+            return _get_int_sweep()
+        case UTIL_bme.PrototypeShowcaseCfgsTypes.Float:
+            return _get_float_sweep()
+        case UTIL_bme.PrototypeShowcaseCfgsTypes.Boolean:
+            return [False, True]
+        case UTIL_bme.PrototypeShowcaseCfgsTypes.Face:
+            return [(False,) * 6, (True,) * 6]
+
+
+def _iter_cfgs(ident: str) -> typing.Iterator[tuple[str | None, dict[str, typing.Any]]]:
+    """
+    Iterate the cfgs used for benchmark of given prototype.
+    The first one is the default cfgs, then sweep each cfg one by one while others keep default.
+
+    :param ident: The identifier of prototype.
+    :return: The iterator of swept cfg field (None for default cfgs) and the whole cfgs.
+    """
+    cfgs = list(_g_EnumHelper_BmeStructType.get_bme_showcase_cfgs(ident))
+    defaults = {cfg.get_field(): cfg.get_default() for cfg in cfgs}
+    yield (None, dict(defaults))
+    for cfg in cfgs:
+        for value in _get_cfg_sweep(cfg):
+            swept = dict(defaults)
+            swept[cfg.get_field()] = value
+            yield (cfg.get_field(), swept)
+
+
+#endregion
+
+#region Benchmark Runner
+
+
+def _run_sample(ident: str, cfgs: dict[str, typing.Any], repeat: int) -> dict[str, typing.Any]:
+    """
+    Generate given prototype with given cfgs and collect its statistics.
+
+    :param ident: The identifier of prototype.
+    :param cfgs: The cfgs of prototype.
+    :param repeat: How many times to generate. The fastest one is recorded.
+    :return: The statistics of this sample.
+    """
+    best_eval = math.inf
+    best_total = math.inf
+    emits = 0
+    vertices = 0
+    faces = 0
+    for _ in range(repeat):
+        emits = 0
+        vertices = 0
+        faces = 0
+
+        def emitter(transform, struct_vertices, struct_faces) -> None:
+            nonlocal emits, vertices, faces
+            emits += 1
+            vertices += len(struct_vertices)
+            faces += len(struct_faces)
+            UTIL_bme_core.build_bme_struct_part(transform, struct_vertices, struct_faces)
+
+        # evaluation time only covers params evaluation and compiled prototype,
+        # total time also covers building geometry parts.
+        start = time.perf_counter()
+        UTIL_bme.evaluate_bme_struct(ident, cfgs, lambda *args: None)
+        best_eval = min(best_eval, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        UTIL_bme.evaluate_bme_struct(ident, cfgs, emitter)
+        best_total = min(best_total, time.perf_counter() - start)
+
+    return {
+        'eval_time': best_eval,
+        'total_time': best_total,
+        # counted separately because counting slows down evaluation.
+        'prototype_evals': UTIL_bme.count_bme_struct_evals(ident, cfgs),
+        'emits': emits,
+        'vertices': vertices,
+        'faces': faces,
+    }
+
+
+def _fit_growth(points: list[tuple[float, float]]) -> float | None:
+    """
+    Fit the exponent k of y = a * x^k by least squares in log-log space.
+
+    :param points: The (x, y) pairs. Non-positive pairs are ignored.
+    :return: The exponent, or None if there is not enough points.
+    """
+    logs = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len(logs) < 2:
+        return None
+    mean_x = sum(x for x, _ in logs) / len(logs)
+    mean_y = sum(y for _, y in logs) / len(logs)
+    var_x = sum((x - mean_x) ** 2 for x, _ in logs)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in logs) / var_x
+
+
+def bench_prototype(ident: str, repeat: int) -> dict[str, typing.Any]:
+    """
+    Benchmark given prototype with all swept cfgs.
+
+    :param ident: The identifier of prototype.
+    :param repeat: How many times to generate each sample.
+    :return: The report of this prototype.
+    """
+    samples: list[dict[str, typing.Any]] = []
+    # growth is fitted for numeric cfgs
+    numeric_fields = set(
+        cfg.get_field() for cfg in _g_EnumHelper_BmeStructType.get_bme_showcase_cfgs(ident)
+        if cfg.get_type() in (UTIL_bme.PrototypeShowcaseCfgsTypes.Integer, UTIL_bme.PrototypeShowcaseCfgsTypes.Float)
+    )
+    growth_points: dict[str, list[tuple[float, float, float, float]]] = {field: [] for field in numeric_fields}
+
+    for field, cfgs in _iter_cfgs(ident):
+        sample: dict[str, typing.Any] = {
+            'swept': field,
+            'cfgs': cfgs,
+        }
+        try:
+            sample.update(_run_sample(ident, cfgs, repeat))
+        except Exception as e:
+            # some extreme cfgs may be invalid for prototype, record it and go on.
+            sample['error'] = f'{type(e).__name__}: {e}'
+        samples.append(sample)
+
+        if field in growth_points and 'error' not in sample:
+            growth_points[field].append((float(cfgs[field]), sample['total_time'], float(sample['prototype_evals']), float(sample['faces'])))
+
+    growth = {
+        field: {
+            'time': _fit_growth([(x, t) for x, t, _, _ in points]),
+            'evals': _fit_growth([(x, e) for x, _, e, _ in points]),
+            'faces': _fit_growth([(x, f) for x, _, _, f in points]),
+        }
+        for field, points in growth_points.items()
+    }
+    return {
+        'samples': samples,
+        'growth': growth,
+        'total_time': sum(sample.get('total_time', 0.0) for sample in samples),
+        'max_time': max((sample.get('total_time', 0.0) for sample in samples), default=0.0),
+    }
+
+
+#endregion
+
+#region Report Comparer
+
+
+def _sample_key(sample: dict[str, typing.Any]) -> str:
+    return json.dumps(sample['cfgs'], sort_keys=True)
+
+
+def compare_reports(baseline: dict[str, typing.Any], current: dict[str, typing.Any]) -> None:
+    """
+    Log the difference between baseline report and current report.
+
+    :param baseline: The report of previous run.
+    :param current: The report of this run.
+    """
+    for ident, report in current['prototypes'].items():
+        old_report = baseline['prototypes'].get(ident, None)
+        if old_report is None:
+            logging.info(f'{ident}: new prototype.')
+            continue
+
+        # compare total time
+        if old_report['total_time'] > 0:
+            logging.info(f'{ident}: total time {report["total_time"] / old_report["total_time"]:.2f}x of baseline.')
+
+        # compare geometry of the same cfgs
+        old_samples = {_sample_key(sample): sample for sample in old_report['samples']}
+        for sample in report['samples']:
+            old_sample = old_samples.get(_sample_key(sample), None)
+            if old_sample is None:
+                continue
+            for field in ('prototype_evals', 'vertices', 'faces', 'error'):
+                if sample.get(field, None) != old_sample.get(field, None):
+                    logging.warning(f'{ident}: {field} changed from {old_sample.get(field, None)} to {sample.get(field, None)} with cfgs {sample["cfgs"]}.')
+
+    for ident in baseline['prototypes'].keys():
+        if ident not in current['prototypes']:
+            logging.info(f'{ident}: removed prototype.')
+
+
+#endregion
+
+
+def bench_bme(output: Path, repeat: int, growth_threshold: float, baseline: Path | None) -> None:
+    """
+    Benchmark all showcase prototypes and write JSON report.
+
+    :param output: The path to output report.
+    :param repeat: How many times to generate each sample.
+    :param growth_threshold: Warn if the time growth exponent of numeric cfg exceeds this value.
+    :param baseline: The path to previous report to compare, or None.
+    """
+    # disable geometry cache, otherwise we benchmark the cache instead of prototype.
+    UTIL_bme.set_geometry_cache_size(0)
+    # compile prototypes before timing
+    prototypes_hash = UTIL_bme.get_prototypes_hash()
+    idents = _g_EnumHelper_BmeStructType.get_bme_identifiers()
+
+    prototypes: dict[str, typing.Any] = {}
+    for ident in idents:
+        logging.info(f'Benchmarking {ident}')
+        prototypes[ident] = bench_prototype(ident, repeat)
+        for field, growth in prototypes[ident]['growth'].items():
+            if growth['time'] is not None and growth['time'] > growth_threshold:
+                logging.warning(f'{ident}: generation time grows as {field}^{growth["time"]:.2f}.')
+            if growth['evals'] is not None and growth['evals'] > growth_threshold:
+                logging.warning(f'{ident}: prototype evaluations grow as {field}^{growth["evals"]:.2f}.')
+
+    report = {
+        'blender': bpy.app.version_string,
+        'prototypes_hash': prototypes_hash,
+        'repeat': repeat,
+        'prototypes': prototypes,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logging.info(f'Report is written into {output}')
+
+    if baseline is not None:
+        with open(baseline, 'r', encoding='utf-8') as f:
+            compare_reports(json.load(f), report)
+
+
+if __name__ == '__main__':
+    # Blender passes the arguments after `--` to script.
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(
+        prog='blender --background --python bench_bme.py --',
+        description='Benchmark all BME showcase prototypes.'
+    )
+    parser.add_argument('-o', '--output', type=Path, default=Path('bme_bench.json'), help='The path to output JSON report.')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='How many times to generate each sample.')
+    parser.add_argument('-g', '--growth-threshold', type=float, default=1.5, help='Warn if generation time grows faster than this power of numeric cfg.')
+    parser.add_argument('-b', '--baseline', type=Path, default=None, help='The previous report to compare with.')
+    args = parser.parse_args(argv)
+
+    common.setup_logging()
+    bench_bme(args.output, args.repeat, args.growth_threshold, args.baseline)
@@ -1,35 +1,105 @@
-import json, logging
+import json, logging, typing, hashlib, marshal
 from pathlib import Path
-import common
+import common, bme, optimize_jsons
 from common import AssetKind
 import json5
 
+## The file name of generated BME prototype index.
+#  It must not be ended with `.json`, otherwise plugin will treat it as a prototype file.
+INDEX_FILE_NAME: str = 'prototypes.index'
+## The version of generated BME prototype index.
+#  Please keep it synced with the version in plugin.
+INDEX_VERSION: int = 2
+## The file name of generated BME prototype binary cache.
+CACHE_FILE_NAME: str = 'prototypes.bin'
+## The version of generated BME prototype binary cache.
+#  Please keep it synced with the version in plugin.
+CACHE_VERSION: int = 1
 
-def _compress_json(src_file: Path, dst_file: Path) -> None:
-    # load data first
+
+def _load_json(src_file: Path) -> list[bme.Prototype]:
     with open(src_file, 'r', encoding='utf-8') as f:
-        loaded_prototypes = json5.load(f)
+        return bme.Prototypes.model_validate(json5.load(f)).root
 
-    # save result with compress config
-    with open(dst_file, 'w', encoding='utf-8') as f:
-        json.dump(
-            loaded_prototypes,  # loaded data
-            f,
-            indent=None,  # no indent. the most narrow style.
-            separators=(',', ':'),  # also for narrow style.
-            sort_keys=False,  # do not sort key
-        )
+
+def _compress_json(loaded_prototypes: list[dict[str, typing.Any]], dst_file: Path) -> list[dict[str, typing.Any]]:
+    """
+    Compress given prototypes into JSON file and return the index entries of its prototypes.
+
+    :return: A list of index entries.
+    Each entry holds the identifier, byte offset, byte length and showcase of prototype.
+    """
+    # save result with compress config.
+    # we write each prototype manually to record its offset in file.
+    # the output is exactly the same as `json.dump` with narrow style.
+    entries: list[dict[str, typing.Any]] = []
+    with open(dst_file, 'wb') as f:
+        f.write(b'[')
+        for i, proto in enumerate(loaded_prototypes):
+            if i != 0:
+                f.write(b',')
+            data = json.dumps(
+                proto,  # loaded data
+                indent=None,  # no indent. the most narrow style.
+                separators=(',', ':'),  # also for narrow style.
+                sort_keys=False,  # do not sort key
+            ).encode('utf-8')
+            entries.append({
+                'identifier': proto['identifier'],
+                'offset': f.tell(),
+                'length': len(data),
+                'showcase': proto['showcase'],
+            })
+            f.write(data)
+        f.write(b']')
+
+    return entries
+
+
+def _hash_jsons(plg_jsons_files: list[Path], plg_jsons_dir: Path) -> str:
+    """
+    Compute the content hash of compressed JSON files.
+    Please keep this algorithm synced with the one in plugin.
+
+    :return: The hex digest of content hash.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    for plg_json_file in sorted(plg_jsons_files, key=lambda x: x.relative_to(plg_jsons_dir).as_posix()):
+        rel_name = plg_json_file.relative_to(plg_jsons_dir).as_posix()
+        data = plg_json_file.read_bytes()
+        hasher.update(f'{rel_name}\0{len(data)}\0'.encode('utf-8'))
+        hasher.update(data)
+    return hasher.hexdigest()
 
 
 def build_jsons() -> None:
     raw_jsons_dir = common.get_raw_assets_folder(AssetKind.Jsons)
     plg_jsons_dir = common.get_plugin_assets_folder(AssetKind.Jsons)
 
-    for raw_json_file in raw_jsons_dir.glob('*.json5'):
+    # Load all prototypes first, because optimizer need to visit all of them
+    # to inline instances which may refer to prototypes in other files.
+    # Sort files to make sure that generated index is stable.
+    raw_files: list[tuple[Path, list[bme.Prototype]]] = []
+    for raw_json_file in sorted(raw_jsons_dir.glob('*.json5')):
         # Skip non-file.
         if not raw_json_file.is_file():
             continue
 
+        logging.info(f'Loading {raw_json_file}')
+        raw_files.append((raw_json_file, _load_json(raw_json_file)))
+
+    # Optimize prototypes
+    optimized_prototypes = {
+        p.identifier: p
+        for p in optimize_jsons.optimize_prototypes([p for _, prototypes in raw_files for p in prototypes])
+    }
+
+    index_files: dict[str, int] = {}
+    index_prototypes: list[dict[str, typing.Any]] = []
+    cache_prototypes: list[tuple[str, typing.Any]] = []
+    plg_json_files: list[Path] = []
+
+    for raw_json_file, prototypes in raw_files:
         # Build final path
         plg_json_file = plg_jsons_dir / raw_json_file.relative_to(raw_jsons_dir)
         plg_json_file = plg_json_file.with_suffix('.json')
@@ -37,8 +107,58 @@ def build_jsons() -> None:
         # Show message
         logging.info(f'Compressing {raw_json_file} -> {plg_json_file}')
 
-        # Compress json
-        _compress_json(raw_json_file, plg_json_file)
+        # Compress json and collect its index entries
+        entries = _compress_json(
+            [optimized_prototypes[p.identifier].model_dump(mode='json') for p in prototypes],
+            plg_json_file
+        )
+        rel_name = plg_json_file.relative_to(plg_jsons_dir).as_posix()
+        for entry in entries:
+            entry['file'] = rel_name
+        index_files[rel_name] = plg_json_file.stat().st_size
+        index_prototypes.extend(entries)
+
+        # Reload compressed json for binary cache,
+        # so that cached data is exactly what plugin will get from JSON.
+        with open(plg_json_file, 'r', encoding='utf-8') as f:
+            cache_prototypes.extend((rel_name, proto) for proto in json.load(f))
+        plg_json_files.append(plg_json_file)
+
+    # Both of index and binary cache are validated by the content hash of compressed JSON files.
+    jsons_hash = _hash_jsons(plg_json_files, plg_jsons_dir)
+
+    # Write prototype index which is used by plugin for lazy loading.
+    plg_index_file = plg_jsons_dir / INDEX_FILE_NAME
+    logging.info(f'Writing prototype index {plg_index_file}')
+    with open(plg_index_file, 'w', encoding='utf-8') as f:
+        json.dump(
+            {
+                'version': INDEX_VERSION,
+                'hash': jsons_hash,
+                'files': index_files,
+                'prototypes': index_prototypes,
+            },
+            f,
+            indent=None,
+            separators=(',', ':'),
+            sort_keys=False,
+        )
+
+
+    # Write binary cache which is used by plugin to skip JSON parsing.
+    # Marshal format of plain data is stable between Python versions,
+    # so it can be read by the Python shipped with Blender.
+    plg_cache_file = plg_jsons_dir / CACHE_FILE_NAME
+    logging.info(f'Writing prototype binary cache {plg_cache_file}')
+    with open(plg_cache_file, 'wb') as f:
+        marshal.dump(
+            {
+                'version': CACHE_VERSION,
+                'hash': jsons_hash,
+                'prototypes': cache_prototypes,
+            },
+            f,
+        )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,595 @@
+import logging, ast, math, typing
+import common, bme
+from common import AssetKind
+import json5
+
+## YYC MARK:
+#  The semantic of programmable fields is defined by UTIL_bme.py.
+#  Everything written in this file should keep the same behavior with it.
+#  If the evaluation environment of programmable fields changed, please synchronize it.
+
+#region Constant Folding
+
+## The functions which can be evaluated safely in build time.
+#  They are pure functions and produce exactly the same result with plugin.
+#  Functions involving mathutils (like `distance` and `angle`) are excluded
+#  because mathutils computes in single precision.
+_PURE_GLOBALS: dict[str, typing.Any] = {
+    'pi': math.pi,
+    'tau': math.tau,
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'asin': math.asin,
+    'acos': math.acos,
+    'atan': math.atan,
+    'pow': math.pow,
+    'sqrt': math.sqrt,
+    'fabs': math.fabs,
+    'degrees': math.degrees,
+    'radians': math.radians,
+    'abs': abs,
+    'int': int,
+    'float': float,
+    'str': str,
+    'bool': bool,
+}
+
+## The expression nodes which can be folded when all of their children are literal.
+_FOLDABLE_NODES: tuple[type, ...] = (
+    ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp, ast.Tuple, ast.Subscript, ast.Call
+)
+
+
+def _is_literal(node: ast.AST) -> bool:
+    """
+    Check whether given node is a literal produced by this optimizer.
+    """
+    match node:
+        case ast.Constant():
+            return True
+        case ast.UnaryOp(op=ast.USub(), operand=ast.Constant(value=int() | float() as value)):
+            return not isinstance(value, bool)
+        case ast.Tuple(ctx=ast.Load()):
+            return all(_is_literal(elt) for elt in node.elts)
+        case _:
+            return False
+
+
+def _to_literal(value: typing.Any) -> ast.expr | None:
+    """
+    Convert given value into literal node.
+
+    :return: The literal node, or None if this value can not be written as literal.
+    """
+    match value:
+        case None | bool() | str():
+            return ast.Constant(value)
+        case int() | float():
+            if isinstance(value, float) and not math.isfinite(value):
+                return None
+            # Negative number should be written as unary operator,
+            # otherwise the precedence will be wrong when unparsing it (e.g. `-1 ** x`).
+            if value < 0 or (isinstance(value, float) and math.copysign(1.0, value) < 0):
+                return ast.UnaryOp(ast.USub(), ast.Constant(-value))
+            return ast.Constant(value)
+        case tuple():
+            elts: list[ast.expr] = []
+            for v in value:
+                elt = _to_literal(v)
+                if elt is None:
+                    return None
+                elts.append(elt)
+            return ast.Tuple(elts, ast.Load())
+        case _:
+            return None
+
+
+class _ConstFolder(ast.NodeTransformer):
+    """
+    Substitute known constant names and fold constant sub-expressions.
+
+    Lambda arguments and comprehension targets shadow outer names,
+    so these names will not be substituted inside their scope.
+    """
+
+    consts: dict[str, typing.Any]
+    """Known constant names and their values."""
+    shadowed: list[set[str]]
+    """The stack of names bound by lambda and comprehension."""
+    changed: bool
+    """True if anything is changed."""
+
+    def __init__(self, consts: dict[str, typing.Any]) -> None:
+        self.consts = consts
+        self.shadowed = []
+        self.changed = False
+
+    def __is_shadowed(self, name: str) -> bool:
+        return any(name in names for names in self.shadowed)
+
+    def __visit_scoped(self, node: ast.AST, names: set[str]) -> ast.AST:
+        self.shadowed.append(names)
+        self.generic_visit(node)
+        self.shadowed.pop()
+        return node
+
+    def visit_Lambda(self, node: ast.Lambda) -> ast.AST:
+        args = node.args
+        names = set(a.arg for a in args.posonlyargs + args.args + args.kwonlyargs)
+        if args.vararg is not None: names.add(args.vararg.arg)
+        if args.kwarg is not None: names.add(args.kwarg.arg)
+        return self.__visit_scoped(node, names)
+
+    def __visit_comprehension(self, node: ast.AST) -> ast.AST:
+        names: set[str] = set()
+        for generator in typing.cast(list[ast.comprehension], getattr(node, 'generators')):
+            names.update(n.id for n in ast.walk(generator.target) if isinstance(n, ast.Name))
+        return self.__visit_scoped(node, names)
+
+    visit_ListComp = __visit_comprehension
+    visit_SetComp = __visit_comprehension
+    visit_DictComp = __visit_comprehension
+    visit_GeneratorExp = __visit_comprehension
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if isinstance(node.ctx, ast.Load) and node.id in self.consts and not self.__is_shadowed(node.id):
+            literal = _to_literal(self.consts[node.id])
+            if literal is not None:
+                self.changed = True
+                return literal
+        return node
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        node = super().generic_visit(node)
+        # Only fold supported nodes whose children are all literal.
+        if not isinstance(node, _FOLDABLE_NODES) or _is_literal(node):
+            return node
+        if isinstance(node, ast.Call):
+            if not (isinstance(node.func, ast.Name) and node.func.id in _PURE_GLOBALS) or len(node.keywords) != 0:
+                return node
+            if self.__is_shadowed(node.func.id):
+                return node
+            children = node.args
+        else:
+            children = [child for child in ast.iter_child_nodes(node) if isinstance(child, ast.expr)]
+        if not all(_is_literal(child) for child in children):
+            return node
+
+        # Try evaluating it.
+        # If it raises exception, keep it as it is, and let plugin raise it.
+        try:
+            expr = ast.fix_missing_locations(ast.Expression(typing.cast(ast.expr, node)))
+            value = eval(compile(expr, '<BME optimizer>', 'eval'), {'__builtins__': {}, **_PURE_GLOBALS}, None)
+        except Exception:
+            return node
+        literal = _to_literal(value)
+        if literal is None:
+            return node
+        self.changed = True
+        return literal
+
+
+def _fold(field: str, consts: dict[str, typing.Any]) -> str:
+    """
+    Fold given programmable field with known constant names.
+
+    :return: The folded programmable field. It is the same string if nothing is changed.
+    """
+    tree = ast.parse(field, mode='eval')
+    folder = _ConstFolder(consts)
+    tree = folder.visit(tree)
+    if not folder.changed:
+        return field
+    return ast.unparse(ast.fix_missing_locations(tree))
+
+
+def _get_literal(field: str) -> tuple[bool, typing.Any]:
+    """
+    Get the value of programmable field if it is a literal.
+
+    :return: A tuple. The first item indicates whether it is a literal. The second item is its value.
+    """
+    tree = ast.parse(field, mode='eval')
+    if not _is_literal(tree.body):
+        return (False, None)
+    return (True, ast.literal_eval(tree.body))
+
+
+#endregion
+
+#region Transform Evaluation
+
+_Matrix = tuple[tuple[float, ...], ...]
+
+
+def _mat_mul(a: _Matrix, b: _Matrix) -> _Matrix:
+    return tuple(tuple(sum(a[i][k] * b[k][j] for k in range(4)) for j in range(4)) for i in range(4))
+
+
+def _mat_ident() -> _Matrix:
+    return tuple(tuple(1.0 if i == j else 0.0 for j in range(4)) for i in range(4))
+
+
+def _mat_move(x: float, y: float, z: float) -> _Matrix:
+    return ((1.0, 0.0, 0.0, x), (0.0, 1.0, 0.0, y), (0.0, 0.0, 1.0, z), (0.0, 0.0, 0.0, 1.0))
+
+
+def _mat_scale(x: float, y: float, z: float) -> _Matrix:
+    return ((x, 0.0, 0.0, 0.0), (0.0, y, 0.0, 0.0), (0.0, 0.0, z, 0.0), (0.0, 0.0, 0.0, 1.0))
+
+
+def _mat_rot(x: float, y: float, z: float) -> _Matrix:
+    # Same as Blender XYZ euler. X is applied first, then Y, then Z.
+    sx, cx = math.sin(math.radians(x)), math.cos(math.radians(x))
+    sy, cy = math.sin(math.radians(y)), math.cos(math.radians(y))
+    sz, cz = math.sin(math.radians(z)), math.cos(math.radians(z))
+    rx = ((1.0, 0.0, 0.0, 0.0), (0.0, cx, -sx, 0.0), (0.0, sx, cx, 0.0), (0.0, 0.0, 0.0, 1.0))
+    ry = ((cy, 0.0, sy, 0.0), (0.0, 1.0, 0.0, 0.0), (-sy, 0.0, cy, 0.0), (0.0, 0.0, 0.0, 1.0))
+    rz = ((cz, -sz, 0.0, 0.0), (sz, cz, 0.0, 0.0), (0.0, 0.0, 1.0, 0.0), (0.0, 0.0, 0.0, 1.0))
+    return _mat_mul(rz, _mat_mul(ry, rx))
+
+
+_MATRIX_FUNCTIONS: dict[str, typing.Callable[..., _Matrix]] = {
+    'move': _mat_move,
+    'rot': _mat_rot,
+    'scale': _mat_scale,
+    'ident': _mat_ident,
+}
+
+
+def _eval_transform(field: str) -> _Matrix | None:
+    """
+    Evaluate constant transform field.
+
+    :return: The evaluated matrix, or None if it is not a constant transform.
+    """
+
+    def eval_node(node: ast.expr) -> _Matrix | None:
+        match node:
+            case ast.BinOp(op=ast.MatMult()):
+                left = eval_node(node.left)
+                right = eval_node(node.right)
+                if left is None or right is None:
+                    return None
+                return _mat_mul(left, right)
+            case ast.Call(func=ast.Name(id=name)) if name in _MATRIX_FUNCTIONS and len(node.keywords) == 0:
+                if not all(_is_literal(arg) for arg in node.args):
+                    return None
+                args = [ast.literal_eval(arg) for arg in node.args]
+                if not all(isinstance(arg, (int, float)) and not isinstance(arg, bool) for arg in args):
+                    return None
+                try:
+                    return _MATRIX_FUNCTIONS[name](*args)
+                except TypeError:
+                    return None
+            case _:
+                return None
+
+    return eval_node(ast.parse(field, mode='eval').body)
+
+
+def _clean_float(value: float) -> float:
+    # Remove the noise produced by trigonometric functions, e.g. cos(90) is 6.1e-17.
+    # The precision is still much higher than the single precision used by Virtools.
+    return round(value, 9) + 0.0
+
+
+def _transform_point(mat: _Matrix, vec: tuple[float, float, float]) -> tuple[float, ...]:
+    return tuple(_clean_float(sum(mat[i][k] * vec[k] for k in range(3)) + mat[i][3]) for i in range(3))
+
+
+def _transform_normal(mat: _Matrix, vec: tuple[float, float, float]) -> tuple[float, ...]:
+    # Normal should be transformed by the inverse transpose of matrix.
+    # The inverse transpose of 3x3 matrix is its cofactor matrix divided by determinant.
+    # We normalize the result later, so the determinant can be ignored except its sign.
+    m = [[mat[i][j] for j in range(3)] for i in range(3)]
+    cof = [[
+        m[(i + 1) % 3][(j + 1) % 3] * m[(i + 2) % 3][(j + 2) % 3] - m[(i + 1) % 3][(j + 2) % 3] * m[(i + 2) % 3][(j + 1) % 3]
+        for j in range(3)] for i in range(3)]
+    sign = 1.0 if _mat_det(mat) >= 0 else -1.0
+    result = [sign * sum(cof[i][k] * vec[k] for k in range(3)) for i in range(3)]
+    length = math.sqrt(sum(v * v for v in result))
+    if length == 0:
+        return tuple(_clean_float(v) for v in result)
+    return tuple(_clean_float(v / length) for v in result)
+
+
+def _mat_det(mat: _Matrix) -> float:
+    return (
+        mat[0][0] * (mat[1][1] * mat[2][2] - mat[1][2] * mat[2][1])
+        - mat[0][1] * (mat[1][0] * mat[2][2] - mat[1][2] * mat[2][0])
+        + mat[0][2] * (mat[1][0] * mat[2][1] - mat[1][1] * mat[2][0])
+    )
+
+
+#endregion
+
+#region Prototype Optimizer
+
+
+class _PrototypeBody(typing.NamedTuple):
+    skip: str
+    vars: list[bme.Var]
+    vertices: list[bme.Vertex]
+    faces: list[bme.Face]
+    instances: list[bme.Instance]
+
+
+class PrototypeOptimizer:
+    """
+    The optimizer of BME prototypes.
+
+    It performs following optimizations:
+
+    * Fold constant sub-expressions in programmable fields.
+    * Substitute constant variables into programmable fields, and remove them.
+    * Remove vertices, faces and instances which are always skipped.
+    * Inline leading instances whose params and transform are constant,
+      if the geometry of referred prototype is fully constant.
+    """
+
+    raw_prototypes: dict[str, bme.Prototype]
+    """The prototypes before optimization. Key is identifier."""
+    folded_fields: int
+    """The count of folded programmable fields."""
+    removed_vars: int
+    """The count of removed variables."""
+    removed_entries: int
+    """The count of removed vertices, faces and instances."""
+    inlined_instances: int
+    """The count of inlined instances."""
+
+    def __init__(self, prototypes: list[bme.Prototype]) -> None:
+        self.raw_prototypes = {p.identifier: p for p in prototypes}
+        self.folded_fields = 0
+        self.removed_vars = 0
+        self.removed_entries = 0
+        self.inlined_instances = 0
+
+    def optimize(self) -> list[bme.Prototype]:
+        """
+        Optimize all prototypes.
+
+        :return: Optimized prototypes with the same order.
+        """
+        result: list[bme.Prototype] = []
+        for prototype in self.raw_prototypes.values():
+            logging.info(f'Optimizing prototype {prototype.identifier}')
+            body = self.__optimize_body(prototype, {}, set())
+            result.append(
+                bme.Prototype(
+                    identifier=prototype.identifier,
+                    showcase=prototype.showcase,
+                    params=prototype.params,
+                    skip=body.skip,
+                    vars=body.vars,
+                    vertices=body.vertices,
+                    faces=body.faces,
+                    instances=body.instances,
+                )
+            )
+        return result
+
+    def __fold(self, field: str, consts: dict[str, typing.Any]) -> str:
+        folded = _fold(field, consts)
+        if folded != field:
+            self.folded_fields += 1
+        return folded
+
+    def __optimize_body(self, prototype: bme.Prototype, consts: dict[str, typing.Any],
+                        visiting: set[str]) -> _PrototypeBody:
+        """
+        Optimize the body of given prototype.
+
+        :param consts: The known constant names, e.g. constant params passed by instance.
+        :param visiting: The identifiers of prototypes being inlined. Used to stop recursive inlining.
+        """
+        consts = dict(consts)
+
+        # Check skip for whole prototype.
+        # If it is always skipped, nothing will be generated.
+        skip = self.__fold(prototype.skip, consts)
+        (is_literal, value) = _get_literal(skip)
+        if is_literal and value == True:
+            self.removed_entries += len(prototype.vertices) + len(prototype.faces) + len(prototype.instances)
+            return _PrototypeBody(skip, [], [], [], [])
+
+        # Fold variables, and remove constant variables.
+        variables: list[bme.Var] = []
+        for var in prototype.vars:
+            data = self.__fold(var.data, consts)
+            (is_literal, value) = _get_literal(data)
+            if is_literal:
+                consts[var.field] = value
+                self.removed_vars += 1
+            else:
+                variables.append(bme.Var(field=var.field, data=data))
+
+        # Fold vertices. Plugin only keeps vertices whose skip is equal to False.
+        # Face indices refer to the kept vertices, so removing always skipped vertex is safe.
+        vertices: list[bme.Vertex] = []
+        for vertex in prototype.vertices:
+            vertex_skip = self.__fold(vertex.skip, consts)
+            (is_literal, value) = _get_literal(vertex_skip)
+            if is_literal and not (value == False):
+                self.removed_entries += 1
+                continue
+            vertices.append(bme.Vertex(skip=vertex_skip, data=self.__fold(vertex.data, consts)))
+
+        # Fold faces. Same rule with vertices.
+        faces: list[bme.Face] = []
+        for face in prototype.faces:
+            face_skip = self.__fold(face.skip, consts)
+            (is_literal, value) = _get_literal(face_skip)
+            if is_literal and not (value == False):
+                self.removed_entries += 1
+                continue
+            faces.append(
+                bme.Face(
+                    skip=face_skip,
+                    texture=self.__fold(face.texture, consts),
+                    indices=list(face.indices),
+                    uvs=[self.__fold(uv, consts) for uv in face.uvs],
+                    normals=None if face.normals is None else [self.__fold(n, consts) for n in face.normals],
+                )
+            )
+
+        # Fold instances. Plugin skips instances whose skip is equal to True.
+        instances: list[bme.Instance] = []
+        for instance in prototype.instances:
+            instance_skip = self.__fold(instance.skip, consts)
+            (is_literal, value) = _get_literal(instance_skip)
+            if is_literal and value == True:
+                self.removed_entries += 1
+                continue
+            instances.append(
+                bme.Instance(
+                    identifier=instance.identifier,
+                    skip=instance_skip,
+                    params={k: self.__fold(v, consts) for k, v in instance.params.items()},
+                    transform=self.__fold(instance.transform, consts),
+                )
+            )
+
+        # Inline leading instances.
+        # We only inline leading instances to keep the order of generated geometry.
+        visiting = visiting | {prototype.identifier}
+        while len(instances) != 0:
+            if not self.__try_inline(instances[0], vertices, faces, visiting):
+                break
+            instances.pop(0)
+            self.inlined_instances += 1
+
+        return _PrototypeBody(skip, variables, vertices, faces, instances)
+
+    def __try_inline(self, instance: bme.Instance, vertices: list[bme.Vertex], faces: list[bme.Face],
+                     visiting: set[str]) -> bool:
+        """
+        Try inlining given instance into given vertices and faces.
+        Given vertices and faces will only be modified if inlining is succeeded.
+
+        :return: True if instance is inlined.
+        """
+        # Recursive prototypes can not be inlined.
+        if instance.identifier in visiting:
+            return False
+        prototype = self.raw_prototypes.get(instance.identifier, None)
+        if prototype is None:
+            return False
+        # The position of instance geometry should be known,
+        # so all vertices in current prototype should be kept constantly.
+        if not all(_get_literal(vertex.skip)[0] for vertex in vertices):
+            return False
+        # Instance itself should be kept constantly.
+        if not _get_literal(instance.skip)[0]:
+            return False
+        # All params should be constant.
+        params: dict[str, typing.Any] = {}
+        for k, v in instance.params.items():
+            (is_literal, value) = _get_literal(v)
+            if not is_literal:
+                return False
+            params[k] = value
+        # Transform should be constant.
+        transform = _eval_transform(instance.transform)
+        if transform is None:
+            return False
+
+        # Specialize referred prototype with given params.
+        # Because the statistics is only for the final output,
+        # use a new optimizer to do this, and only merge inlined instances count.
+        specializer = PrototypeOptimizer(list(self.raw_prototypes.values()))
+        body = specializer.__optimize_body(prototype, params, visiting)
+        (is_literal, value) = _get_literal(body.skip)
+        if not is_literal:
+            return False
+        if value == True:
+            # Nothing will be generated.
+            return True
+        if len(body.vars) != 0 or len(body.instances) != 0:
+            return False
+
+        # Evaluate vertices.
+        inlined_vertices: list[bme.Vertex] = []
+        for vertex in body.vertices:
+            (is_literal, value) = _get_literal(vertex.data)
+            if not is_literal or not _get_literal(vertex.skip)[0]:
+                return False
+            inlined_vertices.append(bme.Vertex(skip='False', data=repr(_transform_point(transform, value))))
+
+        # Evaluate faces.
+        # If transform is mirror matrix, the order of face vertices should be reversed,
+        # like what plugin does.
+        mirror = _mat_det(transform) < 0
+        offset = len(vertices)
+        inlined_faces: list[bme.Face] = []
+        for face in body.faces:
+            if not _get_literal(face.skip)[0] or not _get_literal(face.texture)[0]:
+                return False
+            if not all(_get_literal(uv)[0] for uv in face.uvs):
+                return False
+            normals: list[str] | None = None
+            if face.normals is not None:
+                normals = []
+                for normal in face.normals:
+                    (is_literal, value) = _get_literal(normal)
+                    if not is_literal:
+                        return False
+                    normals.append(repr(_transform_normal(transform, value)))
+            indices = [offset + i for i in face.indices]
+            uvs = list(face.uvs)
+            if mirror:
+                indices.reverse()
+                uvs.reverse()
+                if normals is not None:
+                    normals.reverse()
+            inlined_faces.append(bme.Face(skip='False', texture=face.texture, indices=indices, uvs=uvs, normals=normals))
+
+        # Okey, apply it.
+        vertices.extend(inlined_vertices)
+        faces.extend(inlined_faces)
+        self.inlined_instances += specializer.inlined_instances
+        return True
+
+
+def optimize_prototypes(prototypes: list[bme.Prototype]) -> list[bme.Prototype]:
+    """
+    Optimize given prototypes.
+
+    :param prototypes: All prototypes. Instances can only be inlined if referred prototype is in this list.
+    :return: Optimized prototypes with the same order.
+    """
+    optimizer = PrototypeOptimizer(prototypes)
+    result = optimizer.optimize()
+    logging.info(
+        f'Folded {optimizer.folded_fields} fields, '
+        f'removed {optimizer.removed_vars} variables and {optimizer.removed_entries} always skipped entries, '
+        f'inlined {optimizer.inlined_instances} instances.'
+    )
+    return result
+
+
+#endregion
+
+
+def optimize_jsons() -> None:
+    """
+    Run optimizer on all raw prototypes and report the statistics without writing anything.
+    """
+    raw_jsons_dir = common.get_raw_assets_folder(AssetKind.Jsons)
+
+    prototypes: list[bme.Prototype] = []
+    for raw_json_file in sorted(raw_jsons_dir.glob('*.json5')):
+        # Skip non-file
+        if not raw_json_file.is_file():
+            continue
+        with open(raw_json_file, 'r', encoding='utf-8') as f:
+            prototypes += bme.Prototypes.model_validate(json5.load(f)).root
+
+    optimize_prototypes(prototypes)
+
+
+if __name__ == '__main__':
+    common.setup_logging()
+    optimize_jsons()
@@ -0,0 +1,114 @@
+import logging, argparse, concurrent.futures.process, sys, typing
+from pathlib import Path
+
+# This script is executed by Blender, not UV,
+# so we need add this folder and the root of repository into path manually.
+# NOTE: this script imports bpy at top level like the usual level generation scripts,
+# which is exactly the case that process pool worker must not re-run.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import common
+
+sys.path.insert(0, str(common.get_root_folder()))
+import bpy, addon_utils, mathutils
+
+# The layout creator need plugin preferences and scene properties,
+# so we enable plugin from repository instead of only importing it.
+addon_utils.enable('bbp_ng', default_set=True, persistent=False)
+from bbp_ng import UTIL_bme, UTIL_bme_core
+
+_g_EnumHelper_BmeStructType = UTIL_bme.EnumPropHelper()
+
+#region Pool Watcher
+
+_g_PoolErrors: list[BaseException] = []
+"""The exceptions raised by process pool, recorded by the watcher below."""
+
+_g_RawGenerateParallel = UTIL_bme_core.generate_bme_struct_parts_parallel
+
+
+def _watched_generate_parallel(*args, **kwargs) -> typing.Any:
+    # layout creator silently falls back to serial generation if process pool is broken,
+    # so we record the exception to know whether process pool really works.
+    try:
+        return _g_RawGenerateParallel(*args, **kwargs)
+    except BaseException as e:
+        _g_PoolErrors.append(e)
+        raise
+
+
+UTIL_bme_core.generate_bme_struct_parts_parallel = _watched_generate_parallel
+
+#endregion
+
+
+def _build_layout(count: int) -> list[UTIL_bme.LayoutEntry]:
+    """
+    Build a layout which places all showcase prototypes in a row repeatedly with default cfgs.
+
+    :param count: The count of layout entries.
+    :return: The layout entries.
+    """
+    idents = _g_EnumHelper_BmeStructType.get_bme_identifiers()
+    return [
+        UTIL_bme.LayoutEntry(idents[i % len(idents)], {}, mathutils.Matrix.Translation((i * 10.0, 0.0, 0.0)), i % 4 + 1)
+        for i in range(count)
+    ]
+
+
+def _summarize(objs: list[bpy.types.Object]) -> list[tuple[int, int]]:
+    summary = [(len(obj.data.vertices), len(obj.data.polygons)) for obj in objs]
+    # remove created objects and meshes, so that the next run is not affected.
+    for obj in objs:
+        mesh = obj.data
+        bpy.data.objects.remove(obj)
+        if mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+    return summary
+
+
+def smoke_bme_parallel(count: int) -> bool:
+    """
+    Create the same layout in process pool and serially, then compare them.
+
+    :param count: The count of layout entries.
+    :return: True if smoke test passed.
+    """
+    layout = _build_layout(count)
+
+    # clear geometry cache before each run, otherwise the second run only fetches cache.
+    logging.info(f'Creating {count} structures in process pool')
+    UTIL_bme.clear_geometry_cache()
+    parallel = _summarize(UTIL_bme.create_bme_structs_from_layout(layout, UTIL_bme.LayoutMergeMode.Sector, parallel=True))
+    logging.info(f'Creating {count} structures serially')
+    UTIL_bme.clear_geometry_cache()
+    serial = _summarize(UTIL_bme.create_bme_structs_from_layout(layout, UTIL_bme.LayoutMergeMode.Sector, parallel=False))
+
+    passed = True
+    for e in _g_PoolErrors:
+        if isinstance(e, concurrent.futures.process.BrokenProcessPool):
+            logging.error(f'Process pool is broken: {e}')
+        else:
+            logging.error(f'Process pool raises: {type(e).__name__}: {e}')
+        passed = False
+    if parallel != serial:
+        logging.error(f'Structures created in process pool differ from serial ones: {parallel} != {serial}')
+        passed = False
+    if passed:
+        logging.info(f'Passed. {len(parallel)} merged objects are created.')
+    return passed
+
+
+if __name__ == '__main__':
+    # Blender passes the arguments after `--` to script.
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(
+        prog='blender --background --factory-startup --python smoke_bme_parallel.py --',
+        description='Smoke test of creating BME layout in process pool from a Blender script.'
+    )
+    parser.add_argument('-n', '--count', type=int, default=64, help='The count of structures in layout.')
+    args = parser.parse_args(argv)
+
+    common.setup_logging()
+    passed = smoke_bme_parallel(args.count)
+    # exit Blender with error code so that it can be used in CI.
+    sys.exit(0 if passed else 1)